@@ -867,6 +867,23 @@ the repository',
           'help': 'file where stats for the instance should be written',
           'group': 'main', 'level': 2,
           }),
+        ('lazy-appobjects',
+         {'type' : 'yn',
+          'default': False,
+          'help': 'if set, only import at startup appobjects modules which \
+are needed to start, other ones being imported on first lookup of objects they \
+register, according to a manifest generated in the data directory of the \
+instance at first startup. Ignored in debug mode.',
+          'group': 'main', 'level': 3,
+          }),
+        ('selection-cache-size',
+         {'type' : 'int',
+          'default': 0,
+          'help': 'maximum number of results of appobjects selection cached by \
+each registry, 0 meaning no cache. Only selections among appobjects whose \
+predicates are declared cacheable are cached.',
+          'group': 'main', 'level': 3,
+          }),
         )
 
     @classmethod
@@ -19,7 +19,15 @@
 Cubicweb registries
 """
 
+import os
+import pickle
+import pkgutil
 import sys
+import tempfile
+import threading
+from hashlib import md5
+from time import perf_counter
+from types import ModuleType
 from os.path import join, dirname, realpath
 from datetime import datetime, date, time, timedelta
 from functools import reduce
@@ -27,7 +35,8 @@ from functools import reduce
 from logilab.common.decorators import cached, clear_cache
 from logilab.common.deprecation import class_deprecated
 from logilab.common.modutils import clean_sys_modules
-from logilab.common.registry import RegistryStore, Registry, ObjectNotFound, RegistryNotFound
+from logilab.common.registry import (RegistryStore, Registry, ObjectNotFound, RegistryNotFound,
+                                     obj_registries)
 
 from rql import RQLHelper
 from yams.constraints import BASE_CONVERTERS
@@ -35,7 +44,11 @@ from yams.constraints import BASE_CONVERTERS
 from cubicweb import _
 from cubicweb import (CW_SOFTWARE_ROOT, ETYPE_NAME_MAP, CW_EVENT_MANAGER,
                       onevent, Binary, UnknownProperty, UnknownEid)
-from cubicweb.predicates import appobject_selectable, _reset_is_instance_cache
+from cubicweb import startupprofile
+from cubicweb.__pkginfo__ import version as cw_version
+from cubicweb.predicates import (appobject_selectable, predicate_form_params,
+                                 _reset_is_instance_cache)
+from cubicweb.rtags import RegistrableRtags
 
 
 @onevent('before-registry-reload')
@@ -64,6 +77,31 @@ def require_appobject(obj):
     return None
 
 
+def _count_event_callbacks():
+    return sum(len(callbacks) for callbacks in CW_EVENT_MANAGER.callbacks.values())
+
+
+# types of keyword arguments of the input context which may be part of a
+# selection cache key
+_SIMPLE_TYPES = (str, int, float, bool, type(None))
+# marker used in selection cache keys instead of the `row` argument
+_ROW = object()
+
+
+def _uses_relation_tags(module):
+    """return True if relation tags (e.g. uicfg), or a module defining some, are
+    in the namespace of `module`, in which case it may tag relations when
+    imported
+    """
+    for value in vars(module).values():
+        if isinstance(value, RegistrableRtags):
+            return True
+        if isinstance(value, ModuleType) and any(
+                isinstance(modvalue, RegistrableRtags) for modvalue in vars(value).values()):
+            return True
+    return False
+
+
 class CWRegistry(Registry):
     def __init__(self, vreg):
         """
@@ -71,6 +109,224 @@ class CWRegistry(Registry):
         """
         super(CWRegistry, self).__init__(True)
         self.vreg = vreg
+        # registry identifier in the store, set by CWRegistryStore.setdefault()
+        self.name = None
+        # regid -> group of modules to load before objects with this regid
+        # may be looked up, when appobjects are loaded lazily
+        self._pending = {}
+        # selection cache, see _select_best()
+        self.selection_cache_size = vreg.config.get('selection-cache-size') or 0
+        self._selection_cache = {}
+        # tuple of candidates -> form parameters their selection depends on,
+        # or None if it may not be cached
+        self._candidates_params = {}
+
+    def _load_pending(self, regid=None):
+        """load modules registering objects with the given identifier, or
+        with any identifier if `regid` is None, when they haven't been loaded
+        yet
+        """
+        # _load_lazy_group() pops from _pending, which may be done concurrently
+        # by another thread
+        with self.vreg._lazy_lock:
+            if regid is None:
+                for group in set(self._pending.values()):
+                    self.vreg._load_lazy_group(group)
+            elif regid in self._pending:
+                self.vreg._load_lazy_group(self._pending[regid])
+
+    def __getitem__(self, regid):
+        if self._pending:
+            self._load_pending(regid)
+        return super(CWRegistry, self).__getitem__(regid)
+
+    def get(self, regid, default=None):
+        if self._pending:
+            self._load_pending(regid)
+        return super(CWRegistry, self).get(regid, default)
+
+    def __contains__(self, regid):
+        if self._pending:
+            self._load_pending(regid)
+        return super(CWRegistry, self).__contains__(regid)
+
+    def __iter__(self):
+        if self._pending:
+            self._load_pending()
+        return super(CWRegistry, self).__iter__()
+
+    def __len__(self):
+        if self._pending:
+            self._load_pending()
+        return super(CWRegistry, self).__len__()
+
+    def keys(self):
+        if self._pending:
+            self._load_pending()
+        return super(CWRegistry, self).keys()
+
+    def values(self):
+        if self._pending:
+            self._load_pending()
+        return super(CWRegistry, self).values()
+
+    def items(self):
+        if self._pending:
+            self._load_pending()
+        return super(CWRegistry, self).items()
+
+    def register(self, obj, oid=None, clear=False):
+        super(CWRegistry, self).register(obj, oid, clear)
+        self.clear_selection_cache()
+        lazy_registered = getattr(self.vreg, '_lazy_registered', None)
+        if lazy_registered is not None:
+            lazy_registered.append((self, obj))
+
+    def unregister(self, obj):
+        super(CWRegistry, self).unregister(obj)
+        self.clear_selection_cache()
+
+    def clear(self):
+        super(CWRegistry, self).clear()
+        self.clear_selection_cache()
+
+    def initialization_completed(self):
+        # only consider objects registered so far, those of modules loaded
+        # lazily are handled once loaded
+        pending, self._pending = self._pending, {}
+        try:
+            super(CWRegistry, self).initialization_completed()
+        finally:
+            self._pending = pending
+        self.clear_selection_cache()
+
+    # selection cache ##########################################################
+
+    def clear_selection_cache(self):
+        self._selection_cache = {}
+        self._candidates_params = {}
+
+    def _select_best(self, objects, *args, **kwargs):
+        """overridden to cache the result of the selection when it's enabled
+        (see the `selection-cache-size` option) and when every candidate only
+        uses cacheable predicates (see :mod:`cubicweb.predicates`), and to
+        measure time spent in selection when the request has a
+        `selection_stats` dictionary
+        """
+        stats = getattr(args[0], 'selection_stats', None) if args else None
+        if stats is not None:
+            tstart = perf_counter()
+        key = None
+        if self.selection_cache_size and not self._select_listeners:
+            key = self._selection_key(objects, args, kwargs)
+        if key is None:
+            hit = False
+            result = super(CWRegistry, self)._select_best(objects, *args, **kwargs)
+        else:
+            try:
+                winners = self._selection_cache[key]
+                hit = True
+            except KeyError:
+                hit = False
+                score, winners = 0, None
+                for obj in objects:
+                    objectscore = obj.__select__(obj, *args, **kwargs)
+                    if objectscore > score:
+                        score, winners = objectscore, [obj]
+                    elif objectscore > 0 and objectscore == score:
+                        winners.append(obj)
+                if winners is not None:
+                    winners = tuple(winners)
+                if len(self._selection_cache) >= self.selection_cache_size:
+                    self._selection_cache = {}
+                self._selection_cache[key] = winners
+            if winners is None:
+                result = None
+            elif len(winners) > 1:
+                # let the default implementation handle the ambiguity
+                result = super(CWRegistry, self)._select_best(winners, *args, **kwargs)
+            else:
+                result = self.selected(winners[0], args, kwargs)
+        if stats is not None:
+            regstats = stats.setdefault(self.name, [0, 0, 0.])
+            regstats[0] += 1
+            regstats[1] += hit
+            regstats[2] += perf_counter() - tstart
+        return result
+
+    def _selection_key(self, objects, args, kwargs):
+        """return a key identifying the result of the selection of an object
+        among `objects` for the given context, or None if it may not be cached
+        """
+        objects = tuple(objects)
+        try:
+            params = self._candidates_params[objects]
+        except KeyError:
+            params = set()
+            for obj in objects:
+                objparams = predicate_form_params(obj.__select__)
+                if objparams is None:
+                    params = None
+                    break
+                params |= objparams
+            if params is not None:
+                params = tuple(sorted(params))
+            self._candidates_params[objects] = params
+        if params is None or len(args) != 1 or args[0] is None:
+            return None
+        req = args[0]
+        rsetkey = None
+        rowkey = None
+        simplekwargs = []
+        for name, value in kwargs.items():
+            if name == 'rset':
+                if value is None:
+                    continue
+                try:
+                    col = kwargs.get('col', 0)
+                    rows = value.rows
+                    row = kwargs.get('row')
+                    # some predicates look at the types of the whole column
+                    # even when a row is given (e.g. `one_etype_rset`)
+                    types = value.column_types(col)
+                    if row is not None:
+                        types = (types, value.description[row][col],
+                                 rows[row][col] is None)
+                    rsetkey = (min(len(rows), 2), len(rows[0]) if rows else 0, types)
+                except (AttributeError, IndexError, TypeError):
+                    return None
+            elif name == 'row':
+                rowkey = _ROW if value is not None else None
+            elif name == 'accept_none' or not isinstance(value, _SIMPLE_TYPES):
+                return None
+            else:
+                simplekwargs.append((name, value))
+        # default to True for repository connections, and don't access the user
+        # of web requests without connection since it raises an error
+        if getattr(req, 'cnx', True):
+            user = getattr(req, 'user', None)
+            session = getattr(req, 'session', None)
+            try:
+                groups = frozenset(user.groups) if user is not None else None
+            except Exception:
+                # e.g. closed connection, let the selection fail if it has to
+                return None
+            userkey = (groups, getattr(session, 'anonymous_session', None))
+        else:
+            userkey = None
+        key = [objects, rsetkey, rowkey, tuple(sorted(simplekwargs)), userkey]
+        if params:
+            form = getattr(req, 'form', None)
+            if form is None:
+                return None
+            for param in params:
+                value = form.get(param)
+                if isinstance(value, list):
+                    value = tuple(value)
+                elif not isinstance(value, _SIMPLE_TYPES):
+                    return None
+                key.append(value)
+        return tuple(key)
 
     @property
     def schema(self):
@@ -221,6 +477,27 @@ class ViewsRegistry(CWRegistry):
         assert isinstance(res, bytes)
         return res
 
+    def main_template_stream(self, req, oid='main-template', rset=None, **kwargs):
+        """like :meth:`main_template`, but return an iterator on encoded chunks
+        of the page, rendered while it's consumed, if the template is
+        streamable (see :meth:`cubicweb.view.View.streamable`). The first
+        chunk is rendered before returning, so that errors occurring before
+        anything may be sent are raised by this method.
+        """
+        obj = self.select(oid, req, rset=rset, **kwargs)
+        if obj.binary or req.tracehtml or not obj.streamable():
+            res = obj.render(**kwargs)
+            if isinstance(res, str):
+                res = res.encode(req.encoding)
+            return iter((res,))
+        chunks = obj.render_chunks(**kwargs)
+        first = next(chunks)
+
+        def stream():
+            yield first
+            yield from chunks
+        return stream()
+
     def possible_views(self, req, rset=None, **kwargs):
         """return an iterator on possible views for this result set
 
@@ -330,6 +607,14 @@ class CWRegistryStore(RegistryStore):
                         'uicfg': InstancesRegistry,
                         }
 
+    # registries whose objects are only looked up by identifier or by iterating
+    # over the registry, so that modules registering objects there may be
+    # loaded on first lookup when the `lazy-appobjects` option is set
+    LAZY_REGISTRIES = frozenset(('actions', 'adapters', 'ajax-func', 'components',
+                                 'controllers', 'ctxcomponents', 'facets',
+                                 'formrenderers', 'forms', 'parsers', 'services',
+                                 'urlrewriting', 'views'))
+
     def __init__(self, config, initlog=True):
         if initlog:
             # first init log service
@@ -348,13 +633,20 @@ class CWRegistryStore(RegistryStore):
             sys.path.remove(CW_SOFTWARE_ROOT)
         self.schema = None
         self.initialized = False
+        # lazy loading of appobjects, see register_modnames()
+        self._lazy_lock = threading.RLock()
+        self._lazy_groups = {}
+        self._lazy_properties = {}
+        self._lazy_registered = None
+        self._recording = None
 
     def setdefault(self, regid):
         try:
             return self[regid]
         except RegistryNotFound:
-            self[regid] = self.registry_class(regid)(self)
-            return self[regid]
+            registry = self[regid] = self.registry_class(regid)(self)
+            registry.name = regid
+            return registry
 
     def items(self):
         return [item for item in super(CWRegistryStore, self).items()
@@ -372,6 +664,10 @@ class CWRegistryStore(RegistryStore):
 
     def reset(self):
         CW_EVENT_MANAGER.emit('before-registry-reset', self)
+        for registry in self.values():
+            registry._pending.clear()
+        self._lazy_groups = {}
+        self._lazy_properties = {}
         super(CWRegistryStore, self).reset()
         self._needs_appobject = {}
         # two special registries, propertydefs which care all the property
@@ -393,8 +689,15 @@ class CWRegistryStore(RegistryStore):
     def register_and_replace(self, obj, replaced):
         obj = related_appobject(obj)
         replaced = related_appobject(replaced)
+        if self._recording is not None:
+            self._record_registration(obj)
         super(CWRegistryStore, self).register_and_replace(obj, replaced)
 
+    def unregister(self, obj, registryname=None):
+        if self._recording is not None:
+            self._record_registration(obj, registryname)
+        super(CWRegistryStore, self).unregister(obj, registryname)
+
     def set_schema(self, schema):
         """set instance'schema and load application objects"""
         self._set_schema(schema)
@@ -468,18 +771,222 @@ class CWRegistryStore(RegistryStore):
         CW_EVENT_MANAGER.emit('after-registry-reload')
 
     def load_file(self, filepath, modname):
+        if modname in self._loadedmods:
+            return
         # override to allow some instrumentation (eg localperms)
         modpath = modname.split('.')
         try:
             self.currently_loading_cube = modpath[modpath.index('cubes') + 1]
         except ValueError:
             self.currently_loading_cube = 'cubicweb'
-        return super(CWRegistryStore, self).load_file(filepath, modname)
+        with startupprofile.measure('module', modname):
+            if self._recording is not None:
+                return self._record_load_file(filepath, modname)
+            return super(CWRegistryStore, self).load_file(filepath, modname)
+
+    # lazy loading of appobjects ##############################################
+    #
+    # When the `lazy-appobjects` option is set, modules are first loaded as
+    # usual, while recording in a manifest which (registry, regid) keys each
+    # of them registers objects for. Next times, only modules which can't be
+    # loaded lazily are loaded at startup; others are loaded on first lookup
+    # of one of their keys in their registry. Modules sharing some key or
+    # loading each other are grouped so that they are always loaded together,
+    # in the same order as usual.
+    #
+    # Modules which may not be loaded lazily are those registering objects in
+    # registries not listed in LAZY_REGISTRIES, those having a
+    # `registration_callback`, binding some event callback or using relation
+    # tags (e.g. uicfg) at import time, those registering nothing and modules
+    # grouped with them.
+
+    def register_modnames(self, modnames):
+        """register all objects found in <modnames>"""
+        if not self.config.get('lazy-appobjects') or self.config.debugmode:
+            super(CWRegistryStore, self).register_modnames(modnames)
+            return
+        toload = []
+        for modname in modnames:
+            filepath = pkgutil.find_loader(modname).get_filename()
+            if filepath[-4:] in ('.pyc', '.pyo'):
+                # The source file *must* exists
+                filepath = filepath[:-1]
+            toload.append((filepath, modname))
+        key = self._manifest_key(toload)
+        manifest = self._read_manifest(key)
+        self.reset()
+        self._loadedmods = {}
+        self._toloadmods = dict((modname, filepath) for filepath, modname in toload)
+        if manifest is None:
+            self._recording = {'order': [], 'stack': [], 'keys': {}, 'links': [],
+                               'eager': set()}
+            try:
+                for filepath, modname in toload:
+                    self.load_file(filepath, modname)
+            finally:
+                recording, self._recording = self._recording, None
+            self.initialization_completed()
+            self._write_manifest(self._build_manifest(key, recording))
+            return
+        for modname in manifest['eager']:
+            self.load_file(self._toloadmods[modname], modname)
+        for group, (modnames, keys) in enumerate(manifest['groups']):
+            self._lazy_groups[group] = (modnames, keys)
+            for regname, regid in keys:
+                if regname == 'propertydefs':
+                    self._lazy_properties[regid] = group
+                else:
+                    self.setdefault(regname)._pending[regid] = group
+        self.initialization_completed()
+
+    def _manifest_path(self):
+        return join(self.config.appdatahome, 'appobjects-manifest.pickle')
+
+    def _manifest_key(self, toload):
+        digest = md5(cw_version.encode('utf-8'))
+        for filepath, modname in toload:
+            digest.update(repr((modname, self._mdate(filepath))).encode('utf-8'))
+        return digest.hexdigest()
+
+    def _read_manifest(self, key):
+        try:
+            with open(self._manifest_path(), 'rb') as stream:
+                manifest = pickle.load(stream)
+        except Exception:
+            return None
+        if manifest.get('key') != key:
+            self.info('appobjects manifest is outdated')
+            return None
+        return manifest
+
+    def _write_manifest(self, manifest):
+        path = self._manifest_path()
+        try:
+            # write to a temporary file then rename it so that concurrent
+            # readers never get a partially written manifest
+            fd, tmppath = tempfile.mkstemp(dir=dirname(path))
+            with os.fdopen(fd, 'wb') as stream:
+                pickle.dump(manifest, stream, pickle.HIGHEST_PROTOCOL)
+            os.replace(tmppath, path)
+        except (IOError, OSError) as exc:
+            self.warning('unable to write appobjects manifest %s: %s', path, exc)
+
+    def _record_load_file(self, filepath, modname):
+        recording = self._recording
+        if recording['stack']:
+            recording['links'].append((recording['stack'][-1], modname))
+        recording['order'].append(modname)
+        recording['stack'].append(modname)
+        ncallbacks = _count_event_callbacks()
+        try:
+            result = super(CWRegistryStore, self).load_file(filepath, modname)
+        finally:
+            recording['stack'].pop()
+        module = sys.modules.get(modname)
+        if (_count_event_callbacks() != ncallbacks
+                or hasattr(module, 'registration_callback')
+                or _uses_relation_tags(module)):
+            recording['eager'].add(modname)
+        return result
+
+    def _record_registration(self, obj, registryname=None, oid=None, clear=False):
+        stack = self._recording['stack']
+        if not stack:
+            return
+        keys = self._recording['keys'].setdefault(stack[-1], set())
+        for regname in obj_registries(obj, registryname):
+            keys.add((regname, oid or obj.__regid__))
+        for propid in getattr(obj, 'cw_property_defs', ()):
+            keys.add(('propertydefs', obj._cwpropkey(propid)))
+
+    def _build_manifest(self, key, recording):
+        order = recording['order']
+        keys = recording['keys']
+        # union-find of modules which must be loaded together
+        parents = dict((modname, modname) for modname in order)
+
+        def root(modname):
+            while parents[modname] != modname:
+                modname = parents[modname] = parents[parents[modname]]
+            return modname
+
+        modbykey = {}
+        for modname in order:
+            for regkey in keys.get(modname, ()):
+                if regkey in modbykey:
+                    parents[root(modname)] = root(modbykey[regkey])
+                else:
+                    modbykey[regkey] = modname
+        for modname, loaded in recording['links']:
+            parents[root(loaded)] = root(modname)
+        eager = set(recording['eager'])
+        for modname in order:
+            regnames = set(regname for regname, regid in keys.get(modname, ()))
+            if not regnames or regnames - self.LAZY_REGISTRIES - set(('propertydefs',)):
+                eager.add(modname)
+        eager = set(root(modname) for modname in eager)
+        manifest = {'key': key, 'eager': [], 'groups': []}
+        groups = {}
+        for modname in order:
+            group = root(modname)
+            if group in eager:
+                manifest['eager'].append(modname)
+            elif group in groups:
+                groups[group][0].append(modname)
+                groups[group][1].update(keys[modname])
+            else:
+                groups[group] = ([modname], set(keys[modname]))
+                manifest['groups'].append(groups[group])
+        return manifest
+
+    def _load_lazy_group(self, group):
+        """load modules of the given group, if not yet done, then remove their
+        keys from pending ones
+        """
+        with self._lazy_lock:
+            try:
+                modnames, keys = self._lazy_groups.pop(group)
+            except KeyError:
+                return  # already loaded (or being loaded by this thread)
+            outermost = self._lazy_registered is None
+            if outermost:
+                self._lazy_registered = []
+            try:
+                for modname in modnames:
+                    self.load_file(self._toloadmods[modname], modname)
+            finally:
+                if outermost:
+                    registered, self._lazy_registered = self._lazy_registered, None
+            if outermost:
+                self._lazy_registration_completed(registered)
+            for regname, regid in keys:
+                if regname == 'propertydefs':
+                    self._lazy_properties.pop(regid, None)
+                else:
+                    self[regname]._pending.pop(regid, None)
+
+    def _lazy_registration_completed(self, registered):
+        """equivalent of initialization_completed() for `registered`, a list
+        of (registry, object) lazily registered
+        """
+        for registry, obj in registered:
+            if obj not in dict.get(registry, obj.__regid__, ()):
+                continue  # unregistered or replaced since
+            depends_on = self._needs_appobject.get(obj)
+            if (depends_on is not None and self.config.cleanup_unused_appobjects
+                    and not self._required_appobjects_registered(obj, *depends_on)):
+                self.unregister(obj)
+                continue
+            callback = getattr(obj, '__registered__', None)
+            if callback:
+                callback(registry)
 
     def _set_schema(self, schema):
         """set instance'schema"""
         self.schema = schema
         clear_cache(self, 'rqlhelper')
+        for registry in self.values():
+            registry.clear_selection_cache()
 
     def update_schema(self, schema):
         """update .schema attribute on registered objects, necessary for some
@@ -500,6 +1007,8 @@ class CWRegistryStore(RegistryStore):
         previously unregistered.
         """
         obj = related_appobject(obj)
+        if self._recording is not None:
+            self._record_registration(obj, *args, **kwargs)
         super(CWRegistryStore, self).register(obj, *args, **kwargs)
         depends_on = require_appobject(obj)
         if depends_on is not None:
@@ -516,19 +1025,9 @@ class CWRegistryStore(RegistryStore):
         # catalog generation)
         if self.config.cleanup_unused_appobjects:
             # remove appobjects which depend on other, unexistant appobjects
-            for obj, (regname, regids) in self._needs_appobject.items():
-                try:
-                    registry = self[regname]
-                except RegistryNotFound:
-                    self.debug('unregister %s (no registry %s)', obj, regname)
-                    self.unregister(obj)
-                    continue
-                for regid in regids:
-                    if registry.get(regid):
-                        break
-                else:
-                    self.debug('unregister %s (no %s object in registry %s)',
-                               registry.objid(obj), ' or '.join(regids), regname)
+            # (copy items since required appobjects may be lazily loaded)
+            for obj, (regname, regids) in list(self._needs_appobject.items()):
+                if not self._required_appobjects_registered(obj, regname, regids):
                     self.unregister(obj)
         super(CWRegistryStore, self).initialization_completed()
         if 'uicfg' in self:  # 'uicfg' is not loaded in a pure repository mode
@@ -537,6 +1036,19 @@ class CWRegistryStore(RegistryStore):
                     # don't check rtags if we don't want to cleanup_unused_appobjects
                     rtag.init(self.schema, check=self.config.cleanup_unused_appobjects)
 
+    def _required_appobjects_registered(self, obj, regname, regids):
+        try:
+            registry = self[regname]
+        except RegistryNotFound:
+            self.debug('unregister %s (no registry %s)', obj, regname)
+            return False
+        for regid in regids:
+            if registry.get(regid):
+                return True
+        self.debug('unregister %s (no %s object in registry %s)',
+                   registry.objid(obj), ' or '.join(regids), regname)
+        return False
+
     # rql parsing utilities ####################################################
 
     @property
@@ -562,6 +1074,8 @@ class CWRegistryStore(RegistryStore):
     # properties handling #####################################################
 
     def user_property_keys(self, withsitewide=False):
+        for group in set(self._lazy_properties.values()):
+            self._load_lazy_group(group)
         if withsitewide:
             return sorted(k for k in self['propertydefs']
                           if not k.startswith('sources.'))
@@ -585,6 +1099,10 @@ class CWRegistryStore(RegistryStore):
         try:
             return self['propertydefs'][key]
         except KeyError:
+            if key in self._lazy_properties:
+                self._load_lazy_group(self._lazy_properties[key])
+                if key in self['propertydefs']:
+                    return self['propertydefs'][key]
             if key.startswith('system.version.'):
                 soft = key.split('.')[-1]
                 return {'type': 'String', 'sitewide': True,
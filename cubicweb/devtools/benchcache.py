@@ -0,0 +1,167 @@
+# copyright 2026 LOGILAB S.A. (Paris, FRANCE), all rights reserved.
+# contact http://www.logilab.fr/ -- mailto:contact@logilab.fr
+#
+# This file is part of CubicWeb.
+#
+# CubicWeb is free software: you can redistribute it and/or modify it under the
+# terms of the GNU Lesser General Public License as published by the Free
+# Software Foundation, either version 2.1 of the License, or (at your option)
+# any later version.
+#
+# CubicWeb is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public License along
+# with CubicWeb.  If not, see <http://www.gnu.org/licenses/>.
+"""Usage: python -m cubicweb.devtools.benchcache [OPTIONS]
+
+Micro-benchmark of :class:`cubicweb.utils.QueryCache` under concurrent
+access, compared to a reference implementation taking a global lock on each
+lookup (as QueryCache did until CubicWeb 3.27).
+
+Each thread looks up keys, mostly among a set of frequently used ones, and
+inserts keys missing from the cache, as the querier does.
+
+OPTIONS:
+  -h / --help
+     Display this help message and exit.
+  -t / --nb-threads <num>
+     Comma separated list of number of threads to run (default to 1,2,4,8).
+  -n / --nb-lookups <num>
+     Number of lookups done by each thread (default to 100000).
+  -c / --ceiling <num>
+     Size of the cache (default to 3000).
+"""
+
+import getopt
+import random
+import sys
+import threading
+import time
+from operator import itemgetter
+
+from cubicweb.utils import QueryCache
+
+
+_MARKER = object()
+
+
+class GlobalLockQueryCache(QueryCache):
+    """QueryCache implementation taking its lock on each access, kept as a
+    reference for benchmarks.
+    """
+
+    def __getitem__(self, k):
+        with self._lock:
+            if k in self._permanent:
+                return self._data[k]
+            v = self._transient.get(k, _MARKER)
+            if v is _MARKER:
+                self._transient[k] = 1
+                return self._data[k]
+            if v > self._maxlevel:
+                self._permanent.add(k)
+                self._transient.pop(k, None)
+            else:
+                self._transient[k] += 1
+            return self._data[k]
+
+    def __setitem__(self, k, v):
+        with self._lock:
+            if len(self._data) >= self._max:
+                self._try_to_make_room()
+            self._data[k] = v
+
+    def _try_to_make_room(self):
+        current_size = len(self._data)
+        items = sorted(self._transient.items(), key=itemgetter(1))
+        level = 0
+        for k, v in items:
+            self._data.pop(k, None)
+            self._transient.pop(k, None)
+            if v > level:
+                datalen = len(self._data)
+                if datalen == 0:
+                    return
+                if (current_size - datalen) / datalen > .1:
+                    break
+                level = v
+        else:
+            if len(self._data) >= self._max:
+                if len(self._permanent) >= self._max:
+                    self._clear()
+                else:
+                    to_drop = set(self._data.keys()).difference(self._permanent)
+                    for k in to_drop:
+                        self._data.pop(k, None)
+
+
+def lookups(cache, nblookups, ceiling, seed):
+    """Look up `nblookups` keys in `cache`: 90% of them among ceiling / 2
+    frequently used keys, others among 10 times more occasional keys.
+    """
+    rand = random.Random(seed)
+    hotkeys = ceiling // 2
+    keys = [('hot', rand.randrange(hotkeys)) if rand.random() < .9
+            else ('occasional', rand.randrange(ceiling * 10))
+            for i in range(nblookups)]
+    for key in keys:
+        try:
+            cache[key]
+        except KeyError:
+            cache[key] = key
+
+
+def bench(cacheclass, nbthreads, nblookups, ceiling):
+    """Return the number of lookups per second achieved by `nbthreads`
+    threads on an instance of `cacheclass`.
+    """
+    cache = cacheclass(ceiling)
+    # warm up, so that hot keys are permanent
+    lookups(cache, ceiling * 20, ceiling, -1)
+    threads = [threading.Thread(target=lookups,
+                                args=(cache, nblookups, ceiling, seed))
+               for seed in range(nbthreads)]
+    start = time.time()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return nbthreads * nblookups / (time.time() - start)
+
+
+def usage(status=0):
+    """print usage string and exit"""
+    print(__doc__)
+    sys.exit(status)
+
+
+def run(args):
+    """run the benchmark according to command line arguments"""
+    threads, nblookups, ceiling = (1, 2, 4, 8), 100000, 3000
+    try:
+        opts, args = getopt.getopt(args, 'ht:n:c:',
+                                   ['help', 'nb-threads=', 'nb-lookups=', 'ceiling='])
+    except getopt.GetoptError as exc:
+        print(exc)
+        usage(1)
+    for opt, value in opts:
+        if opt in ('-h', '--help'):
+            usage()
+        elif opt in ('-t', '--nb-threads'):
+            threads = [int(nb) for nb in value.split(',')]
+        elif opt in ('-n', '--nb-lookups'):
+            nblookups = int(value)
+        elif opt in ('-c', '--ceiling'):
+            ceiling = int(value)
+    print('%8s %20s %20s' % ('threads', 'global lock (op/s)', 'QueryCache (op/s)'))
+    for nbthreads in threads:
+        reference = bench(GlobalLockQueryCache, nbthreads, nblookups, ceiling)
+        current = bench(QueryCache, nbthreads, nblookups, ceiling)
+        print('%8s %20d %20d' % (nbthreads, reference, current))
+
+
+if __name__ == '__main__':
+    run(sys.argv[1:])
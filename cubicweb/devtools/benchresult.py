@@ -0,0 +1,151 @@
+# copyright 2026 LOGILAB S.A. (Paris, FRANCE), all rights reserved.
+# contact http://www.logilab.fr/ -- mailto:contact@logilab.fr
+#
+# This file is part of CubicWeb.
+#
+# CubicWeb is free software: you can redistribute it and/or modify it under the
+# terms of the GNU Lesser General Public License as published by the Free
+# Software Foundation, either version 2.1 of the License, or (at your option)
+# any later version.
+#
+# CubicWeb is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public License along
+# with CubicWeb.  If not, see <http://www.gnu.org/licenses/>.
+"""Usage: python -m cubicweb.devtools.benchresult [OPTIONS]
+
+Micro-benchmark of the processing of SQL results by
+:meth:`cubicweb.server.sqlutils.SQLAdapterMixIn.process_result`, compared to a
+reference implementation looking for column callbacks and db-api
+transformations for each cell (as done until CubicWeb 3.27).
+
+Results are read from a fake postgres cursor, one column out of four being
+a boolean one (hence converted), and the last column having a callback, as
+for attributes stored in a file system storage.
+
+OPTIONS:
+  -h / --help
+     Display this help message and exit.
+  -r / --nb-rows <num>
+     Number of rows of results (default to 100000).
+  -c / --nb-columns <num>
+     Comma separated list of number of columns of results (default to 2,8,32).
+"""
+
+import getopt
+import sys
+import time
+
+from cubicweb import Binary
+from cubicweb.server.sqlutils import SQLAdapterMixIn
+
+
+# postgres type codes
+TEXT, BOOLEAN, INTEGER = 25, 16, 23
+
+
+class PerCellSQLAdapter(SQLAdapterMixIn):
+    """SQLAdapterMixIn processing results cell by cell, kept as a reference for
+    benchmarks.
+    """
+
+    def iter_process_result(self, cursor, cnx=None, column_callbacks=None,
+                            converters_cache=None):
+        if not column_callbacks:
+            return self.dbhelper.dbapi_module.process_cursor(cursor, self._dbencoding,
+                                                             Binary)
+        return self._cb_process_result(cursor, column_callbacks, cnx)
+
+    def _cb_process_result(self, cursor, column_callbacks, cnx):
+        descr = cursor.description
+        encoding = self._dbencoding
+        process_value = self._process_value
+        binary = Binary
+        cursor.arraysize = 100
+        while True:
+            results = cursor.fetchmany()
+            if not results:
+                break
+            for line in results:
+                result = []
+                for col, value in enumerate(line):
+                    if value is None:
+                        result.append(value)
+                        continue
+                    cbstack = column_callbacks.get(col, None)
+                    if cbstack is None:
+                        value = process_value(value, descr[col], encoding, binary)
+                    else:
+                        for cb in cbstack:
+                            value = cb(self, cnx, value)
+                    result.append(value)
+                yield result
+
+
+class FakeCursor(object):
+    """cursor returning `nbrows` rows of `nbcols` columns"""
+
+    def __init__(self, nbrows, nbcols):
+        self.description = [('c%s' % i, (BOOLEAN, TEXT, INTEGER, TEXT)[i % 4])
+                            for i in range(nbcols)]
+        row = tuple((1, u'text', 42, None)[i % 4] for i in range(nbcols))
+        self.rows = [row] * nbrows
+        self.arraysize = 1
+        self.index = 0
+
+    def fetchmany(self):
+        start, self.index = self.index, self.index + self.arraysize
+        return self.rows[start:self.index]
+
+
+def fspath_callback(source, cnx, value):
+    return value
+
+
+def bench(adapter, nbrows, nbcols, cache):
+    """Return the number of rows per second processed by `adapter`"""
+    cursor = FakeCursor(nbrows, nbcols)
+    callbacks = {nbcols - 1: [fspath_callback]}
+    start = time.time()
+    adapter.process_result(cursor, 'cnx', callbacks, cache)
+    return nbrows / (time.time() - start)
+
+
+def usage(status=0):
+    """print usage string and exit"""
+    print(__doc__)
+    sys.exit(status)
+
+
+def run(args):
+    """run the benchmark according to command line arguments"""
+    nbrows, columns = 100000, (2, 8, 32)
+    try:
+        opts, args = getopt.getopt(args, 'hr:c:',
+                                   ['help', 'nb-rows=', 'nb-columns='])
+    except getopt.GetoptError as exc:
+        print(exc)
+        usage(1)
+    for opt, value in opts:
+        if opt in ('-h', '--help'):
+            usage()
+        elif opt in ('-r', '--nb-rows'):
+            nbrows = int(value)
+        elif opt in ('-c', '--nb-columns'):
+            columns = [int(nb) for nb in value.split(',')]
+    config = {'db-driver': 'postgres', 'db-name': 'bench'}
+    reference = PerCellSQLAdapter(config)
+    current = SQLAdapterMixIn(config)
+    print('%8s %20s %20s' % ('columns', 'per cell (rows/s)', 'compiled (rows/s)'))
+    for nbcols in columns:
+        cache = {}
+        print('%8s %20d %20d' % (nbcols,
+                                 bench(reference, nbrows, nbcols, None),
+                                 bench(current, nbrows, nbcols, cache)))
+
+
+if __name__ == '__main__':
+    run(sys.argv[1:])
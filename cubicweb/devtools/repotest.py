@@ -139,7 +139,7 @@ class BaseQuerierTC(BaseTestCase):
         self.admin_access = RepoAccess(self.repo, 'admin', FakeRequest)
         self.ueid = self.admin_access._user.eid
         assert self.ueid != -1
-        self.repo._type_cache = {} # clear cache
+        self.repo._type_cache.clear() # clear cache
         do_monkey_patch()
         self._dumb_sessions = []
 
@@ -789,6 +789,9 @@ class Entity(AppObject):
             yield attr
 
     _cw_completed = False
+    # maximum number of entities completed by a single query in cw_complete_many
+    cw_complete_chunk_size = 500
+
     def complete(self, attributes=None, skip_bytes=True, skip_pwd=True): # XXX cw_complete
         """complete this entity by adding missing attributes (i.e. query the
         repository to fill the entity)
@@ -857,6 +860,94 @@ class Entity(AppObject):
                     rrset = self._cw.eid_rset(value)
                 self.cw_set_relation_cache(rtype, role, rrset)
 
+    @classmethod
+    def cw_complete_many(cls, entities, attributes=None, skip_bytes=True,
+                         skip_pwd=True):
+        """complete the given entities as :meth:`complete` would do for each
+        of them, but using a single query per entity type (and per chunk of
+        `cw_complete_chunk_size` entities) instead of a query per entity.
+
+        Entities which are already completed are skipped, as are entities whose
+        attributes could not be fetched (e.g. because they have been deleted),
+        which are left uncompleted.
+        """
+        byetype = {}
+        for entity in entities:
+            assert entity.has_eid()
+            if entity._cw_completed:
+                continue
+            byetype.setdefault(entity.cw_etype, []).append(entity)
+        for etype_entities in byetype.values():
+            for i in range(0, len(etype_entities), cls.cw_complete_chunk_size):
+                chunk = etype_entities[i:i + cls.cw_complete_chunk_size]
+                cls._cw_complete_many(chunk, attributes, skip_bytes, skip_pwd)
+
+    @staticmethod
+    def _cw_complete_many(entities, attributes, skip_bytes, skip_pwd):
+        """complete `entities`, which are all of the same type"""
+        first = entities[0]
+        if attributes is None:
+            attributes = list(first._cw_to_complete_attributes(skip_bytes, skip_pwd))
+            # unreadable attributes are set to None in the cache by
+            # _cw_to_complete_attributes, do it for each entity
+            for entity in entities[1:]:
+                list(entity._cw_to_complete_attributes(skip_bytes, skip_pwd))
+            relations = [(rschema.type, role)
+                         for rschema, role in first._cw_to_complete_relations()]
+            for entity in entities:
+                entity._cw_completed = True
+        else:
+            relations = []
+        # select attributes and relations missing from the cache of at least
+        # one entity
+        attrs = [attr for attr in attributes
+                 if not all(attr in entity.cw_attr_cache for entity in entities)]
+        relations = [(rtype, role) for rtype, role in relations
+                     if not all(entity.cw_relation_cached(rtype, role)
+                                for entity in entities)]
+        if not (attrs or relations):
+            return
+        varmaker = rqlvar_maker()
+        V = next(varmaker)
+        selected = [V]
+        restrictions = ['%s eid IN (%s)' % (V, ','.join(str(entity.eid)
+                                                          for entity in entities))]
+        for attr in attrs:
+            var = next(varmaker)
+            restrictions.append('%s %s %s' % (V, attr, var))
+            selected.append(var)
+        for rtype, role in relations:
+            # see Entity.complete for the outer join and assumptions on the
+            # relation
+            var = next(varmaker)
+            restrictions.append('%s %s %s?' % (V, rtype, var))
+            selected.append(var)
+        req = first._cw
+        rql = 'Any %s WHERE %s' % (','.join(selected), ', '.join(restrictions))
+        rows = dict((row[0], row) for row in req.execute(rql, build_descr=False))
+        lastattr = len(attrs) + 1
+        for entity in entities:
+            try:
+                row = rows[entity.eid]
+            except KeyError:
+                entity._cw_completed = False
+                continue
+            attr_cache = entity.cw_attr_cache
+            for i, attr in enumerate(attrs, 1):
+                if attr not in attr_cache:
+                    attr_cache[attr] = row[i]
+            for i, (rtype, role) in enumerate(relations, lastattr):
+                if entity.cw_relation_cached(rtype, role):
+                    continue
+                value = row[i]
+                if value is None:
+                    rrset = ResultSet([], 'Any Y WHERE X %s Y, X eid %%(x)s' % rtype,
+                                      {'x': entity.eid})
+                    rrset.req = req
+                else:
+                    rrset = req.eid_rset(value)
+                entity.cw_set_relation_cache(rtype, role, rrset)
+
     def cw_attr_value(self, name):
         """get value for the attribute relation <name>, query the repository
         to get the value if necessary.
@@ -927,7 +1018,7 @@ class Entity(AppObject):
         if cacheable:
             self.cw_set_relation_cache(rtype, role, rset)
         if entities:
-            return tuple(rset.entities())
+            return tuple(rset.entities_bulk())
         else:
             return rset
 
@@ -1189,7 +1280,7 @@ class Entity(AppObject):
     def cw_set_relation_cache(self, rtype, role, rset):
         """set cached values for the given relation"""
         if rset:
-            related = tuple(rset.entities(0))
+            related = tuple(rset.entities_bulk(0))
             rschema = self._cw.vreg.schema.rschema(rtype)
             if role == 'subject':
                 rcard = rschema.rdef(self.e_schema, related[0].e_schema).cardinality[1]
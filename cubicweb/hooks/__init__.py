@@ -22,6 +22,7 @@
 from datetime import timedelta, datetime
 
 from cubicweb.server import hook
+from cubicweb.statsd_logger import statsd_g
 
 class TransactionsCleanupStartupHook(hook.Hook):
     """start task to cleanup transaction data"""
@@ -45,6 +46,30 @@ class TransactionsCleanupStartupHook(hook.Hook):
             self.repo.looping_task(60*60*24, cleanup_old_transactions,
                                    self.repo)
 
+class FTIQueueStartupHook(hook.Hook):
+    """start task to index entities queued for full text indexation"""
+    __regid__ = 'cw.looping-tasks.fti-queue'
+    events = ('server_startup',)
+
+    def __call__(self):
+        if not self.repo.has_scheduler():
+            return
+        if not self.repo.system_source.fti_queue:
+            return
+        def index_pending_entities(repo=self.repo):
+            source = repo.system_source
+            with repo.internal_cnx() as cnx:
+                size, lag = source.fti_queue_stats(cnx)
+                statsd_g('fti_queue_size', size)
+                statsd_g('fti_queue_lag', int(lag))
+                if size:
+                    repo.info('%s entities queued for full text indexation, '
+                              'oldest for %ds', size, lag)
+                while source.fti_index_pending(cnx):
+                    cnx.commit()
+        self.repo.looping_task(self.repo.config['async-full-text-indexation-interval'],
+                               index_pending_entities, self.repo)
+
 class UpdateFeedsStartupHook(hook.Hook):
     """start task to update datafeed based sources"""
     __regid__ = 'cw.looping-tasks.update-feeds'
@@ -0,0 +1,90 @@
+# copyright 2026 LOGILAB S.A. (Paris, FRANCE), all rights reserved.
+# contact http://www.logilab.fr/ -- mailto:contact@logilab.fr
+#
+# This file is part of CubicWeb.
+#
+# CubicWeb is free software: you can redistribute it and/or modify it under the
+# terms of the GNU Lesser General Public License as published by the Free
+# Software Foundation, either version 2.1 of the License, or (at your option)
+# any later version.
+#
+# CubicWeb is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public License along
+# with CubicWeb.  If not, see <http://www.gnu.org/licenses/>.
+"""Core hooks: invalidate fragments of modified entities in the fragment cache
+(see :mod:`cubicweb.web.fragmentcache`)
+"""
+
+from cubicweb.predicates import is_instance
+from cubicweb.server import hook
+
+
+def fragment_cache(cnx):
+    """return the fragment cache, or None if there is none"""
+    return getattr(cnx.vreg.config, 'fragment_cache', None)
+
+
+class _InvalidateFragmentsOp(hook.DataOperationMixIn, hook.Operation):
+    """invalidate fragments of entities whose eid has been collected once the
+    transaction has been committed
+    """
+
+    def postcommit_event(self):
+        cache = fragment_cache(self.cnx)
+        if cache is not None:
+            cache.invalidate(self.get_data())
+
+
+class _ClearFragmentsOp(hook.Operation):
+    """clear the whole fragment cache once the transaction has been committed"""
+
+    def postcommit_event(self):
+        cache = fragment_cache(self.cnx)
+        if cache is not None:
+            cache.clear()
+
+
+class FragmentCacheHook(hook.Hook):
+    __abstract__ = True
+    category = 'fragmentcache'
+
+
+class InvalidateEntityFragmentsHook(FragmentCacheHook):
+    """an entity has been updated or deleted: invalidate its fragments"""
+    __regid__ = 'fragmentcache.invalidate_entity'
+    events = ('after_update_entity', 'after_delete_entity')
+
+    def __call__(self):
+        if fragment_cache(self._cw) is not None:
+            _InvalidateFragmentsOp.get_instance(self._cw).add_data(self.entity.eid)
+
+
+class InvalidateRelationFragmentsHook(FragmentCacheHook):
+    """a relation has been added or removed: invalidate fragments of both
+    entities
+    """
+    __regid__ = 'fragmentcache.invalidate_relation'
+    events = ('after_add_relation', 'after_delete_relation')
+
+    def __call__(self):
+        if fragment_cache(self._cw) is not None:
+            op = _InvalidateFragmentsOp.get_instance(self._cw)
+            op.add_data(self.eidfrom)
+            op.add_data(self.eidto)
+
+
+class ClearFragmentsHook(FragmentCacheHook):
+    """a site wide property may change the output of any view: clear the whole
+    cache
+    """
+    __regid__ = 'fragmentcache.clear'
+    __select__ = FragmentCacheHook.__select__ & is_instance('CWProperty')
+    events = ('after_add_entity', 'after_update_entity', 'after_delete_entity')
+
+    def __call__(self):
+        if fragment_cache(self._cw) is not None:
+            _ClearFragmentsOp(self._cw)
@@ -0,0 +1,63 @@
+# copyright 2026 LOGILAB S.A. (Paris, FRANCE), all rights reserved.
+# contact http://www.logilab.fr/ -- mailto:contact@logilab.fr
+#
+# This file is part of CubicWeb.
+#
+# CubicWeb is free software: you can redistribute it and/or modify it under the
+# terms of the GNU Lesser General Public License as published by the Free
+# Software Foundation, either version 2.1 of the License, or (at your option)
+# any later version.
+#
+# CubicWeb is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public License along
+# with CubicWeb.  If not, see <http://www.gnu.org/licenses/>.
+"""Core hooks: invalidate cached results of queries involving modified entity or
+relation types (see :mod:`cubicweb.web.querycache`)
+"""
+
+from cubicweb.server import hook
+
+
+def query_results_cache(cnx):
+    """return the query results cache, or None if there is none"""
+    return getattr(cnx.vreg.config, 'query_results_cache', None)
+
+
+class _InvalidateQueryResultsOp(hook.DataOperationMixIn, hook.Operation):
+    """invalidate entity and relation types which have been collected once the
+    transaction has been committed
+    """
+
+    def postcommit_event(self):
+        cache = query_results_cache(self.cnx)
+        if cache is not None:
+            cache.invalidate(self.get_data())
+
+
+class QueryCacheHook(hook.Hook):
+    __abstract__ = True
+    category = 'querycache'
+
+
+class InvalidateEntityTypeHook(QueryCacheHook):
+    """an entity has been added, updated or deleted: invalidate its type"""
+    __regid__ = 'querycache.invalidate_etype'
+    events = ('after_add_entity', 'after_update_entity', 'after_delete_entity')
+
+    def __call__(self):
+        if query_results_cache(self._cw) is not None:
+            _InvalidateQueryResultsOp.get_instance(self._cw).add_data(self.entity.cw_etype)
+
+
+class InvalidateRelationTypeHook(QueryCacheHook):
+    """a relation has been added or removed: invalidate its type"""
+    __regid__ = 'querycache.invalidate_rtype'
+    events = ('after_add_relation', 'after_delete_relation')
+
+    def __call__(self):
+        if query_results_cache(self._cw) is not None:
+            _InvalidateQueryResultsOp.get_instance(self._cw).add_data(self.rtype)
@@ -27,7 +27,13 @@ from cubicweb import Unauthorized
 from cubicweb.server import BEFORE_ADD_RELATIONS, ON_COMMIT_ADD_RELATIONS, hook
 
 
-def check_entity_attributes(cnx, entity, action, editedattrs=None):
+def check_entity_attributes(cnx, entity, action, editedattrs=None,
+                            etypechecked=False):
+    """check permission to do `action` on the edited attributes of `entity`
+
+    `etypechecked` may be set to True if the action is known to be granted on
+    the entity itself.
+    """
     eid = entity.eid
     eschema = entity.e_schema
     # ._cw_skip_security_attributes is there to bypass security for attributes
@@ -35,7 +41,6 @@ def check_entity_attributes(cnx, entity, action, editedattrs=None):
     if editedattrs is None:
         editedattrs = entity.cw_edited
     dontcheck = editedattrs.skip_security
-    etypechecked = False
     for attr in editedattrs:
         if attr in dontcheck:
             continue
@@ -73,9 +78,19 @@ def check_entity_attributes(cnx, entity, action, editedattrs=None):
 class CheckEntityPermissionOp(hook.DataOperationMixIn, hook.LateOperation):
     def precommit_event(self):
         cnx = self.cnx
+        # check permissions on entities of the same type by batch, so that
+        # each rql expression is evaluated once for all of them
+        data_by_action = {}
         for eid, action, edited in self.get_data():
             entity = cnx.entity_from_eid(eid)
-            check_entity_attributes(cnx, entity, action, edited)
+            data_by_action.setdefault((entity.e_schema, action), []).append(
+                (entity, edited))
+        for (eschema, action), data in data_by_action.items():
+            granted = eschema.has_perm_many(
+                cnx, action, [entity.eid for entity, edited in data])
+            for entity, edited in data:
+                check_entity_attributes(cnx, entity, action, edited,
+                                        etypechecked=entity.eid in granted)
 
 
 class CheckRelationPermissionOp(hook.DataOperationMixIn, hook.LateOperation):
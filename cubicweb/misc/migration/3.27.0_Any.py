@@ -2,3 +2,12 @@ option_removed('host')
 option_removed('uid')
 option_removed('webserver-threadpool-size')
 drop_entity_type('CWCache')
+
+typemap = repo.system_source.dbhelper.TYPE_MAPPING
+sql('CREATE TABLE fti_pending (eid INTEGER NOT NULL, queued_at %s NOT NULL)'
+    % typemap['Float'])
+sql('CREATE INDEX fti_pending_eid_idx ON fti_pending(eid)')
+sql('CREATE TABLE web_sessions (sid CHAR(64) PRIMARY KEY NOT NULL, data %s, '
+    'last_access %s NOT NULL)' % (typemap['Bytes'], typemap['Float']))
+sql('CREATE INDEX web_sessions_last_access_idx ON web_sessions(last_access)')
+commit()
@@ -24,7 +24,8 @@ import logging
 from warnings import warn
 from operator import eq
 
-from logilab.common.registry import Predicate, objectify_predicate
+from logilab.common.registry import (Predicate, AndPredicate, OrPredicate, NotPredicate,
+                                     objectify_predicate, yes)
 
 from yams.schema import BASE_TYPES, role_name
 from rql.nodes import Function
@@ -35,6 +36,45 @@ from cubicweb.uilib import eid_param
 from cubicweb.schema import split_expression
 
 
+# selection cache ##############################################################
+#
+# Predicates whose score only depends on the user's groups and authentication
+# state, on the number of rows (none, one or more) and entity types of the
+# result set, on simple keyword arguments (strings, numbers...) of the input
+# context and on some form parameters declare it by setting their `cacheable`
+# attribute to True, and `form_params` to the names of those form parameters.
+# When all candidates of a selection only use such predicates, its result may
+# be cached by the registry (see the `selection-cache-size` option).
+
+def cacheable_predicate(predicate):
+    """class decorator marking `predicate` as cacheable, usable along with
+    `objectify_predicate`
+    """
+    predicate.cacheable = True
+    return predicate
+
+
+def predicate_form_params(predicate):
+    """return the set of form parameters the score of `predicate` depends on if
+    it may be cached, else None
+    """
+    if isinstance(predicate, (AndPredicate, OrPredicate)):
+        params = set()
+        for subpredicate in predicate.selectors:
+            subparams = predicate_form_params(subpredicate)
+            if subparams is None:
+                return None
+            params |= subparams
+        return params
+    if isinstance(predicate, NotPredicate):
+        return predicate_form_params(predicate.selector)
+    if isinstance(predicate, yes):
+        return set()
+    if getattr(predicate, 'cacheable', False):
+        return set(getattr(predicate, 'form_params', ()))
+    return None
+
+
 # abstract predicates / mixin helpers ###########################################
 
 class PartialPredicateMixIn(object):
@@ -278,6 +318,7 @@ class match_kwargs(ExpectedValuePredicate):
     the input context unless `mode` keyword argument is given to 'any',
     in which case a single matching parameter is enough.
     """
+    cacheable = True
 
     def _values_set(self, cls, req, **kwargs):
         return kwargs
@@ -354,6 +395,7 @@ class configuration_values(Predicate):
     """Return 1 if the instance has an option set to a given value(s) in its
     configuration file.
     """
+    cacheable = True
     # XXX this predicate could be evaluated on startup
     def __init__(self, key, values):
         self._key = key
@@ -375,6 +417,7 @@ class configuration_values(Predicate):
 
 # rset predicates ##############################################################
 
+@cacheable_predicate
 @objectify_predicate
 def none_rset(cls, req, rset=None, **kwargs):
     """Return 1 if the result set is None (eg usually not specified)."""
@@ -384,6 +427,7 @@ def none_rset(cls, req, rset=None, **kwargs):
 
 
 # XXX == ~ none_rset
+@cacheable_predicate
 @objectify_predicate
 def any_rset(cls, req, rset=None, **kwargs):
     """Return 1 for any result set, whatever the number of rows in it, even 0."""
@@ -392,6 +436,7 @@ def any_rset(cls, req, rset=None, **kwargs):
     return 0
 
 
+@cacheable_predicate
 @objectify_predicate
 def nonempty_rset(cls, req, rset=None, **kwargs):
     """Return 1 for result set containing one ore more rows."""
@@ -401,6 +446,7 @@ def nonempty_rset(cls, req, rset=None, **kwargs):
 
 
 # XXX == ~ nonempty_rset
+@cacheable_predicate
 @objectify_predicate
 def empty_rset(cls, req, rset=None, **kwargs):
     """Return 1 for result set which doesn't contain any row."""
@@ -410,6 +456,7 @@ def empty_rset(cls, req, rset=None, **kwargs):
 
 
 # XXX == multi_lines_rset(1)
+@cacheable_predicate
 @objectify_predicate
 def one_line_rset(cls, req, rset=None, row=None, **kwargs):
     """Return 1 if the result set is of size 1, or greater but a specific row in
@@ -439,6 +486,11 @@ class multi_lines_rset(Predicate):
         self.expected = expected
         self.operator = operator
 
+    @property
+    def cacheable(self):
+        # the cache only knows whether there are none, one or more rows
+        return self.expected is None
+
     def match_expected(self, num):
         if self.expected is None:
             return num > 1
@@ -453,6 +505,7 @@ class multi_columns_rset(multi_lines_rset):
     per row. Else (`nb` is None), return 1 if the result set contains *at least*
     two columns per row. Return 0 for empty result set.
     """
+    cacheable = True
 
     def __call__(self, cls, req, rset=None, **kwargs):
         # 'or 0' since we *must not* return None. Also don't use rset.rows so
@@ -489,7 +542,12 @@ class paginated_rset(Predicate):
             if page_size is None:
                 page_size_prop = getattr(cls, 'page_size_property', 'navigation.page-size')
                 page_size = req.property_value(page_size_prop)
-        if len(rset) <= (page_size*self.nbpages):
+        if rset.total_rowcount is not None:
+            # only a page of results has been fetched
+            rowcount = rset.total_rowcount
+        else:
+            rowcount = len(rset)
+        if rowcount <= (page_size*self.nbpages):
             return 0
         return self.nbpages
 
@@ -513,6 +571,7 @@ def sorted_rset(cls, req, rset=None, **kwargs):
 
 
 # XXX == multi_etypes_rset(1)
+@cacheable_predicate
 @objectify_predicate
 def one_etype_rset(cls, req, rset=None, col=0, **kwargs):
     """Return 1 if the result set contains entities which are all of the same
@@ -532,6 +591,7 @@ class multi_etypes_rset(multi_lines_rset):
     context, or in column 0. If `nb` is None, return 1 if the result set contains
     *at least* two different types of entities.
     """
+    cacheable = True
 
     def __call__(self, cls, req, rset=None, col=0, **kwargs):
         # 'or 0' since we *must not* return None
@@ -574,6 +634,12 @@ class non_final_entity(EClassPredicate):
     See :class:`~cubicweb.predicates.EClassPredicate` documentation for entity
     class lookup / score rules according to the input context.
     """
+
+    @property
+    def cacheable(self):
+        # the cache doesn't know about None values in the result set's column
+        return self.accept_none
+
     def score(self, cls, req, etype):
         if etype in BASE_TYPES:
             return 0
@@ -602,6 +668,7 @@ class is_instance(EClassPredicate):
     .. note:: the score will reflect class proximity so the most specific object
               will be selected.
     """
+    cacheable = non_final_entity.cacheable
 
     def __init__(self, *expected_etypes, **kwargs):
         super(is_instance, self).__init__(**kwargs)
@@ -919,13 +986,13 @@ class has_permission(EntityPredicate):
                         return 0
                 score += 1
             if need_local_check:
-                # check local role for entities of necessary types
-                for i, row in enumerate(rset):
-                    if not rset.description[i][col] in need_local_check:
-                        continue
-                    # micro-optimisation instead of calling self.score(req,
-                    # rset, i, col): rset may be large
-                    if not rset.get_entity(i, col).cw_has_perm(action):
+                # check local role for entities of necessary types, by batch
+                # instead of calling self.score(req, rset, i, col) for each
+                # row: rset may be large
+                for eschema in need_local_check:
+                    eids = set(row[col] for i, row in enumerate(rset)
+                               if rset.description[i][col] == eschema)
+                    if eschema.has_perm_many(req, action, eids) != eids:
                         return 0
                 score += 1
             return score
@@ -1118,6 +1185,7 @@ class match_transition(ExpectedValuePredicate):
 
 # logged user predicates ########################################################
 
+@cacheable_predicate
 @objectify_predicate
 def no_cnx(cls, req, **kwargs):
     """Return 1 if the web session has no connection set. This occurs when
@@ -1128,6 +1196,7 @@ def no_cnx(cls, req, **kwargs):
     return 0
 
 
+@cacheable_predicate
 @objectify_predicate
 def authenticated_user(cls, req, **kwargs):
     """Return 1 if the user is authenticated (i.e. not the anonymous user).
@@ -1137,6 +1206,7 @@ def authenticated_user(cls, req, **kwargs):
     return 1
 
 
+@cacheable_predicate
 @objectify_predicate
 def anonymous_user(cls, req, **kwargs):
     """Return 1 if the user is not authenticated (i.e. is the anonymous user).
@@ -1160,6 +1230,10 @@ class match_user_groups(ExpectedValuePredicate):
     * else check all entities in `col` (default to 0) are owned by the user
     """
 
+    @property
+    def cacheable(self):
+        return 'owners' not in self.expected
+
     def __call__(self, cls, req, rset=None, row=None, col=0, **kwargs):
         if not getattr(req, 'cnx', True): # default to True for repo session instances
             return 0
@@ -1214,6 +1288,7 @@ class match_view(ExpectedValuePredicate):
 
 
 class match_context(ExpectedValuePredicate):
+    cacheable = True
 
     def __call__(self, cls, req, context=None, **kwargs):
         if not context in self.expected:
@@ -1276,6 +1351,7 @@ class match_form_params(ExpectedValuePredicate):
     the input context unless `mode` keyword argument is given to 'any',
     in which case a single matching parameter is enough.
     """
+    cacheable = True
 
     def __init__(self, *expected, **kwargs):
         """override default __init__ to allow either named or positional
@@ -1292,6 +1368,10 @@ class match_form_params(ExpectedValuePredicate):
         else:
             super(match_form_params, self).__init__(kwargs)
 
+    @property
+    def form_params(self):
+        return frozenset(self.expected)
+
     def _values_set(self, cls, req, **kwargs):
         return req.form
 
@@ -1321,6 +1401,8 @@ class match_form_id(ExpectedValuePredicate):
     """return non-zero if request form identifier is the one specified as
     initializer argument, or is among initializer arguments if `mode` == 'any'.
     """
+    cacheable = True
+    form_params = ('__form_id',)
 
     def _values_set(self, cls, req, **kwargs):
         try:
@@ -1343,6 +1425,7 @@ class specified_etype_implements(is_instance):
     This predicate is usually used by views holding entity creation forms (since
     we've no result set to work on).
     """
+    cacheable = False
 
     def __call__(self, cls, req, **kwargs):
         try:
@@ -1403,6 +1486,7 @@ class match_exception(ExpectedValuePredicate):
         return 0
 
 
+@cacheable_predicate
 @objectify_predicate
 def debug_mode(cls, req, rset=None, **kwargs):
     """Return 1 if running in debug mode."""
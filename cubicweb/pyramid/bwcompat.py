@@ -22,12 +22,14 @@
 
 import sys
 import logging
+from collections.abc import Iterator
 
 from pyramid import security
 from pyramid import tweens
 from pyramid.httpexceptions import HTTPSeeOther
 from pyramid import httpexceptions
 from pyramid.settings import asbool
+from pyramid.response import FileIter, _BLOCK_SIZE
 
 import cubicweb
 import cubicweb.web
@@ -42,6 +44,60 @@ from cubicweb.pyramid.core import cw_to_pyramid
 log = logging.getLogger(__name__)
 
 
+def file_app_iter(request, fileobj):
+    """return an iterator on the content of `fileobj`, using the
+    `wsgi.file_wrapper` of the server if any (which may use `sendfile`)
+    """
+    file_wrapper = request.environ.get('wsgi.file_wrapper')
+    if file_wrapper is not None:
+        return file_wrapper(fileobj, _BLOCK_SIZE)
+    return FileIter(fileobj, _BLOCK_SIZE)
+
+
+class _StreamedAppIter(object):
+    """iterator on chunks of a page rendered while it's sent, calling deferred
+    finished callbacks of the request when it's closed by the server, even if
+    iteration didn't start (e.g. for HEAD requests) or was interrupted (e.g.
+    because the client disconnected), or once it's exhausted.
+    """
+
+    def __init__(self, request, chunks, callbacks):
+        self.request = request
+        self.chunks = chunks
+        self.callbacks = callbacks
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            return next(self.chunks)
+        except BaseException:
+            self.close()
+            raise
+
+    def close(self):
+        callbacks, self.callbacks = self.callbacks, ()
+        try:
+            close = getattr(self.chunks, 'close', None)
+            if close is not None:
+                close()
+        finally:
+            for callback in callbacks:
+                callback(self.request)
+
+
+def streamed_app_iter(request, chunks):
+    """return an iterator on `chunks` of a page rendered while it's sent.
+    Finished callbacks of the request (which notably close its CubicWeb
+    connection) are called once it's closed or exhausted instead of when the
+    handler returns.
+    """
+    callbacks = list(request.finished_callbacks)
+    request.finished_callbacks.clear()
+    return _StreamedAppIter(request, chunks, callbacks)
+
+
 class PyramidSessionHandler(object):
     """A CW Session handler that rely on the pyramid API to fetch the needed
     informations.
@@ -118,7 +174,14 @@ class CubicWebPyramidHandler(object):
                 # content = self.appli.ajax_error_handler(req, ex)
                 raise
 
-            if content is not None:
+            if hasattr(content, 'read'):
+                # static files controllers return opened files, let the server
+                # send them without copying them if it can
+                request.response.app_iter = file_app_iter(request, content)
+            elif isinstance(content, Iterator):
+                # pages rendered in streaming mode
+                request.response.app_iter = streamed_app_iter(request, content)
+            elif content is not None:
                 request.response.body = content
 
         except LogOut as ex:
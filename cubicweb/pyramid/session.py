@@ -26,6 +26,17 @@ stored in the database, which allows to run a Cubicweb instance
 without having to set up a session storage (like redis or memcache)
 solution.
 
+Two session factories are available for this purpose:
+
+:CWSessionFactory: stores session data in ``CWSession`` entities, using RQL.
+   This is the default.
+
+:CWSQLSessionFactory: stores session data in the ``web_sessions`` system
+   table using plain SQL. Data is only written back when it has changed, the
+   last access time is refreshed at most once every ``reissue_time`` seconds
+   and expired sessions are deleted by batches. It is selected by setting
+   ``cubicweb.session.backend`` to ``sql`` in the pyramid configuration file.
+
 However, for production systems, it is greatly advised to use such a
 storage solution for the sessions.
 
@@ -85,7 +96,9 @@ For the record, regarding session handling:
 """
 
 import logging
+import os
 from contextlib import contextmanager
+from time import time
 
 from pyramid.compat import pickle
 from pyramid.session import SignedCookieSessionFactory, JSONSerializer, PickleSerializer
@@ -271,13 +284,190 @@ def CWSessionFactory(
     return CWSession
 
 
+def expire_sessions(cnx, timeout, batchsize=1000):
+    """Delete at most `batchsize` sessions of the ``web_sessions`` table which
+    have not been accessed for `timeout` seconds, and return the number of
+    deleted sessions.
+
+    Transaction should be committed by the caller.
+    """
+    cursor = cnx.system_sql(
+        'DELETE FROM web_sessions WHERE sid IN ('
+        'SELECT sid FROM web_sessions WHERE last_access < %%(limit)s LIMIT %d)'
+        % batchsize, {'limit': time() - timeout})
+    return cursor.rowcount
+
+
+def CWSQLSessionFactory(
+        secret,
+        cookie_name='session',
+        max_age=None,
+        path='/',
+        domain=None,
+        secure=False,
+        httponly=True,
+        set_on_exception=True,
+        timeout=1200,
+        reissue_time=120,
+        hashalg='sha512',
+        salt='pyramid.session.',
+        serializer=None,
+        expire_interval=60,
+        expire_batchsize=1000):
+    """ A pyramid session factory that store session data in the
+    ``web_sessions`` table of the CubicWeb system database, using plain SQL.
+
+    Compared to :func:`CWSessionFactory`:
+
+    * session data is loaded by a single SQL query, only when the session is
+      accessed,
+
+    * it is written back only when it has changed, else the last access time
+      of the session is refreshed if it is older than `reissue_time` seconds,
+
+    * every `expire_interval` seconds, at most `expire_batchsize` sessions
+      which have not been accessed for `timeout` seconds are deleted while
+      writing a session.
+    """
+
+    SignedCookieSession = SignedCookieSessionFactory(
+        secret,
+        cookie_name=cookie_name,
+        max_age=max_age,
+        path=path,
+        domain=domain,
+        secure=secure,
+        httponly=httponly,
+        set_on_exception=set_on_exception,
+        timeout=timeout,
+        reissue_time=reissue_time,
+        hashalg=hashalg,
+        salt=salt,
+        serializer=serializer if serializer else JSONSerializerWithPickleFallback())
+
+    class CWSQLSession(SignedCookieSession):
+        # time of the last expiration of old sessions, shared by all sessions
+        # of this factory
+        _last_expiration = [time()]
+
+        def __init__(self, request):
+            # _set_accessed will be called by the super __init__.
+            # Setting _loaded to True inhibates it.
+            self._loaded = True
+            # pickled data and last access time as stored in the database
+            self._stored_data = None
+            self._stored_access = None
+
+            # the super __init__ will load a single value in the dictionnary,
+            # the session id.
+            super(CWSQLSession, self).__init__(request)
+
+            # Remove the session id from the dict
+            self.sessionid = self.pop('sessionid', None)
+            self.repo = request.registry['cubicweb.repository']
+
+            # We need to lazy-load only for existing sessions
+            self._loaded = self.sessionid is None
+
+        @logerrors(log)
+        def _set_accessed(self, value):
+            self._accessed = value
+
+            if self._loaded:
+                return
+
+            with unsafe_cnx_context_manager(self.request) as cnx:
+                row = cnx.system_sql(
+                    'SELECT data, last_access FROM web_sessions WHERE sid=%(sid)s',
+                    {'sid': self.sessionid}).fetchone()
+            # set _loaded before updating the dictionary, since it calls
+            # _set_accessed again
+            self._loaded = True
+            if row is not None:
+                self._stored_data = self.repo.system_source.binary_to_str(row[0])
+                self._stored_access = row[1]
+                dict.update(self, pickle.loads(self._stored_data))
+
+        def _get_accessed(self):
+            return self._accessed
+
+        accessed = property(_get_accessed, _set_accessed)
+
+        def _save(self, cnx, now):
+            """write session data or refresh its last access time if needed,
+            and return True if something has been written
+            """
+            data = pickle.dumps(dict(self))
+            args = {'sid': self.sessionid, 'last_access': now}
+            if data == self._stored_data:
+                if (self._reissue_time is not None
+                        and now - self._stored_access <= self._reissue_time):
+                    return False
+                cnx.system_sql('UPDATE web_sessions SET last_access=%(last_access)s '
+                               'WHERE sid=%(sid)s', args)
+                return True
+            args['data'] = self.repo.system_source._binary(data)
+            if self._stored_data is not None:
+                cursor = cnx.system_sql(
+                    'UPDATE web_sessions SET data=%(data)s, last_access=%(last_access)s '
+                    'WHERE sid=%(sid)s', args)
+                if cursor.rowcount:
+                    return True
+                # session has been expired meanwhile
+            cnx.system_sql('INSERT INTO web_sessions (sid, data, last_access) '
+                           'VALUES (%(sid)s, %(data)s, %(last_access)s)', args)
+            return True
+
+        @logerrors(log)
+        def _set_cookie(self, response):
+            now = time()
+            if self.sessionid is None:
+                self.sessionid = os.urandom(32).hex()
+            with self.repo.internal_cnx() as cnx:
+                changes = self._save(cnx, now)
+                if (self._timeout is not None
+                        and now - self._last_expiration[0] > expire_interval):
+                    self._last_expiration[0] = now
+                    changes = expire_sessions(cnx, self._timeout,
+                                              expire_batchsize) or changes
+                if changes:
+                    cnx.commit()
+
+            # Only if needed actually set the cookie
+            if self.new or self.accessed - self.renewed > self._reissue_time:
+                dict.clear(self)
+                dict.__setitem__(self, 'sessionid', self.sessionid)
+                return super(CWSQLSession, self)._set_cookie(response)
+
+            return True
+
+    return CWSQLSession
+
+
+SESSION_FACTORIES = {
+    'entity': CWSessionFactory,
+    'sql': CWSQLSessionFactory,
+}
+
+
 def includeme(config):
     """ Activate the CubicWeb session factory.
 
     Usually called via ``config.include('cubicweb.pyramid.auth')``.
 
+    The factory is selected using the ``cubicweb.session.backend`` setting,
+    either ``entity`` (the default, see :func:`CWSessionFactory`) or ``sql``
+    (see :func:`CWSQLSessionFactory`).
+
     See also :ref:`defaults_module`
     """
-    secret = config.registry.settings['cubicweb.session.secret']
-    session_factory = CWSessionFactory(secret)
+    settings = config.registry.settings
+    secret = settings['cubicweb.session.secret']
+    backend = settings.get('cubicweb.session.backend', 'entity')
+    try:
+        factory = SESSION_FACTORIES[backend]
+    except KeyError:
+        raise ValueError('unknown session backend %r, should be one of %s'
+                         % (backend, ', '.join(sorted(SESSION_FACTORIES))))
+    session_factory = factory(secret)
     config.set_session_factory(session_factory)
@@ -1,10 +1,12 @@
 # -*- coding: utf-8 -*-
+import os
 from io import BytesIO
 
 import webtest
 
 import pyramid.request
 
+from cubicweb.pyramid import bwcompat
 from cubicweb.pyramid.core import CubicWebPyramidRequest
 from cubicweb.pyramid.test import PyramidCWTest
 
@@ -46,6 +48,60 @@ class WSGIAppTest(PyramidCWTest):
 
         self.assertEqual(content, req.content.read())
 
+    def test_static_file(self):
+        wrapped = []
+
+        def file_wrapper(fileobj, block_size):
+            wrapped.append(fileobj)
+            return iter(lambda: fileobj.read(block_size), b'')
+
+        dirpath, rid = self.config.locate_resource('cubicweb.js')
+        with open(os.path.join(dirpath, rid), 'rb') as f:
+            content = f.read()
+        res = self.webapp.get('/data/cubicweb.js',
+                              extra_environ={'wsgi.file_wrapper': file_wrapper})
+        self.assertEqual(res.body, content)
+        self.assertEqual(res.content_length, len(content))
+        self.assertEqual(len(wrapped), 1)
+        res = self.webapp.get('/data/cubicweb.js', headers={'Accept-Encoding': 'gzip'})
+        # webtest decodes gzip encoded responses
+        self.assertTrue(res.headers['ETag'].endswith('.gz"'))
+        self.assertEqual(res.body, content)
+
+    def test_streamed_page(self):
+        self.config.global_set_option('streaming-rendering', True)
+        self.addCleanup(self.config.global_set_option, 'streaming-rendering', False)
+        res = self.webapp.get('/view', {'rql': 'Any X WHERE X is CWGroup',
+                                        'vid': 'list'})
+        # the list is rendered after the handler returned, while the connection
+        # is still open
+        self.assertIn(b'<ul class="section">', res.body)
+        self.assertNotIn(b'an error occurred', res.body)
+        self.assertTrue(res.body.endswith(b'</html>'))
+
+    def test_streamed_app_iter_close(self):
+        request = self.make_request('/')
+        called = []
+        request.add_finished_callback(called.append)
+
+        def chunks():
+            yield b'<html>'
+            yield b'</html>'
+
+        # closed before being iterated, as done by WebOb for HEAD requests
+        app_iter = bwcompat.streamed_app_iter(request, chunks())
+        self.assertEqual(called, [])
+        app_iter.close()
+        self.assertEqual(called, [request])
+        # closed before being exhausted, e.g. on client disconnection
+        del called[:]
+        request.add_finished_callback(called.append)
+        app_iter = bwcompat.streamed_app_iter(request, chunks())
+        self.assertEqual(next(app_iter), b'<html>')
+        app_iter.close()
+        app_iter.close()
+        self.assertEqual(called, [request])
+
     def test_post(self):
         self.webapp.post(
             '/',
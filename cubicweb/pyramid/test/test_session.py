@@ -0,0 +1,73 @@
+from cubicweb.pyramid.test import PyramidCWTest
+
+
+def incr_counter(request):
+    request.session['counter'] = request.session.get('counter', 0) + 1
+    request.response.text = str(request.session['counter'])
+    return request.response
+
+
+def read_counter(request):
+    request.response.text = str(request.session.get('counter', 0))
+    return request.response
+
+
+class SQLSessionTC(PyramidCWTest):
+    settings = {'cubicweb.session.backend': 'sql'}
+
+    def includeme(self, config):
+        for view in (incr_counter, read_counter):
+            config.add_route(view.__name__, '/' + view.__name__)
+            config.add_view(view, route_name=view.__name__)
+
+    def sessions(self):
+        with self.admin_access.repo_cnx() as cnx:
+            return cnx.system_sql('SELECT sid, last_access FROM web_sessions').fetchall()
+
+    def test_store_and_load(self):
+        res = self.webapp.get('/incr_counter')
+        self.assertEqual(res.text, '1')
+        res = self.webapp.get('/incr_counter')
+        self.assertEqual(res.text, '2')
+        res = self.webapp.get('/read_counter')
+        self.assertEqual(res.text, '2')
+        self.assertEqual(len(self.sessions()), 1)
+
+    def test_unchanged_data_not_written(self):
+        self.webapp.get('/incr_counter')
+        [(sid, last_access)] = self.sessions()
+        with self.admin_access.repo_cnx() as cnx:
+            cnx.system_sql('UPDATE web_sessions SET last_access=last_access-10')
+            cnx.commit()
+        # accessing data doesn't update the session since the last access time
+        # is not older than reissue_time
+        self.webapp.get('/read_counter')
+        self.assertEqual(self.sessions(), [(sid, last_access - 10)])
+        # unless it's older than reissue_time
+        with self.admin_access.repo_cnx() as cnx:
+            cnx.system_sql('UPDATE web_sessions SET last_access=last_access-1000')
+            cnx.commit()
+        res = self.webapp.get('/incr_counter')
+        self.assertEqual(res.text, '2')
+        [(sid2, last_access2)] = self.sessions()
+        self.assertEqual(sid2, sid)
+        self.assertGreater(last_access2, last_access)
+
+    def test_expire_sessions(self):
+        from cubicweb.pyramid.session import expire_sessions
+        self.webapp.get('/incr_counter')
+        self.webapp.reset()
+        self.webapp.get('/incr_counter')
+        self.assertEqual(len(self.sessions()), 2)
+        with self.admin_access.repo_cnx() as cnx:
+            cnx.system_sql('UPDATE web_sessions SET last_access=last_access-2000')
+            self.assertEqual(expire_sessions(cnx, 1200, batchsize=1), 1)
+            self.assertEqual(expire_sessions(cnx, 1200, batchsize=1), 1)
+            self.assertEqual(expire_sessions(cnx, 1200, batchsize=1), 0)
+            cnx.commit()
+        self.assertEqual(self.sessions(), [])
+
+
+if __name__ == '__main__':
+    from unittest import main
+    main()
@@ -57,6 +57,10 @@ class ResultSet(object):
         # set to (limit, offset) when a result set is limited using the
         # .limit method
         self.limited = None
+        # number of rows of the whole result when only a page of it has been
+        # fetched from the database (see web.views.navigation.execute_page),
+        # in which case `limited` is set accordingly
+        self.total_rowcount = None
         # set by the cursor which returned this resultset
         self.req = None
         # actions cache
@@ -376,6 +380,149 @@ class ResultSet(object):
 
     all = entities
 
+    def entities_bulk(self, col=0):
+        """return the list of entities with eid in the `col` column of the
+        result set, as `list(rset.entities(col))` would do.
+
+        This is meant to be used on large result sets: the structure of rows and
+        the rql of empty related result sets are computed once per entity type
+        and relation instead of for each row. Each entity still gets its own
+        empty related result set, holding its eid in its rql.
+        """
+        req = self.req
+        assert req is not None, 'do not call entities_bulk with no req on the result set'
+        rows, description = self.rows, self.description
+        eschema = req.vreg.schema.eschema
+        etype_class = req.vreg['etypes'].etype_class
+        entity_cache, set_entity_cache = req.entity_cache, req.set_entity_cache
+        # entities already built by get_entity
+        built = self.__dict__.setdefault('_get_entity_cache_', {})
+        # etype -> (entity class, row structure)
+        etypes = {}
+        # (rtype, role) -> rql of empty related result sets
+        empty_rqls = {}
+        entities = []
+        for row, rowvalues in enumerate(rows):
+            eid = rowvalues[col]
+            if eid is None:
+                continue
+            try:
+                entities.append(built[(row, col)])
+                continue
+            except KeyError:
+                pass
+            etype = description[row][col]
+            try:
+                cls, structure = etypes[etype]
+            except KeyError:
+                try:
+                    etypeschema = eschema(etype)
+                except KeyError:
+                    raise NotAnEntity(etype)
+                if etypeschema.final:
+                    raise NotAnEntity(etype)
+                cls = etype_class(etype)
+                if len(rowvalues) > 1:
+                    structure = self._rset_structure(etypeschema, col)
+                else:
+                    structure = None
+                etypes[etype] = cls, structure
+            try:
+                entity = entity_cache(eid)
+            except KeyError:
+                entity = cls(req, rset=self, row=row, col=col)
+                set_entity_cache(entity)
+            else:
+                if entity.cw_rset is None:
+                    entity.cw_rset = self
+                    entity.cw_row = row
+                    entity.cw_col = col
+            built[(row, col)] = entity
+            entities.append(entity)
+            if structure is None:
+                continue
+            eid_col, attr_cols, rel_cols = structure
+            entity.eid = rowvalues[eid_col]
+            attr_cache = entity.cw_attr_cache
+            for attr, col_idx in attr_cols.items():
+                attr_cache[attr] = rowvalues[col_idx]
+            for (rtype, role), col_idx in rel_cols.items():
+                if rowvalues[col_idx] is None:
+                    try:
+                        rql = empty_rqls[(rtype, role)]
+                    except KeyError:
+                        if role == 'subject':
+                            rql = 'Any Y WHERE X %s Y, X eid %%s'
+                        else:
+                            rql = 'Any Y WHERE Y %s X, X eid %%s'
+                        rql = empty_rqls[(rtype, role)] = rql % rtype
+                    rrset = ResultSet([], rql % entity.eid)
+                    rrset.req = req
+                else:
+                    rrset = self._build_entity(row, col_idx, set((col,))).as_rset()
+                entity.cw_set_relation_cache(rtype, role, rrset)
+        return entities
+
+    def complete_entities(self, col=0, attributes=None, skip_bytes=True):
+        """return the list of entities of the `col` column of the result set
+        (see :meth:`entities_bulk`), completed using a single query per entity
+        type instead of a query per entity (see :meth:`Entity.cw_complete_many`).
+
+        Use this before rendering attributes of each entity of a large result
+        set.
+        """
+        entities = self.entities_bulk(col)
+        if entities:
+            entities[0].cw_complete_many(entities, attributes, skip_bytes)
+        return entities
+
+    def prefetch_related(self, rtype, role='subject', col=0):
+        """fill the relation cache of entities of the `col` column of the
+        result set for relation `rtype` where they play `role`, so that later
+        calls to `entity.related(rtype, role)` don't hit the repository.
+
+        This is done using a single query per entity type instead of a query per
+        entity. Entities whose relation is already cached are left untouched.
+        Return the list of entities of the column, as :meth:`entities_bulk`.
+        """
+        entities = self.entities_bulk(col)
+        byetype = {}
+        for entity in entities:
+            if entity.cw_relation_cached(rtype, role) is None:
+                byetype.setdefault(entity.cw_etype, []).append(entity)
+        for etype_entities in byetype.values():
+            self._prefetch_related(etype_entities, rtype, role)
+        return entities
+
+    def _prefetch_related(self, entities, rtype, role):
+        """prefetch relation `rtype` of `entities`, which are all of the same
+        type
+        """
+        req = self.req
+        # start from the query that entity.related() would execute and turn
+        # the 'E eid %(x)s' restriction into 'E eid IN (...)', selecting E last
+        select = entities[0].cw_related_rqlst(rtype, role)
+        rql = select.as_string()
+        evar = select.defined_vars['E']
+        for rel in select.where.get_nodes(nodes.Relation):
+            if rel.r_type == 'eid' and rel.children[0].variable is evar:
+                select.remove_node(rel)
+                break
+        select.add_constant_restriction(evar, 'eid', [entity.eid for entity in entities],
+                                        'Int')
+        select.add_selected(evar)
+        rset = req.execute(select.as_string())
+        related = dict((entity.eid, ([], [])) for entity in entities)
+        for row, description in zip(rset.rows, rset.description):
+            rows, descr = related[row[-1]]
+            rows.append(row[:-1])
+            descr.append(description[:-1])
+        for entity in entities:
+            rows, descr = related[entity.eid]
+            rrset = ResultSet(rows, rql, {'x': entity.eid}, descr)
+            rrset.req = req
+            entity.cw_set_relation_cache(rtype, role, rrset)
+
     def iter_rows_with_entities(self):
         """ iterates over rows, and for each row
         eids are converted to plain entities
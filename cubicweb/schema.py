@@ -98,6 +98,10 @@ UNIQUE_CONSTRAINTS = ('SizeConstraint', 'FormatConstraint',
 
 _LOGGER = getLogger('cubicweb.schemaloader')
 
+# incremented each time some permissions are set, so that caches depending on
+# permissions may detect they're outdated
+PERMISSIONS_VERSION = 0
+
 # entity and relation schema created from serialized schema have an eid
 ybo.ETYPE_PROPERTIES += ('eid',)
 ybo.RTYPE_PROPERTIES += ('eid',)
@@ -257,10 +261,20 @@ class RQLExpression(object):
         return self.__class__(self.expression, self.mainvars)
 
     def __getstate__(self):
-        return (self.expression, self.mainvars)
+        # syntax trees and caches are computed again when unpickling
+        return dict((key, value) for key, value in self.__dict__.items()
+                    if not key.startswith('_')
+                    and key not in ('snippet_rqlst', 'vargraph', 'rqlst'))
 
     def __setstate__(self, state):
-        self.__init__(*state)
+        if isinstance(state, tuple):
+            # (expression, mainvars) state of former versions
+            self.__init__(*state)
+            return
+        self.__dict__.update(state)
+        # expression has already been normalized, only parse the snippet
+        self.snippet_rqlst = self._cached_parse(self.minimal_rql)
+        self.vargraph = vargraph(self.snippet_rqlst)
 
     @cachedproperty
     def rqlst(self):
@@ -410,6 +424,61 @@ class ERQLExpression(RQLExpression):
             return self._check(_cw, x=eid, **kwargs)
         return self._check(_cw, **kwargs)
 
+    def check_many(self, _cw, eids, etype=None):
+        """return the subset of `eids` for which the expression is satisfied
+
+        The expression is evaluated for all eids at once and results are
+        stored in the local permission cache, so that further :meth:`check`
+        calls for these eids don't query the database. `etype` may be given
+        when all eids are known to be entities of this type.
+        """
+        eids = set(eids)
+        if 'X' not in self.snippet_rqlst.defined_vars:
+            return eids if self._check(_cw) else set()
+        granted = set()
+        tocheck = eids
+        if self.eid is not None:
+            cache = _cw.local_perm_cache
+            tocheck = set()
+            for eid in eids:
+                try:
+                    if cache[(self.eid, (('x', eid),))]:
+                        granted.add(eid)
+                except KeyError:
+                    tocheck.add(eid)
+        if not tocheck:
+            return granted
+        rql, has_perm_defs, keyarg = self.transform_has_permission()
+        if has_perm_defs is not None:
+            # special has_*_permission relations have to be checked one by one
+            return granted | set(eid for eid in tocheck if self._check(_cw, x=eid))
+        restrictions = ['X eid IN (%s)' % ','.join(str(eid) for eid in sorted(tocheck))]
+        if etype is not None:
+            restrictions.append('X is %s' % etype)
+        if 'U' in self.snippet_rqlst.defined_vars:
+            restrictions.append('EXISTS(%s, U eid %%(u)s)' % self.expression)
+        else:
+            restrictions.append('EXISTS(%s)' % self.expression)
+        rql = 'Any X WHERE %s' % ', '.join(restrictions)
+        try:
+            # ensure security is disabled
+            with getattr(_cw, 'cnx', _cw).security_enabled(read=False):
+                rset = _cw.execute(rql, {'u': _cw.user.eid}, build_descr=False)
+            found = set(eid for eid, in rset)
+        except NotImplementedError:
+            self.critical('cant check rql expression, unsupported rql %s', rql)
+            found = set()
+        except TypeResolverException as ex:
+            self.warning('%s: %s', rql, str(ex))
+            found = set()
+        except Unauthorized as ex:
+            self.debug('unauthorized %s: %s', rql, str(ex))
+            found = set()
+        if self.eid is not None:
+            for eid in tocheck:
+                cache[(self.eid, (('x', eid),))] = eid in found
+        return granted | (found & tocheck)
+
 
 class CubicWebRelationDefinitionSchema(RelationDefinitionSchema):
     def constraint_by_eid(self, eid):
@@ -655,9 +724,11 @@ def set_action_permissions(self, action, permissions, _orig):
     :type permissions: tuple
     :param permissions: the groups and rql expressions allowing the given action
     """
+    global PERMISSIONS_VERSION
     _orig(self, action, tuple(permissions))
     clear_cache(self, 'get_rqlexprs')
     clear_cache(self, 'get_groups')
+    PERMISSIONS_VERSION += 1
 
 
 @_override_method(PermissionMixIn)
@@ -737,6 +808,50 @@ def check_perm(self, _cw, action, **kwargs):
     raise Unauthorized(action, str(self))
 
 
+@_override_method(PermissionMixIn)
+def has_perm_many(self, _cw, action, eids):
+    """return the subset of `eids` on which the action is granted, globally or
+    locally
+
+    This is equivalent to calling :meth:`has_perm` for each eid, but each
+    rql expression is evaluated once for all eids. It is only supported by
+    entity types and attributes, whose rql expressions are
+    :class:`ERQLExpression`.
+    """
+    eids = set(eids)
+    groups = self.get_groups(action)
+    if not eids or _cw.user.matching_groups(groups):
+        return eids
+    if isinstance(self, RelationDefinitionSchema):
+        etype = self.subject.type
+    else:
+        etype = self.type
+    granted = set()
+    if 'owners' in groups:
+        try:
+            rset = _cw.execute('Any X WHERE X eid IN (%s), X owned_by U, U eid %%(u)s'
+                               % ','.join(str(eid) for eid in sorted(eids)),
+                               {'u': _cw.user.eid}, build_descr=False)
+            granted.update(eid for eid, in rset)
+        except Unauthorized:
+            pass
+    for rqlexpr in self.get_rqlexprs(action):
+        if len(granted) == len(eids):
+            break
+        granted |= rqlexpr.check_many(_cw, eids - granted, etype)
+    return granted
+
+
+@_override_method(PermissionMixIn)
+def check_perm_many(self, _cw, action, eids):
+    """raise :exc:`Unauthorized` unless the action is granted on every eid of
+    `eids` (see :meth:`has_perm_many`)
+    """
+    eids = set(eids)
+    if self.has_perm_many(_cw, action, eids) != eids:
+        raise Unauthorized(action, str(self))
+
+
 CubicWebRelationDefinitionSchema._RPROPERTIES['eid'] = None
 # remember rproperties defined at this point. Others will have to be serialized in
 # CWAttribute.extra_props
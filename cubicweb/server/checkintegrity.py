@@ -89,6 +89,22 @@ def etype_fti_containers(eschema, _done=None):
         yield eschema
 
 
+def fti_etypes(schema):
+    """return the set of entity types whose entities appear in the full text
+    index
+    """
+    etypes = set()
+    for eschema in schema.entities():
+        if eschema.final:
+            continue
+        indexable_attrs = tuple(eschema.indexable_attributes()) # generator
+        if not indexable_attrs:
+            continue
+        for container in etype_fti_containers(eschema):
+            etypes.add(container)
+    return etypes
+
+
 def reindex_entities(schema, cnx, withpb=True, etypes=None):
     """reindex all entities in the repository"""
     # deactivate modification_date hook since we don't want them
@@ -102,15 +118,7 @@ def reindex_entities(schema, cnx, withpb=True, etypes=None):
     repo.system_source.do_fti = True  # ensure full-text indexation is activated
     if etypes is None:
         print('Reindexing entities')
-        etypes = set()
-        for eschema in schema.entities():
-            if eschema.final:
-                continue
-            indexable_attrs = tuple(eschema.indexable_attributes()) # generator
-            if not indexable_attrs:
-                continue
-            for container in etype_fti_containers(eschema):
-                etypes.add(container)
+        etypes = fti_etypes(schema)
         # clear fti table first
         cnx.system_sql('DELETE FROM %s' % dbhelper.fti_table)
     else:
@@ -139,6 +147,58 @@ def reindex_entities(schema, cnx, withpb=True, etypes=None):
         pb.finish()
 
 
+def queue_fti_rebuild(schema, cnx, etypes=None):
+    """queue entities of the given types (by default, all entities appearing
+    in the full text index) for full text indexation, to be processed by
+    :func:`index_queued_entities`. Return the number of queued entities.
+
+    Contrary to :func:`reindex_entities`, the text index isn't cleared first,
+    so full text search works while entities are reindexed. When rebuilding the
+    whole index, rows of entities which shouldn't be indexed are removed.
+    """
+    repo = cnx.repo
+    source = repo.system_source
+    dbhelper = source.dbhelper
+    if not dbhelper.has_fti_table(cnx.cnxset.cu):
+        print('no text index table')
+        dbhelper.init_fti(cnx.cnxset.cu)
+    source.do_fti = True  # ensure full-text indexation is activated
+    if etypes is None:
+        etypes = fti_etypes(schema)
+        cnx.system_sql("DELETE FROM %s WHERE NOT EXISTS(SELECT 1 FROM entities "
+                       "WHERE eid=%s AND type IN (%s))" % (
+                           dbhelper.fti_table, dbhelper.fti_uid_attr,
+                           ','.join("'%s'" % etype for etype in etypes)))
+    queued = source.fti_enqueue_etypes(cnx, etypes)
+    cnx.commit()
+    return queued
+
+
+def index_queued_entities(cnx, withpb=True, batchsize=1000, partition=None):
+    """index entities queued for full text indexation by batches of
+    `batchsize`, committing after each batch so that it may be resumed if
+    interrupted. See :meth:`NativeSQLSource.fti_index_pending` for `partition`.
+    """
+    source = cnx.repo.system_source
+    source.do_fti = True  # ensure full-text indexation is activated
+    if withpb:
+        size = source.fti_queue_stats(cnx)[0]
+        if partition is not None:
+            size = size // partition[1] + 1
+        pb = ProgressBar(size)
+    while True:
+        nbindexed = source.fti_index_pending(cnx, batchsize, partition)
+        if not nbindexed:
+            break
+        cnx.commit()
+        # clear entity cache to avoid high memory consumption on big tables
+        cnx.drop_entity_cache()
+        if withpb:
+            pb.update(nbindexed)
+    if withpb:
+        pb.finish()
+
+
 _CHECKERS = {}
 
 
@@ -447,6 +507,8 @@ SYSTEM_INDEXES = {
     'tx_relation_actions_eid_from_idx': ('tx_relation_actions', 'eid_from'),
     'tx_relation_actions_eid_to_idx': ('tx_relation_actions', 'eid_to'),
     'tx_relation_actions_tx_uuid_idx': ('tx_relation_actions', 'tx_uuid'),
+    'fti_pending_eid_idx': ('fti_pending', 'eid'),
+    'web_sessions_last_access_idx': ('web_sessions', 'last_access'),
 }
 
 
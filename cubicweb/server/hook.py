@@ -227,6 +227,10 @@ The existing categories are:
 
 * ``bookmark``, bookmark entities handling hooks
 
+* ``fragmentcache``, hooks invalidating the web fragment cache
+
+* ``querycache``, hooks invalidating the web query results cache
+
 
 Nothing precludes one to invent new categories and use existing mechanisms to
 filter them in or out.
@@ -287,9 +291,32 @@ def _iter_kwargs(entities, eids_from_to, kwargs):
 
 class HooksRegistry(CWRegistry):
 
+    def __init__(self, vreg):
+        super(HooksRegistry, self).__init__(vreg)
+        self._reset_dispatch_table()
+
+    def _reset_dispatch_table(self):
+        # (event, rtype, etype, hooks mode, hooks categories) -> candidate
+        # hooks, see get_candidate_hooks
+        self._dispatch_table = {}
+        self._dispatch_schema = None
+
     def register(self, obj, **kwargs):
         obj.check_events()
         super(HooksRegistry, self).register(obj, **kwargs)
+        self._reset_dispatch_table()
+
+    def unregister(self, obj):
+        super(HooksRegistry, self).unregister(obj)
+        self._reset_dispatch_table()
+
+    def clear(self):
+        super(HooksRegistry, self).clear()
+        self._reset_dispatch_table()
+
+    def initialization_completed(self):
+        super(HooksRegistry, self).initialization_completed()
+        self._reset_dispatch_table()
 
     def call_hooks(self, event, cnx=None, **kwargs):
         """call `event` hooks for an entity or a list of entities (passed
@@ -314,14 +341,19 @@ class HooksRegistry(CWRegistry):
             else:
                 entities = []
                 eids_from_to = []
-            pruned = self.get_pruned_hooks(cnx, event,
-                                           entities, eids_from_to, kwargs)
+            candidates = self.get_candidate_hooks(cnx, event,
+                                                  entities, eids_from_to, kwargs)
+            select_best = self._select_best
 
             # by default, hooks are executed with security turned off
             with cnx.security_enabled(read=False):
                 for _kwargs in _iter_kwargs(entities, eids_from_to, kwargs):
-                    hooks = sorted(self.filtered_possible_objects(pruned, cnx, **_kwargs),
-                                   key=lambda x: x.order)
+                    hooks = []
+                    for hooks_with_id in candidates:
+                        hook = select_best(hooks_with_id, cnx, **_kwargs)
+                        if hook is not None:
+                            hooks.append(hook)
+                    hooks.sort(key=lambda x: x.order)
                     debug = server.DEBUG & server.DBG_HOOKS
                     with cnx.security_enabled(write=False):
                         with cnx.running_hooks_ops():
@@ -352,10 +384,8 @@ class HooksRegistry(CWRegistry):
         if 'entity' in kwargs:
             entities = [kwargs['entity']]
         if len(entities):
-            look_for_selector = is_instance
             etype = entities[0].__regid__
         elif 'rtype' in kwargs:
-            look_for_selector = match_rtype
             etype = None
         else: # nothing to prune, how did we get there ???
             return set()
@@ -363,26 +393,79 @@ class HooksRegistry(CWRegistry):
         pruned = cnx.pruned_hooks_cache.get(cache_key)
         if pruned is not None:
             return pruned
-        pruned = set()
+        pruned = self._pruned_hooks(cnx, entities, eids_from_to, kwargs)
         cnx.pruned_hooks_cache[cache_key] = pruned
-        if look_for_selector is not None:
-            for id, hooks in self.items():
-                for hook in hooks:
-                    enabled_cat, main_filter = hook.filterable_selectors()
-                    if enabled_cat is not None:
-                        if not enabled_cat(hook, cnx):
-                            pruned.add(hook)
-                            continue
-                    if main_filter is not None:
-                        if isinstance(main_filter, match_rtype) and \
-                           (main_filter.frometypes is not None  or \
-                            main_filter.toetypes is not None):
-                            continue
+        return pruned
+
+    def _pruned_hooks(self, cnx, entities, eids_from_to, kwargs):
+        """return the set of hooks pruned according to `get_pruned_hooks`
+        documentation, without caching it
+        """
+        if 'entity' in kwargs:
+            entities = [kwargs['entity']]
+        if not (len(entities) or 'rtype' in kwargs):
+            return set()
+        pruned = set()
+        first_kwargs = None
+        for id, hooks in self.items():
+            for hook in hooks:
+                enabled_cat, main_filter = hook.filterable_selectors()
+                if enabled_cat is not None:
+                    if not enabled_cat(hook, cnx):
+                        pruned.add(hook)
+                        continue
+                if main_filter is not None:
+                    if isinstance(main_filter, match_rtype) and \
+                       (main_filter.frometypes is not None  or \
+                        main_filter.toetypes is not None):
+                        continue
+                    if first_kwargs is None:
                         first_kwargs = next(_iter_kwargs(entities, eids_from_to, kwargs))
-                        if not main_filter(hook, cnx, **first_kwargs):
-                            pruned.add(hook)
+                    if not main_filter(hook, cnx, **first_kwargs):
+                        pruned.add(hook)
         return pruned
 
+    def get_candidate_hooks(self, cnx, event, entities, eids_from_to, kwargs):
+        """return a list of lists of hooks sharing the same identifier, among
+        which the best one should be selected for each entity or relation
+        given to :meth:`call_hooks`. Pruned hooks (see
+        :meth:`get_pruned_hooks`) are not included.
+
+        Since this only depends on the event, the entity type or relation type
+        and the hooks categories activated on the connection, this is computed
+        once and kept in a table shared by all connections, until the registry
+        or the schema changes.
+        """
+        if 'entity' in kwargs:
+            etype = kwargs['entity'].__regid__
+        elif len(entities):
+            etype = entities[0].__regid__
+        else:
+            etype = None
+        rtype = kwargs.get('rtype')
+        if etype is None and rtype is None:
+            # nothing pruned, hooks categories don't matter
+            key = (event, None, None)
+        else:
+            key = (event, rtype, etype,
+                   cnx._hooks_mode, frozenset(cnx._hooks_categories))
+        if self._dispatch_schema is not self.schema:
+            self._dispatch_table = {}
+            self._dispatch_schema = self.schema
+        table = self._dispatch_table
+        try:
+            return table[key]
+        except KeyError:
+            pass
+        pruned = self._pruned_hooks(cnx, entities, eids_from_to, kwargs)
+        candidates = []
+        for hooks in self.values():
+            hooks = [hook for hook in hooks if hook not in pruned]
+            if hooks:
+                candidates.append(hooks)
+        table[key] = candidates
+        return candidates
+
 
     def filtered_possible_objects(self, pruned, *args, **kwargs):
         for appobjects in self.values():
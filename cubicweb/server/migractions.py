@@ -52,7 +52,7 @@ from cubicweb.schema import (META_RTYPES, VIRTUAL_RTYPES,
 from cubicweb.cwvreg import CW_EVENT_MANAGER
 from cubicweb import repoapi
 from cubicweb.migration import MigrationHelper, yes
-from cubicweb.server import hook, schemaserial as ss, repository
+from cubicweb.server import hook, schemaserial as ss, repository, schemasnapshot
 from cubicweb.server.schema2sql import eschema2sql, rschema2sql, unique_index_name, sql_type
 from cubicweb.server.utils import manager_userpasswd
 from cubicweb.server.sqlutils import sqlexec, SQL_PREFIX
@@ -164,6 +164,10 @@ class ServerMigrationHelper(MigrationHelper):
         # disable notification during migration
         with self.cnx.allow_all_hooks_but('notification'):
             super(ServerMigrationHelper, self).migrate(vcconf, toupgrade, options)
+        if self.config['schema-snapshot'] and not options.fs_only:
+            # spare processes of the instance from deserializing the migrated
+            # schema
+            schemasnapshot.write_snapshot(self.repo)
 
     def cmd_process_script(self, migrscript, funcname=None, *args, **kwargs):
         try:
@@ -0,0 +1,203 @@
+# copyright 2026 LOGILAB S.A. (Paris, FRANCE), all rights reserved.
+# contact http://www.logilab.fr/ -- mailto:contact@logilab.fr
+#
+# This file is part of CubicWeb.
+#
+# CubicWeb is free software: you can redistribute it and/or modify it under the
+# terms of the GNU Lesser General Public License as published by the Free
+# Software Foundation, either version 2.1 of the License, or (at your option)
+# any later version.
+#
+# CubicWeb is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public License along
+# with CubicWeb.  If not, see <http://www.gnu.org/licenses/>.
+"""Persistent RQL plan cache, shared by the processes of an instance.
+
+The querier keeps parsed RQL syntax trees (and their solutions) in its
+:class:`~cubicweb.server.querier.RQLCache` while the system source keeps
+generated SQL in its own cache. Both are per-process, so each freshly started
+worker has to warm them up from cold.
+
+When the `rql-plan-cache` option is set, the :class:`PlanCache` defined here
+dumps the content of those caches to a file of the instance's data directory,
+keyed by a fingerprint of the schema. Processes pre-load it at bootstrap time
+and merge their own entries back into it periodically from a background
+thread, and once more at shutdown.
+
+Only entries that can be safely shared are stored:
+
+* RQL queries whose cache key doesn't depend on the type of some eid
+  arguments, along with the name of their eid arguments. Syntax trees are not
+  pickled: queries are parsed again and their solutions computed at load
+  time, which is still way cheaper than waiting for them to be hit.
+
+* generated SQL which doesn't need any source callback (custom storages use
+  bound methods which can't be stored).
+"""
+
+import os
+import pickle
+import threading
+from hashlib import md5
+from logging import getLogger
+from os.path import join
+
+from filelock import FileLock
+
+from cubicweb import set_log_methods, UnknownEid
+from cubicweb.__pkginfo__ import version as cw_version
+
+
+def schema_fingerprint(repo):
+    """Return a string identifying everything a cached plan depends on: the
+    schema's entity and relation definitions, attributes mapped to custom
+    storages, the database driver and the CubicWeb version.
+    """
+    schema = repo.schema
+    source = repo.system_source
+    digest = md5()
+
+    def update(*values):
+        digest.update(repr(values).encode('utf-8'))
+
+    update(cw_version, source.dbdriver)
+    for eschema in sorted(schema.entities(), key=str):
+        update(eschema.type, eschema.final, str(eschema.specializes()))
+    for rschema in sorted(schema.relations(), key=str):
+        update(rschema.type, rschema.final, rschema.inlined, rschema.symmetric,
+               getattr(rschema, 'rule', None))
+        for (subj, obj), rdef in sorted(rschema.rdefs.items()):
+            update(subj.type, obj.type, rdef.cardinality)
+    update(sorted(source._rql_sqlgen.attr_map))
+    return digest.hexdigest()
+
+
+class PlanCache(object):
+    """Persist the querier's RQL cache and the system source's SQL cache of a
+    repository into `path`.
+    """
+    # interval, in seconds, between background dumps
+    dump_interval = 60
+
+    def __init__(self, repo, path):
+        self.repo = repo
+        self.path = path
+        self._lock = FileLock(path + '.lock')
+        self._stopped = threading.Event()
+        self._last_misses = None
+
+    # file handling ###########################################################
+
+    def read(self, fingerprint):
+        """Return the `{'rql': ..., 'sql': ...}` dictionary stored in the cache
+        file, or None if there is no such file or if it has been generated for
+        another schema.
+        """
+        try:
+            with open(self.path, 'rb') as stream:
+                data = pickle.load(stream)
+        except FileNotFoundError:
+            return None
+        except Exception:
+            self.exception('unable to read plan cache %s, ignoring it', self.path)
+            return None
+        if not isinstance(data, dict) or data.get('fingerprint') != fingerprint:
+            self.info('plan cache %s is outdated, ignoring it', self.path)
+            return None
+        return data
+
+    def write(self, fingerprint, rqls, sqls):
+        """Merge `rqls` and `sqls` entries with those already stored in the
+        cache file then atomically replace it.
+        """
+        maxsize = self.repo.config['rql-cache-size']
+        with self._lock:
+            data = self.read(fingerprint) or {'rql': {}, 'sql': {}}
+            data['rql'].update(rqls)
+            data['sql'].update(sqls)
+            for key in ('rql', 'sql'):
+                entries = data[key]
+                if len(entries) > maxsize:
+                    # keep the most recently dumped entries
+                    data[key] = dict(list(entries.items())[-maxsize:])
+            data['fingerprint'] = fingerprint
+            tmppath = '%s.%s.tmp' % (self.path, os.getpid())
+            with open(tmppath, 'wb') as stream:
+                pickle.dump(data, stream, pickle.HIGHEST_PROTOCOL)
+            os.replace(tmppath, self.path)
+
+    # repository caches handling ##############################################
+
+    def load(self):
+        """Fill repository's caches using the content of the cache file.
+        Return the number of RQL and SQL entries loaded.
+        """
+        repo = self.repo
+        data = self.read(schema_fingerprint(repo))
+        if data is None:
+            return 0, 0
+        rqlcache = repo.querier.rql_cache
+        nbrql = 0
+        with repo.internal_cnx() as cnx:
+            for rql, eidkeys in data['rql'].items():
+                try:
+                    rqlcache.preload(cnx, rql, eidkeys)
+                except UnknownEid:
+                    continue
+                except Exception:
+                    self.debug('unable to preload %r', rql, exc_info=True)
+                    continue
+                nbrql += 1
+        sqlcache = repo.system_source._cache
+        for cachekey, (sql, qargs, cbs) in data['sql'].items():
+            sqlcache[cachekey] = (sql, qargs, cbs, {})
+        self.info('loaded %s rql and %s sql plans from %s',
+                  nbrql, len(data['sql']), self.path)
+        return nbrql, len(data['sql'])
+
+    def dump(self, force=False):
+        """Write repository's caches content into the cache file. Unless
+        `force` is true, nothing is done if there has been no cache miss since
+        the latest dump.
+        """
+        repo = self.repo
+        rqlcache = repo.querier.rql_cache
+        misses = (rqlcache.cache_miss, repo.system_source.cache_miss)
+        if not force and misses == self._last_misses:
+            return
+        rqls = dict(rqlcache.shareable_items())
+        # row converters aren't picklable, they're computed again on load
+        sqls = dict((key, value[:3])
+                    for key, value in list(repo.system_source._cache.items())
+                    if not value[2])
+        self.write(schema_fingerprint(repo), rqls, sqls)
+        self._last_misses = misses
+
+    def start(self):
+        """Start a thread dumping caches every `dump_interval` seconds."""
+        def dump_plan_cache():
+            while not self._stopped.wait(self.dump_interval):
+                try:
+                    self.dump()
+                except Exception:
+                    self.exception('error while dumping plan cache')
+        self.repo.threaded_task(dump_plan_cache)
+
+    def stop(self):
+        """Stop the background thread and dump caches one last time."""
+        self._stopped.set()
+        try:
+            self.dump()
+        except Exception:
+            self.exception('error while dumping plan cache')
+
+
+def plan_cache_path(config):
+    return join(config.appdatahome, 'rql-plan-cache.pickle')
+
+
+set_log_methods(PlanCache, getLogger('cubicweb.plancache'))
@@ -28,6 +28,7 @@ from yams import BASE_TYPES
 from cubicweb import ValidationError, Unauthorized, UnknownEid, QueryError
 from cubicweb.rqlrewrite import RQLRelationRewriter
 from cubicweb import Binary, server
+from cubicweb import schema as schemamod
 from cubicweb.rset import ResultSet
 
 from cubicweb.utils import QueryCache, RepeatList
@@ -153,6 +154,9 @@ class ExecutionPlan(object):
         # original rql syntax tree
         self.rqlst = rqlst
         self.args = args or {}
+        # key of the query in caches, set by the querier when the query may be
+        # cached
+        self.cache_key = None
         # cnx executing the query
         self.cnx = cnx
         # quick reference to the system source
@@ -182,12 +186,20 @@ class ExecutionPlan(object):
         # the latest executed step contains the full query result
         return result
 
+    def iter_execute(self, chunksize):
+        """execute a select plan and return an iterator on lists of at most
+        `chunksize` resulting rows
+        """
+        assert len(self.steps) == 1
+        return self.steps[0].iter_execute(chunksize)
+
     def preprocess(self, union, security=True):
         """insert security when necessary then annotate rql st for sql generation
 
         return rqlst to actually execute
         """
         cached = None
+        sharedkey = None
         if security and self.cnx.read_security:
             # ensure security is turned of when security is inserted,
             # else we may loop for ever...
@@ -195,6 +207,7 @@ class ExecutionPlan(object):
                 key = self.cache_key
             else:
                 key = None
+                sharedkey = self._secured_cache_key()
             if key is not None and key in self.cnx.transaction_data:
                 cachedunion, args = self.cnx.transaction_data[key]
                 union.children[:] = []
@@ -204,7 +217,11 @@ class ExecutionPlan(object):
                 args.update(self.args)
                 self.args = args
                 cached = True
+            elif sharedkey is not None and self._restore_secured(union, sharedkey):
+                cached = True
             else:
+                argnames = set(self.args)
+                self._rewritten = self._eid_checked = False
                 with self.cnx.security_enabled(read=False):
                     noinvariant = self._insert_security(union)
                 if key is not None:
@@ -215,9 +232,59 @@ class ExecutionPlan(object):
             self.rqlhelper.simplify(union)
             self.querier.sqlgen_annotate(union)
             set_qdata(self.schema.rschema, union, noinvariant)
+            if sharedkey is not None:
+                self._store_secured(union, sharedkey, argnames)
         if union.has_text_query:
             self.cache_key = None
 
+    def _secured_cache_key(self):
+        """return the key of the security-rewritten tree in the querier's
+        cache shared by connections, or None if it shouldn't be cached
+        """
+        if self.cache_key is None:
+            return None
+        return (self.cache_key, frozenset(self.cnx.user.groups),
+                schemamod.PERMISSIONS_VERSION)
+
+    def _restore_secured(self, union, key):
+        """replace `union`'s content by a copy of the security-rewritten tree
+        cached under `key` and return True, or return False if there is no
+        such tree
+        """
+        try:
+            cachedunion, argnames = self.querier.secured_rqlst_cache[key]
+        except KeyError:
+            return False
+        copy = cachedunion.copy()
+        self.rqlhelper.annotate(copy)
+        self.querier.sqlgen_annotate(copy)
+        _copy_qdata(cachedunion, copy)
+        union.children[:] = []
+        for select in copy.children:
+            union.append(select)
+        union.has_text_query = copy.has_text_query
+        # arguments inserted by the rewriter are the user's eid
+        for argname in argnames:
+            self.args[argname] = self.cnx.user.eid
+        return True
+
+    def _store_secured(self, union, key, argnames):
+        """store a copy of the security-rewritten tree `union` under `key` in
+        the querier's cache shared by connections, unless security didn't
+        modify it or it depends on something else than the query, the user's
+        groups and the schema
+        """
+        if not self._rewritten or self._eid_checked or union.has_text_query:
+            return
+        inserted = [argname for argname in self.args if argname not in argnames]
+        if any(self.args[argname] != self.cnx.user.eid for argname in inserted):
+            return
+        copy = union.copy()
+        self.rqlhelper.annotate(copy)
+        self.querier.sqlgen_annotate(copy)
+        _copy_qdata(union, copy)
+        self.querier.secured_rqlst_cache[key] = (copy, inserted)
+
     def _insert_security(self, union):
         noinvariant = set()
         for select in union.children[:]:
@@ -225,6 +292,7 @@ class ExecutionPlan(object):
                 self._insert_security(subquery.query)
             localchecks, restricted = self._check_permissions(select)
             if any(localchecks):
+                self._rewritten = True
                 self.cnx.rql_rewriter.insert_local_checks(
                     select, self.args, localchecks, restricted, noinvariant)
         return noinvariant
@@ -278,6 +346,8 @@ class ExecutionPlan(object):
                         rqlexprs = localcheck.pop(varname)
                     except KeyError:
                         continue
+                    # the rewritten tree now depends on this eid
+                    self._eid_checked = True
                     # if entity has been added in the current transaction, the
                     # user can read it whatever rql expressions are associated
                     # to its type
@@ -483,6 +553,9 @@ class QuerierHelper(object):
     def clear_caches(self, eids=None, etypes=None):
         if eids is None:
             self.rql_cache = RQLCache(self._repo, self.schema)
+            # security-rewritten syntax trees, shared by connections of users
+            # having the same groups
+            self.secured_rqlst_cache = QueryCache(self._repo.config['rql-cache-size'])
         else:
             cache = self.rql_cache
             for eid, etype in zip(eids, etypes):
@@ -516,6 +589,77 @@ class QuerierHelper(object):
         always use substitute arguments in queries (i.e. avoid query such as
         'Any X WHERE X eid 123'!)
         """
+        rqlst, plan = self._build_plan(cnx, rql, args)
+        if plan is None:
+            return empty_rset(rql, args)
+        # execute the plan
+        try:
+            results = plan.execute()
+        except (Unauthorized, ValidationError):
+            # getting an Unauthorized/ValidationError exception means the
+            # transaction must be rolled back
+            #
+            # notes:
+            # * we should not reset the connections set here, since we don't want the
+            #   connection to loose it during processing
+            # * don't rollback if we're in the commit process, will be handled
+            #   by the connection
+            if cnx.commit_state is None:
+                cnx.commit_state = 'uncommitable'
+            raise
+        # build a description for the results if necessary
+        descr = ()
+        if build_descr:
+            if rqlst.TYPE == 'select':
+                descr = _select_descr(cnx, rqlst, args, results)
+            elif rqlst.TYPE == 'insert':
+                # on insert plan, some entities may have been auto-casted,
+                # so compute description manually even if there is only
+                # one solution
+                basedescr = [None] * len(plan.selected)
+                todetermine = list(zip(range(len(plan.selected)), repeat(False)))
+                descr = _build_descr(cnx, results, basedescr, todetermine)
+            # FIXME: get number of affected entities / relations on non
+            # selection queries ?
+        # return a result set object
+        return ResultSet(results, rql, args, descr)
+
+    def execute_iter(self, cnx, rql, args=None, build_descr=True, chunksize=1000):
+        """execute a rql select query, return an iterator on `ResultSet`
+        objects bound to `cnx` and holding at most `chunksize` rows each, and
+        their description if `build_descr` is true.
+
+        Rows are fetched from the database as the iterator is consumed, so
+        that huge results don't have to be held in memory. The iterator should
+        be consumed before the end of the transaction.
+        """
+        rqlst, plan = self._build_plan(cnx, rql, args)
+        if plan is None:
+            return iter(())
+        if rqlst.TYPE != 'select':
+            raise QueryError('only select queries may be executed by chunks')
+        return self._iter_execute(cnx, rql, args, rqlst, plan, build_descr,
+                                  chunksize)
+
+    def _iter_execute(self, cnx, rql, args, rqlst, plan, build_descr, chunksize):
+        try:
+            for results in plan.iter_execute(chunksize):
+                descr = ()
+                if build_descr:
+                    descr = _select_descr(cnx, rqlst, args, results)
+                rset = ResultSet(results, rql, args, descr)
+                rset.req = cnx
+                yield rset
+        except Unauthorized:
+            # see execute
+            if cnx.commit_state is None:
+                cnx.commit_state = 'uncommitable'
+            raise
+
+    def _build_plan(self, cnx, rql, args):
+        """return the syntax tree and the execution plan for the given query,
+        or (None, None) if it refers to some unexisting entity
+        """
         if server.DEBUG & (server.DBG_RQL | server.DBG_SQL):
             if server.DEBUG & (server.DBG_MORE | server.DBG_SQL):
                 print('*'*80)
@@ -525,7 +669,7 @@ class QuerierHelper(object):
         except UnknownEid:
             # we want queries such as "Any X WHERE X eid 9999"
             # return an empty result instead of raising UnknownEid
-            return empty_rset(rql, args)
+            return None, None
         if rqlst.TYPE != 'select':
             if cnx.read_security:
                 check_no_password_selected(rqlst)
@@ -552,46 +696,7 @@ class QuerierHelper(object):
         plan = self.plan_factory(rqlst, args, cnx)
         plan.cache_key = cachekey
         self._planner.build_plan(plan)
-        # execute the plan
-        try:
-            results = plan.execute()
-        except (Unauthorized, ValidationError):
-            # getting an Unauthorized/ValidationError exception means the
-            # transaction must be rolled back
-            #
-            # notes:
-            # * we should not reset the connections set here, since we don't want the
-            #   connection to loose it during processing
-            # * don't rollback if we're in the commit process, will be handled
-            #   by the connection
-            if cnx.commit_state is None:
-                cnx.commit_state = 'uncommitable'
-            raise
-        # build a description for the results if necessary
-        descr = ()
-        if build_descr:
-            if rqlst.TYPE == 'select':
-                # sample selection
-                if len(rqlst.children) == 1 and len(rqlst.children[0].solutions) == 1:
-                    # easy, all lines are identical
-                    selected = rqlst.children[0].selection
-                    solution = rqlst.children[0].solutions[0]
-                    description = _make_description(selected, args, solution)
-                    descr = RepeatList(len(results), tuple(description))
-                else:
-                    # hard, delegate the work :o)
-                    descr = manual_build_descr(cnx, rqlst, args, results)
-            elif rqlst.TYPE == 'insert':
-                # on insert plan, some entities may have been auto-casted,
-                # so compute description manually even if there is only
-                # one solution
-                basedescr = [None] * len(plan.selected)
-                todetermine = list(zip(range(len(plan.selected)), repeat(False)))
-                descr = _build_descr(cnx, results, basedescr, todetermine)
-            # FIXME: get number of affected entities / relations on non
-            # selection queries ?
-        # return a result set object
-        return ResultSet(results, rql, args, descr)
+        return rqlst, plan
 
     # these are overridden by set_log_methods below
     # only defining here to prevent pylint from complaining
@@ -661,6 +766,38 @@ class RQLCache(object):
             self._cache[cachekey] = rqlst
         return rqlst, cachekey
 
+    def preload(self, cnx, rql, eidkeys):
+        """Put the syntax tree for the given RQL in the cache, as would be done
+        on cache miss.
+
+        `eidkeys` is the set of named arguments which are eids in the query, as
+        computed by a previous analysis of the query, or None if it was
+        executed without arguments. If there are some, the syntax tree can't be
+        cached without knowing their type, so only remember them.
+        """
+        if eidkeys:
+            self._ck_cache[rql] = eidkeys
+            return
+        rqlst = self._parse(rql)
+        self.solutions(cnx, rqlst, None)
+        if eidkeys is not None:
+            self._ck_cache[rql] = eidkeys
+        self._cache[(rql,)] = rqlst
+
+    def shareable_items(self):
+        """Return an iterator on (rql, eidkeys) for queries that may be given to
+        :meth:`preload` by another process, e.g. queries whose cache key
+        doesn't depend on some eids type.
+        """
+        ck_cache = self._ck_cache
+        for cachekey in list(self._cache):
+            if len(cachekey) == 1:
+                rql = cachekey[0]
+                yield rql, ck_cache.get(rql)
+        for rql, eidkeys in list(ck_cache.items()):
+            if eidkeys:
+                yield rql, eidkeys
+
     def pop(self, key, *args):
         """Pop a key from the cache."""
         self._cache.pop(key, *args)
@@ -668,18 +805,24 @@ class RQLCache(object):
 
 def _rql_cache_key(cnx, rql, args, eidkeys):
     cachekey = [rql]
-    type_from_eid = cnx.repo.type_from_eid
-    for key in sorted(eidkeys):
+    keys = sorted(eidkeys)
+    for key in keys:
         try:
-            etype = type_from_eid(args[key], cnx)
+            # ensure eid is correctly typed in args
+            args[key] = int(args[key])
         except KeyError:
             raise QueryError('bad cache key %s (no value)' % key)
         except TypeError:
             raise QueryError('bad cache key %s (value: %r)' % (
                 key, args[key]))
-        cachekey.append(etype)
-        # ensure eid is correctly typed in args
-        args[key] = int(args[key])
+        except ValueError:
+            raise UnknownEid(args[key])
+    types = cnx.repo.types_from_eids(cnx, [args[key] for key in keys])
+    for key in keys:
+        try:
+            cachekey.append(types[args[key]])
+        except KeyError:
+            raise UnknownEid(args[key])
     return tuple(cachekey)
 
 
@@ -689,6 +832,18 @@ LOGGER = getLogger('cubicweb.querier')
 set_log_methods(QuerierHelper, LOGGER)
 
 
+def _select_descr(cnx, rqlst, args, result):
+    """return a description for the result of a select query"""
+    # sample selection
+    if len(rqlst.children) == 1 and len(rqlst.children[0].solutions) == 1:
+        # easy, all lines are identical
+        selected = rqlst.children[0].selection
+        solution = rqlst.children[0].solutions[0]
+        description = _make_description(selected, args, solution)
+        return RepeatList(len(result), tuple(description))
+    # hard, delegate the work :o)
+    return manual_build_descr(cnx, rqlst, args, result)
+
 def manual_build_descr(cnx, rqlst, args, result):
     """build a description for a given result by analysing each row
 
@@ -717,7 +872,10 @@ def manual_build_descr(cnx, rqlst, args, result):
 
 def _build_descr(cnx, result, basedescription, todetermine):
     description = []
-    entity_type = cnx.entity_type
+    # resolve types of all eids at once
+    eids = set(row[index] for row in result for index, isfinal in todetermine
+               if not isfinal and row[index] is not None)
+    types = cnx.repo.types_from_eids(cnx, eids) if eids else {}
     todel = []
     for i, row in enumerate(result):
         row_descr = basedescription[:]
@@ -731,8 +889,8 @@ def _build_descr(cnx, result, basedescription, todetermine):
                 row_descr[index] = etype_from_pyobj(value)
             else:
                 try:
-                    row_descr[index] = entity_type(value)
-                except UnknownEid:
+                    row_descr[index] = types[value]
+                except KeyError:
                     cnx.error('wrong eid %s in repository, you should '
                              'db-check the database' % value)
                     todel.append(i)
@@ -743,6 +901,17 @@ def _build_descr(cnx, result, basedescription, todetermine):
         del result[i]
     return description
 
+def _copy_qdata(union, copy):
+    """copy querier data set by :func:`set_qdata` on variables of `union` to
+    variables of its `copy`
+    """
+    for select, selectcopy in zip(union.children, copy.children):
+        for subquery, subquerycopy in zip(select.with_, selectcopy.with_):
+            _copy_qdata(subquery.query, subquerycopy.query)
+        for name, var in selectcopy.defined_vars.items():
+            var._q_invariant = select.defined_vars[name]._q_invariant
+
+
 def _make_description(selected, args, solution):
     """return a description for a result set"""
     description = []
@@ -26,10 +26,12 @@ repository mainly:
 * handles session management
 """
 
-from itertools import chain
+import sys
+from itertools import chain, islice
 from contextlib import contextmanager
 from logging import getLogger
-import queue
+import threading
+from time import time
 
 from logilab.common.decorators import cached, clear_cache
 
@@ -40,9 +42,10 @@ from cubicweb import (CW_MIGRATION_MAP,
                       UnknownEid, AuthenticationError, ExecutionError,
                       UniqueTogetherError, ViolatedConstraint)
 from cubicweb import set_log_methods
-from cubicweb import cwvreg, schema, server
-from cubicweb.server import utils, hook, querier, sources
+from cubicweb import cwvreg, schema, server, startupprofile
+from cubicweb.server import utils, hook, querier, sources, plancache, schemasnapshot
 from cubicweb.server.session import InternalManager, Connection
+from cubicweb.statsd_logger import statsd_c, statsd_g, statsd_t
 
 
 NO_CACHE_RELATIONS = set([
@@ -143,60 +146,281 @@ class NullEventBus(object):
         pass
 
 
+class EidTypeCache(object):
+    """Bounded mapping of eids to their entity type.
+
+    Lookups don't take any lock; hit and miss counters are incremented without
+    synchronization and are thus approximate. When the cache is full, the
+    tenth of oldest inserted eids is evicted at once.
+    """
+
+    def __init__(self, maxsize):
+        self.maxsize = max(maxsize, 1)
+        self._data = {}
+        self._lock = threading.Lock()
+        self.cache_hit, self.cache_miss = 0, 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, eid):
+        return eid in self._data
+
+    def __getitem__(self, eid):
+        return self._data[eid]
+
+    def get(self, eid):
+        """return the type of `eid` or None if it's not cached"""
+        etype = self._data.get(eid)
+        if etype is None:
+            self.cache_miss += 1
+        else:
+            self.cache_hit += 1
+        return etype
+
+    def items(self):
+        return list(self._data.items())
+
+    def __setitem__(self, eid, etype):
+        with self._lock:
+            data = self._data
+            if eid not in data and len(data) >= self.maxsize:
+                for oldeid in list(islice(data, max(self.maxsize // 10, 1))):
+                    del data[oldeid]
+            data[eid] = etype
+
+    def update(self, types):
+        for eid, etype in types.items():
+            self[eid] = etype
+
+    def pop(self, eid, default=None):
+        with self._lock:
+            return self._data.pop(eid, default)
+
+    def clear(self):
+        with self._lock:
+            self._data = {}
+
+    def memory_usage(self):
+        """return the approximate number of bytes used by the cache (entity
+        type names, shared with the schema, are not accounted)
+        """
+        data = self._data
+        return sys.getsizeof(data) + sum(sys.getsizeof(eid) for eid in list(data))
+
+
 class _CnxSetPool(object):
+    """Pool of connections sets to the system source.
+
+    When `size` is None, connections sets are not pooled: a new one is opened
+    by each :meth:`get` and closed by :meth:`release`.
+
+    Else the pool opens `min_size` connections sets at creation time, then
+    opens new ones on demand until there are `size` of them. Beyond that,
+    :meth:`get` waits for a connections set to be released for at most
+    `timeout` seconds. Connections sets idle for more than `idle_timeout`
+    seconds are closed, until there are `min_size` of them left, when a
+    connections set is released and periodically once :meth:`start` has been
+    called.
+
+    If `max_age` is given, connections sets opened for more than `max_age`
+    seconds are reconnected before being handed out. If `pre_ping` is true,
+    connections sets are checked before being handed out and reconnected if
+    the connection to the database has been lost.
+    """
 
-    def __init__(self, source, size):
-        self._cnxsets = []
+    def __init__(self, source, size, min_size=1, timeout=5, idle_timeout=None,
+                 max_age=None, pre_ping=False):
+        self._source = source
+        self.size = size
+        self.min_size = min(min_size, size) if size is not None else None
+        self.timeout = timeout
+        self.idle_timeout = idle_timeout
+        self.max_age = max_age
+        self.pre_ping = pre_ping
+        # opened connections sets, with their opening time
+        self._cnxsets = {}
+        # idle connections sets and the time at which they've been released,
+        # the most recently released last
+        self._idle = []
+        # number of connections sets being opened
+        self._opening = 0
+        self._cond = threading.Condition()
+        # set to stop the thread closing idle connections sets, see start()
+        self._stopped = threading.Event()
         if size is not None:
-            self._queue = queue.Queue()
-            for i in range(size):
-                cnxset = source.wrapped_connection()
-                self._cnxsets.append(cnxset)
-                self._queue.put_nowait(cnxset)
+            for i in range(self.min_size):
+                self._idle.append((self._open(), time()))
+
+    def _open(self):
+        cnxset = self._source.wrapped_connection()
+        with self._cond:
+            self._cnxsets[cnxset] = time()
+        return cnxset
+
+    def _discard(self, cnxset):
+        with self._cond:
+            self._cnxsets.pop(cnxset, None)
+            self._cond.notify()
+        try:
+            cnxset.close(True)
+        except Exception:
+            self.exception('error while closing %s' % cnxset)
+
+    def _check(self, cnxset):
+        """reconnect `cnxset` if it is too old or if its connection to the
+        database has been lost
+        """
+        now = time()
+        if self.max_age and self._cnxsets[cnxset] + self.max_age < now:
+            self.info('recycling connections set %s', cnxset)
+        elif self.pre_ping and not cnxset.ping():
+            self.warning('connections set %s lost its connection', cnxset)
         else:
-            self._queue = None
-            self._source = source
-        super(_CnxSetPool, self).__init__()
+            return
+        try:
+            cnxset.reconnect()
+        except Exception:
+            self._discard(cnxset)
+            raise
+        with self._cond:
+            self._cnxsets[cnxset] = now
 
     def qsize(self):
-        q = self._queue
-        if q is None:
+        """return the number of connections sets which may be obtained without
+        waiting, or None if connections sets are not pooled
+        """
+        if self.size is None:
             return None
-        return q.qsize()
+        with self._cond:
+            return len(self._idle) + self.size - len(self._cnxsets) - self._opening
 
     def get(self):
-        q = self._queue
-        if q is None:
+        if self.size is None:
             return self._source.wrapped_connection()
-        try:
-            return self._queue.get(True, timeout=5)
-        except queue.Empty:
-            raise Exception('no connections set available after 5 secs, probably either a '
-                            'bug in code (too many uncommited/rolled back '
-                            'connections) or too much load on the server (in '
-                            'which case you can try to set a bigger '
-                            'connections pool size)')
+        start = time()
+        cnxset = None
+        with self._cond:
+            while True:
+                if self._idle:
+                    cnxset = self._idle.pop()[0]
+                    break
+                if len(self._cnxsets) + self._opening < self.size:
+                    self._opening += 1
+                    break
+                remaining = start + self.timeout - time()
+                if remaining <= 0:
+                    statsd_c('cnxset_timeout')
+                    raise Exception('no connections set available after %s secs, probably '
+                                    'either a bug in code (too many uncommited/rolled '
+                                    'back connections) or too much load on the server '
+                                    '(in which case you can try to set a bigger '
+                                    'connections pool size)' % self.timeout)
+                self._cond.wait(remaining)
+        if cnxset is None:
+            try:
+                cnxset = self._open()
+            finally:
+                with self._cond:
+                    self._opening -= 1
+                    if cnxset is None:
+                        self._cond.notify()
+        else:
+            self._check(cnxset)
+        statsd_t('cnxset_wait_time', (time() - start) * 1000)
+        self._send_stats()
+        return cnxset
 
     def release(self, cnxset):
-        q = self._queue
-        if q is None:
+        if self.size is None:
             cnxset.close(True)
-        else:
-            self._queue.put_nowait(cnxset)
+            return
+        with self._cond:
+            now = time()
+            self._idle.append((cnxset, now))
+            toclose = self._pop_expired(now)
+            self._cond.notify()
+        self._close_all(toclose)
+        self._send_stats()
+
+    def close_idle(self):
+        """close connections sets idle for more than `idle_timeout` seconds,
+        until there are `min_size` of them left
+        """
+        with self._cond:
+            toclose = self._pop_expired(time())
+        if toclose:
+            self._close_all(toclose)
+            self._send_stats()
+
+    def _pop_expired(self, now):
+        """remove from the pool and return connections sets idle for more than
+        `idle_timeout` seconds, starting from those released for the longest
+        time, so that at least `min_size` of them are left. The pool's lock
+        should be held.
+        """
+        expired = []
+        if self.size is None or not self.idle_timeout:
+            return expired
+        while (self._idle and len(self._cnxsets) > self.min_size
+               and self._idle[0][1] + self.idle_timeout < now):
+            idle = self._idle.pop(0)[0]
+            del self._cnxsets[idle]
+            expired.append(idle)
+        return expired
+
+    def _close_all(self, cnxsets):
+        for cnxset in cnxsets:
+            try:
+                cnxset.close(True)
+            except Exception:
+                self.exception('error while closing %s' % cnxset)
+
+    def start(self, repo):
+        """start a thread of `repo` closing connections sets once they have
+        been idle for `idle_timeout` seconds, even when no connections set is
+        released, until :meth:`stop` is called
+        """
+        if self.size is None or not self.idle_timeout or self.size <= self.min_size:
+            return
+        interval = min(self.idle_timeout, 60)
+
+        def close_idle_cnxsets():
+            while not self._stopped.wait(interval):
+                try:
+                    self.close_idle()
+                except Exception:
+                    self.exception('error while closing idle connections sets')
+        repo.threaded_task(close_idle_cnxsets)
+
+    def stop(self):
+        """stop the thread started by :meth:`start`, if any"""
+        self._stopped.set()
+
+    def _send_stats(self):
+        with self._cond:
+            nbidle, nbopened = len(self._idle), len(self._cnxsets)
+        statsd_g('cnxsets_idle', nbidle)
+        statsd_g('cnxsets_in_use', nbopened - nbidle)
 
     def __iter__(self):
-        for cnxset in self._cnxsets:
+        with self._cond:
+            cnxsets = list(self._cnxsets)
+        for cnxset in cnxsets:
             yield cnxset
 
     def close(self):
-        q = self._queue
-        if q is not None:
-            while not q.empty():
-                cnxset = q.get_nowait()
-                try:
-                    cnxset.close(True)
-                except Exception:
-                    self.exception('error while closing %s' % cnxset)
+        self.stop()
+        with self._cond:
+            idle = [cnxset for cnxset, since in self._idle]
+            self._idle = []
+            for cnxset in idle:
+                del self._cnxsets[cnxset]
+        self._close_all(idle)
+
+    # these are overridden by set_log_methods below
+    # only defining here to prevent pylint from complaining
+    info = warning = error = critical = exception = debug = lambda msg, *a, **kw: None
 
 
 class Repository(object):
@@ -227,7 +451,9 @@ class Repository(object):
         # querier helper, need to be created after sources initialization
         self.querier = querier.QuerierHelper(self, self.schema)
         # cache eid -> type
-        self._type_cache = {}
+        self._type_cache = EidTypeCache(config['type-cache-size'])
+        # rql / sql caches shared with other processes, if enabled
+        self.plan_cache = None
         # the hooks manager
         self.hm = hook.HooksManager(self.vreg)
 
@@ -242,60 +468,79 @@ class Repository(object):
             pool_size, min_pool_size = config['connections-pool-size'], 1
         else:
             pool_size = min_pool_size = None
+        pool_options = {'min_size': config['connections-pool-min-size'],
+                        'timeout': config['connections-pool-timeout'],
+                        'idle_timeout': config['connections-pool-idle-timeout'],
+                        'max_age': config['connections-pool-recycle'],
+                        'pre_ping': config['connections-pool-pre-ping']}
         # 0. init a cnxset that will be used to fetch bootstrap information from
         #    the database
         self.cnxsets = _CnxSetPool(self.system_source, min_pool_size)
         # 1. set used cubes
-        if config.creating or not config.read_instance_schema:
-            config.bootstrap_cubes()
-        else:
-            self.set_schema(self.config.load_bootstrap_schema(), resetvreg=False)
-            config.init_cubes(self.get_cubes())
+        with startupprofile.measure('phase', 'config'):
+            if config.creating or not config.read_instance_schema:
+                config.bootstrap_cubes()
+            else:
+                self.set_schema(self.config.load_bootstrap_schema(), resetvreg=False)
+                config.init_cubes(self.get_cubes())
         # 2. load schema
-        if config.quick_start:
-            # quick start: only to get a minimal repository to get cubes
-            # information (eg dump/restore/...)
-            #
-            # restrict appobject_path to only load hooks and entity classes in
-            # the registry
-            config.cube_appobject_path = set(('hooks', 'entities'))
-            config.cubicweb_appobject_path = set(('hooks', 'entities'))
-            # limit connections pool size
-            pool_size = min_pool_size
-        if config.quick_start or config.creating or not config.read_instance_schema:
-            # load schema from the file system
-            if not config.creating:
-                self.info("set fs instance's schema")
-            self.set_schema(config.load_schema(expand_cubes=True))
-            if not config.creating:
-                # set eids on entities schema
-                with self.internal_cnx() as cnx:
-                    for etype, eid in cnx.execute('Any XN,X WHERE X is CWEType, X name XN'):
-                        try:
-                            self.schema.eschema(etype).eid = eid
-                        except KeyError:
-                            # etype in the database doesn't exist in the fs schema, this may occur
-                            # during dev and we shouldn't crash
-                            self.warning('No %s entity type in the file system schema', etype)
-        else:
-            # normal start: load the instance schema from the database
-            self.info('loading schema from the repository')
-            self.set_schema(self.deserialize_schema())
+        with startupprofile.measure('phase', 'schema'):
+            if config.quick_start:
+                # quick start: only to get a minimal repository to get cubes
+                # information (eg dump/restore/...)
+                #
+                # restrict appobject_path to only load hooks and entity classes in
+                # the registry
+                config.cube_appobject_path = set(('hooks', 'entities'))
+                config.cubicweb_appobject_path = set(('hooks', 'entities'))
+                # limit connections pool size
+                pool_size = min_pool_size
+            if config.quick_start or config.creating or not config.read_instance_schema:
+                # load schema from the file system
+                if not config.creating:
+                    self.info("set fs instance's schema")
+                self.set_schema(config.load_schema(expand_cubes=True))
+                if not config.creating:
+                    # set eids on entities schema
+                    with self.internal_cnx() as cnx:
+                        for etype, eid in cnx.execute('Any XN,X WHERE X is CWEType, X name XN'):
+                            try:
+                                self.schema.eschema(etype).eid = eid
+                            except KeyError:
+                                # etype in the database doesn't exist in the fs schema, this
+                                # may occur during dev and we shouldn't crash
+                                self.warning('No %s entity type in the file system schema', etype)
+            else:
+                # normal start: load the instance schema from the database
+                self.info('loading schema from the repository')
+                if config['schema-snapshot']:
+                    self.set_schema(schemasnapshot.load_schema(self))
+                else:
+                    self.set_schema(self.deserialize_schema())
         # 3. initialize data sources
-        if config.creating:
-            # call init_creating so that for instance native source can
-            # configurate tsearch according to postgres version
-            self.system_source.init_creating()
-        else:
-            self._init_system_source()
-            if 'CWProperty' in self.schema:
-                self.vreg.init_properties(self.properties())
+        with startupprofile.measure('phase', 'sources'):
+            if config.creating:
+                # call init_creating so that for instance native source can
+                # configurate tsearch according to postgres version
+                self.system_source.init_creating()
+            else:
+                self._init_system_source()
+                if 'CWProperty' in self.schema:
+                    self.vreg.init_properties(self.properties())
         # 4. close initialization connection set and reopen fresh ones for
         #    proper initialization
         self.cnxsets.close()
-        self.cnxsets = _CnxSetPool(self.system_source, pool_size)
+        self.cnxsets = _CnxSetPool(self.system_source, pool_size, **pool_options)
+        self.cnxsets.start(self)
         # 5. call instance level initialisation hooks
-        self.hm.call_hooks('server_startup', repo=self)
+        with startupprofile.measure('phase', 'hooks'):
+            self.hm.call_hooks('server_startup', repo=self)
+        # 6. pre-load rql / sql caches from those of other processes, once
+        #    custom storages have been set by startup hooks
+        if config['rql-plan-cache'] and not (config.creating or config.quick_start):
+            self.plan_cache = plancache.PlanCache(self, plancache.plan_cache_path(config))
+            self.plan_cache.load()
+            self.plan_cache.start()
 
     def source_by_uri(self, uri):
         with self.internal_cnx() as cnx:
@@ -365,7 +610,8 @@ class Repository(object):
         self.info('set schema %s %#x', schema.name, id(schema))
         if resetvreg:
             # trigger full reload of all appobjects
-            self.vreg.set_schema(schema)
+            with startupprofile.measure('phase', 'vreg'):
+                self.vreg.set_schema(schema)
         else:
             self.vreg._set_schema(schema)
         self.querier.set_schema(schema)
@@ -448,6 +694,9 @@ class Repository(object):
         if not (self.config.creating or self.config.repairing
                 or self.config.quick_start):
             self.hm.call_hooks('server_shutdown', repo=self)
+        if self.plan_cache is not None:
+            self.plan_cache.stop()
+        self.cnxsets.stop()
         for thread in self._running_threads:
             self.info('waiting thread %s...', thread.getName())
             thread.join()
@@ -638,17 +887,12 @@ class Repository(object):
 
     def clear_caches(self, eids=None):
         if eids is None:
-            self._type_cache = {}
+            self._type_cache.clear()
             etypes = None
         else:
-            etypes = []
             etcache = self._type_cache
-            for eid in eids:
-                try:
-                    etype = etcache.pop(int(eid))  # may be a string in some cases
-                except KeyError:
-                    etype = None
-                etypes.append(etype)
+            # eid may be a string in some cases
+            etypes = [etcache.pop(int(eid)) for eid in eids]
         self.querier.clear_caches(eids, etypes)
         self.system_source.clear_caches(eids, etypes)
 
@@ -658,12 +902,36 @@ class Repository(object):
             eid = int(eid)
         except ValueError:
             raise UnknownEid(eid)
-        try:
-            return self._type_cache[eid]
-        except KeyError:
+        etype = self._type_cache.get(eid)
+        if etype is None:
             etype = self.system_source.eid_type(cnx, eid)
             self._type_cache[eid] = etype
-            return etype
+        return etype
+
+    def types_from_eids(self, cnx, eids):
+        """Return a dictionary mapping eids to their entity type.
+
+        Eids which are not cached are resolved using a single query. Those
+        which don't exist are missing from the returned dictionary.
+        """
+        types = {}
+        missing = set()
+        get_type = self._type_cache.get
+        for eid in eids:
+            try:
+                eid = int(eid)
+            except ValueError:
+                raise UnknownEid(eid)
+            etype = get_type(eid)
+            if etype is None:
+                missing.add(eid)
+            else:
+                types[eid] = etype
+        if missing:
+            found = self.system_source.eids_type(cnx, missing)
+            self._type_cache.update(found)
+            types.update(found)
+        return types
 
     def add_info(self, cnx, entity, source):
         """add type and source info for an eid into the system table,
@@ -828,8 +1096,12 @@ class Repository(object):
         # and does not use setdefault on purpose. Unless a new release
         # of the Python interpreter advertises large perf improvements
         # in setdefault, this should not be changed without profiling.
+        types = self.types_from_eids(cnx, eids)
         for eid in eids:
-            etype = self.type_from_eid(eid, cnx)
+            try:
+                etype = types[int(eid)]
+            except KeyError:
+                raise UnknownEid(eid)
             entity = cnx.entity_from_eid(eid, etype)
             try:
                 data_by_etype[etype].append(entity)
@@ -926,3 +1198,4 @@ class Repository(object):
 
 
 set_log_methods(Repository, getLogger('cubicweb.repository'))
+set_log_methods(_CnxSetPool, getLogger('cubicweb.repository'))
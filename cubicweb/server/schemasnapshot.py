@@ -0,0 +1,170 @@
+# copyright 2026 LOGILAB S.A. (Paris, FRANCE), all rights reserved.
+# contact http://www.logilab.fr/ -- mailto:contact@logilab.fr
+#
+# This file is part of CubicWeb.
+#
+# CubicWeb is free software: you can redistribute it and/or modify it under the
+# terms of the GNU Lesser General Public License as published by the Free
+# Software Foundation, either version 2.1 of the License, or (at your option)
+# any later version.
+#
+# CubicWeb is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public License along
+# with CubicWeb.  If not, see <http://www.gnu.org/licenses/>.
+"""Snapshot of the instance's schema, shared by the processes of an instance.
+
+At startup, each process of an instance rebuilds its schema from the content
+of the database using many RQL queries (see
+:func:`cubicweb.server.schemaserial.deserialize_schema`), which may take a
+while for large schemas.
+
+When the `schema-snapshot` option is set, the deserialized schema is pickled
+into a file of the instance's data directory, along with a key computed from
+the content of the tables storing the schema, versions of the instance's cubes
+stored in the database and versions of the code used to build the schema.
+Processes load it instead of deserializing the schema when its key matches the
+current one. The snapshot is written after the schema has been deserialized
+and after the instance has been migrated.
+"""
+
+import os
+import pickle
+from hashlib import md5
+from logging import getLogger
+from os.path import join
+
+import yams
+
+from cubicweb import set_log_methods
+from cubicweb.__pkginfo__ import version as cw_version
+from cubicweb.schema import SCHEMA_TYPES
+from cubicweb.server.sqlutils import SQL_PREFIX
+
+# increment when the content of snapshots changes
+SNAPSHOT_FORMAT = 1
+
+
+def schema_key(cnx):
+    """Return a checksum of the content of the tables from which the schema is
+    deserialized and of the cubes' versions stored in the database, or None if
+    they can't be read.
+    """
+    schema = cnx.repo.schema
+    digest = md5()
+
+    def update(*values):
+        digest.update(repr(values).encode('utf-8'))
+
+    update(SNAPSHOT_FORMAT, cw_version, yams.__version__)
+    queries = ["SELECT cw_pkey, cw_value FROM cw_CWProperty "
+               "WHERE cw_pkey LIKE 'system.version.%' ORDER BY cw_pkey"]
+    # groups are referenced by permissions
+    for type in sorted(SCHEMA_TYPES | set(['CWGroup'])):
+        if schema.has_entity(type):
+            queries.append('SELECT * FROM %s%s ORDER BY %seid'
+                           % (SQL_PREFIX, type, SQL_PREFIX))
+        elif schema.has_relation(type):
+            rschema = schema.rschema(type)
+            if not (rschema.final or rschema.inlined or getattr(rschema, 'rule', None)):
+                queries.append('SELECT eid_from, eid_to FROM %s_relation '
+                               'ORDER BY eid_from, eid_to' % type)
+    try:
+        for sql in queries:
+            update(sql)
+            for row in cnx.system_sql(sql).fetchall():
+                update(*[_comparable(value) for value in row])
+    except Exception:
+        cnx.rollback()
+        SchemaSnapshot.exception('unable to compute schema key')
+        return None
+    return digest.hexdigest()
+
+
+def _comparable(value):
+    # binary values (such as default values of attributes) may be returned as
+    # file-like or memoryview objects
+    if hasattr(value, 'getvalue'):
+        return value.getvalue()
+    if isinstance(value, memoryview):
+        return value.tobytes()
+    return value
+
+
+class SchemaSnapshot(object):
+    """Pickled schema of an instance stored in `path`."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def read(self, key):
+        """Return the schema stored in the snapshot, or None if there is no
+        snapshot or if it has been written for another key.
+        """
+        try:
+            with open(self.path, 'rb') as stream:
+                data = pickle.load(stream)
+        except FileNotFoundError:
+            return None
+        except Exception:
+            self.exception('unable to read schema snapshot %s, ignoring it', self.path)
+            return None
+        if not isinstance(data, dict) or data.get('key') != key:
+            self.info('schema snapshot %s is outdated, ignoring it', self.path)
+            return None
+        return data['schema']
+
+    def write(self, key, schema):
+        """Atomically replace the snapshot by `schema` associated to `key`."""
+        tmppath = '%s.%s.tmp' % (self.path, os.getpid())
+        try:
+            with open(tmppath, 'wb') as stream:
+                pickle.dump({'key': key, 'schema': schema}, stream,
+                            pickle.HIGHEST_PROTOCOL)
+            os.replace(tmppath, self.path)
+        except Exception:
+            self.exception('unable to write schema snapshot %s', self.path)
+            try:
+                os.unlink(tmppath)
+            except OSError:
+                pass
+
+
+def load_schema(repo):
+    """Return the instance's schema, loaded from its snapshot if it's up to
+    date, else deserialized from the database, in which case the snapshot is
+    written.
+    """
+    snapshot = SchemaSnapshot(schema_snapshot_path(repo.config))
+    with repo.internal_cnx() as cnx:
+        key = schema_key(cnx)
+    if key is None:
+        return repo.deserialize_schema()
+    schema = snapshot.read(key)
+    if schema is not None:
+        snapshot.info('loaded schema from snapshot %s', snapshot.path)
+        return schema
+    schema = repo.deserialize_schema()
+    snapshot.write(key, schema)
+    return schema
+
+
+def write_snapshot(repo):
+    """Deserialize the instance's schema from the database and write its
+    snapshot, e.g. once it has been migrated.
+    """
+    snapshot = SchemaSnapshot(schema_snapshot_path(repo.config))
+    with repo.internal_cnx() as cnx:
+        key = schema_key(cnx)
+    if key is not None:
+        snapshot.write(key, repo.deserialize_schema())
+
+
+def schema_snapshot_path(config):
+    return join(config.appdatahome, 'schema-snapshot.pickle')
+
+
+set_log_methods(SchemaSnapshot, getLogger('cubicweb.schemasnapshot'))
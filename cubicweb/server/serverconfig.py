@@ -135,8 +135,43 @@ the repository rather than the user running the command',
         ('connections-pool-size',
          {'type' : 'int',
           'default': 4,
-          'help': 'size of the connections pool. Each source supporting multiple \
-connections will have this number of opened connections.',
+          'help': 'maximum size of the connections pool, i.e. maximum number \
+of connections sets opened to the system source.',
+          'group': 'main', 'level': 3,
+          }),
+        ('connections-pool-min-size',
+         {'type' : 'int',
+          'default': 1,
+          'help': 'minimum number of connections sets kept opened by the \
+connections pool. Others are opened when needed, up to connections-pool-size, \
+and closed once they have been idle for connections-pool-idle-timeout.',
+          'group': 'main', 'level': 3,
+          }),
+        ('connections-pool-timeout',
+         {'type' : 'time',
+          'default': '5s',
+          'help': 'maximum time to wait for a connections set to be available.',
+          'group': 'main', 'level': 3,
+          }),
+        ('connections-pool-idle-timeout',
+         {'type' : 'time',
+          'default': '10min',
+          'help': 'duration of inactivity after which connections sets beyond \
+connections-pool-min-size are closed. 0 to never close them.',
+          'group': 'main', 'level': 3,
+          }),
+        ('connections-pool-recycle',
+         {'type' : 'time',
+          'default': 0,
+          'help': 'age after which a connections set is reconnected before \
+being used. 0 to never reconnect them.',
+          'group': 'main', 'level': 3,
+          }),
+        ('connections-pool-pre-ping',
+         {'type' : 'yn',
+          'default': False,
+          'help': 'check connections to the database are still alive before \
+using them, and reconnect them if not.',
           'group': 'main', 'level': 3,
           }),
         ('rql-cache-size',
@@ -145,6 +180,28 @@ connections will have this number of opened connections.',
           'help': 'size of the parsed rql cache size.',
           'group': 'main', 'level': 3,
           }),
+        ('type-cache-size',
+         {'type' : 'int',
+          'default': 100000,
+          'help': 'maximum number of eids whose entity type is kept in cache.',
+          'group': 'main', 'level': 3,
+          }),
+        ('rql-plan-cache',
+         {'type' : 'yn',
+          'default': False,
+          'help': 'share parsed rql and generated sql caches between processes \
+of the instance using a file of the instance\'s data directory, so that newly \
+started processes don\'t have to warm up their caches from cold.',
+          'group': 'main', 'level': 3,
+          }),
+        ('schema-snapshot',
+         {'type' : 'yn',
+          'default': False,
+          'help': 'store the schema deserialized from the database in a file of \
+the instance\'s data directory, so that processes of the instance load it \
+instead of deserializing it again as long as the schema isn\'t modified.',
+          'group': 'main', 'level': 3,
+          }),
         ('undo-enabled',
          {'type' : 'yn', 'default': False,
           'help': 'enable undo support',
@@ -172,6 +229,21 @@ detect updates / deletions.',
           'system (using cron for instance).',
           'group': 'main', 'level': 3,
           }),
+        ('async-full-text-indexation',
+         {'type' : 'yn', 'default': False,
+          'help': 'When activated, entities added/modified by users are only \
+queued for full text indexation at commit time. They are indexed later, by \
+batches, by a looping task of the repository (hence this requires a process \
+running the repository scheduler, such as cubicweb-ctl scheduler). Use \
+cubicweb-ctl db-rebuild-fti --resume to index queued entities by hand.',
+          'group': 'main', 'level': 3,
+          }),
+        ('async-full-text-indexation-interval',
+         {'type' : 'time', 'default': '10s',
+          'help': 'interval between two runs of the task indexing entities \
+queued for full text indexation, when async-full-text-indexation is set.',
+          'group': 'main', 'level': 3,
+          }),
 
         # email configuration
         ('default-recipients-mode',
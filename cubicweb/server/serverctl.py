@@ -960,20 +960,59 @@ class RebuildFTICommand(Command):
 
     If no etype is specified, cubicweb will reindex everything, otherwise
     only specified etypes will be considered.
+
+    Entities to reindex are first queued, then indexed by batches (possibly
+    by several processes, see --jobs). If interrupted, indexation may be
+    resumed using --resume, which also indexes entities queued because of the
+    async-full-text-indexation option.
     """
     name = 'db-rebuild-fti'
     arguments = '<instance>'
     min_args = 1
+    options = (
+        ('resume',
+         {'short': 'r', 'action': 'store_true',
+          'default': False,
+          'help': 'only index entities queued for full text indexation.',
+          }),
+        ('jobs',
+         {'short': 'j', 'type': 'int', 'metavar': '<number>',
+          'default': 1,
+          'help': 'number of processes indexing entities.',
+          }),
+        ('partition',
+         {'type': 'string', 'metavar': '<index>/<count>',
+          'default': None,
+          'help': 'only index queued entities whose eid modulo <count> is '
+          '<index>. This is used by --jobs.',
+          }),
+    )
 
     def run(self, args):
-        from cubicweb.server.checkintegrity import reindex_entities
+        import subprocess
+        from cubicweb.server.checkintegrity import (queue_fti_rebuild,
+                                                    index_queued_entities)
         appid = args.pop(0)
         etypes = args or None
         config = ServerConfiguration.config_for(appid)
         repo, cnx = repo_cnx(config)
+        partition = self.config.partition
+        if partition is not None:
+            partition = tuple(int(part) for part in partition.split('/'))
         with cnx:
-            reindex_entities(repo.schema, cnx, etypes=etypes)
-            cnx.commit()
+            if not self.config.resume:
+                print('%s entities to reindex' % queue_fti_rebuild(repo.schema, cnx, etypes))
+            if self.config.jobs > 1:
+                jobs = [subprocess.Popen(
+                    [sys.executable, '-m', 'cubicweb.cwctl', 'db-rebuild-fti',
+                     '--resume', '--partition', '%s/%s' % (i, self.config.jobs), appid])
+                    for i in range(self.config.jobs)]
+                if any(job.wait() for job in jobs):
+                    raise ExecutionError('some indexation process failed, use '
+                                         '--resume to complete the indexation')
+            else:
+                index_queued_entities(cnx, withpb=partition is None,
+                                      partition=partition)
 
 
 class RepositorySchedulerCommand(Command):
@@ -1014,6 +1053,41 @@ class RepositorySchedulerCommand(Command):
             repo.shutdown()
 
 
+class StartupProfileCommand(Command):
+    """Report time and memory spent while starting an instance's repository.
+
+    Measures are reported by startup phase (config, schema, vreg, sources,
+    hooks), by cube and by appobjects module. Memory is measured using
+    tracemalloc, which noticeably slows down the startup.
+
+    <instance>
+      the identifier of the instance
+    """
+    name = 'startup-profile'
+    arguments = '<instance>'
+    min_args = max_args = 1
+    options = (
+        ('limit',
+         {'short': 'n', 'type': 'int', 'metavar': '<number>', 'default': 20,
+          'help': 'number of modules to report, by decreasing time'},
+         ),
+    )
+
+    def run(self, args):
+        from cubicweb.server.repository import Repository
+        from cubicweb.startupprofile import StartupProfiler, measure
+        with StartupProfiler() as profiler:
+            with measure('phase', 'config'):
+                config = ServerConfiguration.config_for(args[0])
+            with measure('phase', 'sources'):
+                repo = Repository(config)
+            repo.bootstrap()
+        try:
+            profiler.report(sys.stdout, limit=self['limit'])
+        finally:
+            repo.shutdown()
+
+
 class SynchronizeSourceCommand(Command):
     """Force sources synchronization.
 
@@ -1123,7 +1197,7 @@ for cmdclass in (CreateInstanceDBCommand, InitInstanceCommand,
                  DBDumpCommand, DBRestoreCommand, DBCopyCommand, DBIndexSanityCheckCommand,
                  AddSourceCommand, CheckRepositoryCommand, RebuildFTICommand,
                  SynchronizeSourceCommand, SchemaDiffCommand,
-                 RepositorySchedulerCommand,
+                 RepositorySchedulerCommand, StartupProfileCommand,
                  ):
     CWCTL.register(cmdclass)
 
@@ -670,6 +670,19 @@ class Connection(RequestSessionBase):
         rset.req = self
         return rset
 
+    @_open_only
+    def execute_iter(self, rql, kwargs=None, build_descr=True, chunksize=1000):
+        """execute a select query and return an iterator on result sets holding
+        at most `chunksize` rows each.
+
+        Rows are fetched from the database as the iterator is consumed (using a
+        server-side cursor on postgres), so that huge results may be processed
+        in constant memory. The iterator should be consumed before the end of
+        the transaction.
+        """
+        return self.repo.querier.execute_iter(self, rql, kwargs, build_descr,
+                                              chunksize)
+
     @_open_only
     def rollback(self):
         """rollback the current transaction"""
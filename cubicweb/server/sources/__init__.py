@@ -296,6 +296,12 @@ class AbstractSource(object):
         """Return the type of entity `eid`."""
         raise NotImplementedError(self)
 
+    def eids_type(self, cnx, eids):
+        """Return a dictionary mapping eids to their entity type, for those of
+        `eids` which exist.
+        """
+        raise NotImplementedError(self)
+
     def create_eid(self, cnx):
         raise NotImplementedError(self)
 
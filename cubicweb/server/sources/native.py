@@ -19,14 +19,20 @@
 
 from threading import Lock
 from datetime import datetime
+from time import time
 from contextlib import contextmanager
 from os.path import basename
+import hashlib
 import pickle
+import queue
 import re
 import itertools
+import threading
 import zipfile
+import zlib
 import logging
 import sys
+from operator import length_hint
 
 from logilab.common.decorators import cached, clear_cache
 from logilab.common.configuration import Method
@@ -44,13 +50,14 @@ from cubicweb.cwconfig import CubicWebNoAppConfiguration
 from cubicweb.server import hook
 from cubicweb.server import schema2sql as y2sql
 from cubicweb.server.utils import crypt_password, verify_and_update
-from cubicweb.server.sqlutils import SQL_PREFIX, SQLAdapterMixIn
+from cubicweb.server.sqlutils import (SQL_PREFIX, SQLAdapterMixIn, PGRestoreHelper,
+                                      insert_many)
 from cubicweb.server.rqlannotation import set_qdata
 from cubicweb.server.hook import CleanupDeletedEidsCacheOp
 from cubicweb.server.edition import EditedEntity
 from cubicweb.server.sources import AbstractSource, dbg_st_search, dbg_results
 from cubicweb.server.sources.rql2sql import SQLGenerator
-from cubicweb.statsd_logger import statsd_timeit
+from cubicweb.statsd_logger import statsd_timeit, statsd_c
 
 
 ATTR_MAP = {}
@@ -179,24 +186,61 @@ AND (EXISTS(SELECT 1 FROM tx_entity_actions AS TEA
 
 
 class DefaultEidGenerator(object):
-    __slots__ = ('source', 'cnx', 'lock')
+    """Generate eids using the `entities_id_seq` numrange, through a dedicated
+    connection.
+
+    If `range_size` is greater than 1, eids are reserved by blocks of this size
+    and handed out without touching the database until the block is
+    exhausted. Eids of the current block which have not been used are wasted
+    when the generator is closed. The number of reserved ranges and of wasted
+    eids are available as `reserved_ranges` and `wasted_eids` attributes.
+    """
+    __slots__ = ('source', 'cnx', 'lock', 'range_size', '_eids',
+                 'reserved_ranges', 'wasted_eids')
 
-    def __init__(self, source):
+    def __init__(self, source, range_size=1):
         self.source = source
         self.cnx = None
         self.lock = Lock()
+        self.range_size = range_size
+        # iterator on eids of the current reserved range
+        self._eids = iter(())
+        self.reserved_ranges = 0
+        self.wasted_eids = 0
 
     def close(self):
+        with self.lock:
+            wasted = length_hint(self._eids)
+            if wasted:
+                self.wasted_eids += wasted
+                statsd_c('eids_wasted', wasted)
+            self._eids = iter(())
         if self.cnx:
             self.cnx.close()
         self.cnx = None
 
     def create_eid(self, _cnx, count=1):
+        assert count > 0
+        if count == 1 and self.range_size > 1:
+            # fast path, next() on a range iterator doesn't release the GIL so
+            # it's safe to call it without locking
+            try:
+                return next(self._eids)
+            except StopIteration:
+                pass
         # lock needed to prevent 'Connection is busy with results for another
         # command (0)' errors with SQLServer
-        assert count > 0
         with self.lock:
-            return self._create_eid(count)
+            if count > 1 or self.range_size <= 1:
+                return self._create_eid(count)
+            # another thread may have reserved a new range meanwhile
+            for eid in self._eids:
+                return eid
+            last = self._create_eid(self.range_size)
+            self.reserved_ranges += 1
+            statsd_c('eids_range_reserved')
+            self._eids = iter(range(last - self.range_size + 2, last + 1))
+            return last - self.range_size + 1
 
     def _create_eid(self, count):
         # internal function doing the eid creation without locking.
@@ -320,6 +364,15 @@ class NativeSQLSource(SQLAdapterMixIn, AbstractSource):
           'help': 'sql statement timeout, in milliseconds (postgres only)',
           'group': 'native-source', 'level': 2,
           }),
+        ('eids-range-size',
+         {'type': 'int',
+          'default': 1,
+          'help': 'number of eids reserved at once by each process, to avoid a '
+                  'database round trip for each created entity. Unused eids of '
+                  'a reserved range are lost when the process stops '
+                  '(not used with sqlite)',
+          'group': 'native-source', 'level': 2,
+          }),
     )
 
     def __init__(self, repo, source_config, *args, **kwargs):
@@ -333,6 +386,9 @@ class NativeSQLSource(SQLAdapterMixIn, AbstractSource):
                                              ATTR_MAP.copy())
         # full text index helper
         self.do_fti = not repo.config['delay-full-text-indexation']
+        # if true, entities are queued in the fti_pending table at commit
+        # time and indexed later by fti_index_pending
+        self.fti_queue = repo.config['async-full-text-indexation']
         # sql queries cache
         self._cache = QueryCache(repo.config['rql-cache-size'])
         # (etype, attr) / storage mapping
@@ -341,7 +397,7 @@ class NativeSQLSource(SQLAdapterMixIn, AbstractSource):
         if self.dbdriver == 'sqlite':
             self.eid_generator = SQLITEEidGenerator(self)
         else:
-            self.eid_generator = DefaultEidGenerator(self)
+            self.eid_generator = DefaultEidGenerator(self, self.config['eids-range-size'])
         self.create_eid = self.eid_generator.create_eid
 
     def check_config(self, source_entity):
@@ -506,26 +562,57 @@ class NativeSQLSource(SQLAdapterMixIn, AbstractSource):
         may be cached using this key.
         """
         assert dbg_st_search(self.uri, union, args, cachekey)
+        sql, args, cbs, converters = self._union_sql(union, args, cachekey)
+        cursor = cnx.system_sql(sql, args)
+        results = self.process_result(cursor, cnx, cbs, converters)
+        assert dbg_results(results)
+        return results
+
+    def iter_syntax_tree_search(self, cnx, union, args=None, cachekey=None,
+                                chunksize=1000):
+        """same as :meth:`syntax_tree_search` but return an iterator on lists of
+        at most `chunksize` rows, fetched from the database as they are
+        consumed, using a dedicated cursor. The iterator should be consumed
+        before the end of the transaction.
+        """
+        assert dbg_st_search(self.uri, union, args, cachekey)
+        sql, args, cbs, converters = self._union_sql(union, args, cachekey)
+        cursor = cnx.cnxset.stream_cursor()
+        try:
+            self.doexec(cnx, sql, args, cursor=cursor)
+            results = self.iter_process_result(cursor, cnx, cbs, converters)
+            while True:
+                chunk = list(itertools.islice(results, chunksize))
+                if not chunk:
+                    break
+                yield chunk
+        finally:
+            cursor.close()
+
+    def _union_sql(self, union, args, cachekey):
+        """return sql, arguments, column callbacks and row converters cache
+        (see :meth:`row_converters`) for the given syntax tree, using the sql
+        cache if `cachekey` is given
+        """
         # remember number of actually selected term (sql generation may append some)
         if cachekey is None:
             self.no_cache += 1
             # generate sql query if we are able to do so (not supported types...)
             sql, qargs, cbs = self._rql_sqlgen.generate(union, args)
+            converters = None
         else:
-            # sql may be cached
+            # sql may be cached, along with converters for its results
             try:
-                sql, qargs, cbs = self._cache[cachekey]
+                sql, qargs, cbs, converters = self._cache[cachekey]
                 self.cache_hit += 1
             except KeyError:
                 self.cache_miss += 1
                 sql, qargs, cbs = self._rql_sqlgen.generate(union, args)
-                self._cache[cachekey] = sql, qargs, cbs
+                converters = {}
+                self._cache[cachekey] = sql, qargs, cbs, converters
         args = self.merge_args(args, qargs)
         assert isinstance(sql, str), repr(sql)
-        cursor = cnx.system_sql(sql, args)
-        results = self.process_result(cursor, cnx, cbs)
-        assert dbg_results(results)
-        return results
+        return sql, args, cbs, converters
 
     @contextmanager
     def _fixup_cw(self, cnx, entity):
@@ -667,11 +754,13 @@ class NativeSQLSource(SQLAdapterMixIn, AbstractSource):
         self.doexec(cnx, sql, attrs)
 
     @statsd_timeit
-    def doexec(self, cnx, query, args=None, rollback=True):
-        """Execute a query.
+    def doexec(self, cnx, query, args=None, rollback=True, cursor=None):
+        """Execute a query, using the connections set's cursor unless `cursor`
+        is given.
         it's a function just so that it shows up in profiling
         """
-        cursor = cnx.cnxset.cu
+        if cursor is None:
+            cursor = cnx.cnxset.cu
         if server.DEBUG & server.DBG_SQL:
             print('exec', query, args, cnx.cnxset.cnx)
         try:
@@ -819,6 +908,18 @@ class NativeSQLSource(SQLAdapterMixIn, AbstractSource):
             self.exception('failed to query entities table for eid %s', eid)
         raise UnknownEid(eid)
 
+    def eids_type(self, cnx, eids, chunksize=1000):
+        """Return a dictionary mapping eids to their entity type, for those of
+        `eids` existing in the entities table.
+        """
+        eids = sorted(eids)
+        types = {}
+        for i in range(0, len(eids), chunksize):
+            sql = 'SELECT eid, type FROM entities WHERE eid IN (%s)' % ','.join(
+                str(eid) for eid in eids[i:i + chunksize])
+            types.update(self.doexec(cnx, sql).fetchall())
+        return types
+
     def _handle_is_relation_sql(self, cnx, sql, attrs):
         """ Handler for specific is_relation sql that may be
         overwritten in some stores"""
@@ -1254,6 +1355,85 @@ class NativeSQLSource(SQLAdapterMixIn, AbstractSource):
         if self.do_fti:
             FTIndexEntityOp.get_instance(cnx).add_data(entity.eid)
 
+    def fti_containers(self, cnx, eids):
+        """return the set of entities whose full text index should be updated
+        when entities with the given eids are modified. Eids of entities which
+        don't exist anymore are skipped.
+        """
+        if not eids:
+            return set()
+        cursor = self.doexec(cnx, 'SELECT eid FROM entities WHERE eid IN (%s)'
+                             % ','.join(str(eid) for eid in eids))
+        eids = [eid for eid, in cursor.fetchall()]
+        if not eids:
+            return set()
+        # fetch attributes of entities using a query per entity type
+        rset = cnx.execute('Any X WHERE X eid IN (%s)' % ','.join(str(eid) for eid in eids))
+        containers = set()
+        for entity in rset.complete_entities():
+            containers |= set(entity.cw_adapt_to('IFTIndexable').fti_containers())
+        return containers
+
+    def fti_enqueue(self, cnx, eids):
+        """queue entities with the given eids for full text indexation by
+        :meth:`fti_index_pending`
+        """
+        now = time()
+        self.doexecmany(cnx, 'INSERT INTO fti_pending (eid, queued_at) '
+                        'VALUES (%(eid)s, %(queued_at)s)',
+                        [{'eid': eid, 'queued_at': now} for eid in eids])
+
+    def fti_queue_stats(self, cnx):
+        """return the number of entities queued for full text indexation and
+        the number of seconds since the oldest one has been queued
+        """
+        size, oldest = self.doexec(
+            cnx, 'SELECT COUNT(DISTINCT eid), MIN(queued_at) FROM fti_pending').fetchone()
+        if not size:
+            return 0, 0
+        return size, max(0, time() - oldest)
+
+    def fti_enqueue_etypes(self, cnx, etypes):
+        """queue all entities of the given types for full text indexation by
+        :meth:`fti_index_pending`, and return the number of queued entities
+        """
+        cursor = self.doexec(cnx, 'INSERT INTO fti_pending (eid, queued_at) '
+                             'SELECT eid, %%(queued_at)s FROM entities WHERE type IN (%s)'
+                             % ','.join("'%s'" % etype for etype in etypes),
+                             {'queued_at': time()})
+        return cursor.rowcount
+
+    def fti_index_pending(self, cnx, batchsize=1000, partition=None):
+        """index (at most `batchsize`) entities queued by :meth:`fti_enqueue`,
+        the oldest first, and return the number of processed eids.
+
+        `partition` may be given as a 2-uple (index, count) to only consider
+        entities whose eid modulo `count` is `index`, so that several
+        processes can index queued entities concurrently.
+
+        Transaction should be committed by the caller.
+        """
+        if partition is None:
+            restriction = ''
+        else:
+            restriction = ' WHERE eid %% %d = %d' % (partition[1], partition[0])
+        cursor = self.doexec(cnx, 'SELECT eid FROM fti_pending%s GROUP BY eid '
+                             'ORDER BY MIN(queued_at)' % restriction)
+        eids = [eid for eid, in cursor.fetchmany(batchsize)]
+        if not eids:
+            return 0
+        # remove eids from the queue before reading entities, so that if one of
+        # them is modified meanwhile it's queued again
+        self.doexec(cnx, 'DELETE FROM fti_pending WHERE eid IN (%s)'
+                    % ','.join(str(eid) for eid in eids))
+        containers = self.fti_containers(cnx, eids)
+        if containers and self.do_fti:
+            self.doexec(cnx, 'DELETE FROM %s WHERE %s IN (%s)' % (
+                self.dbhelper.fti_table, self.dbhelper.fti_uid_attr,
+                ','.join(str(entity.eid) for entity in containers)))
+            self.fti_index_entities(cnx, containers)
+        return len(eids)
+
     def fti_unindex_entities(self, cnx, entities):
         """remove text content for entities from the full text index
         """
@@ -1300,13 +1480,20 @@ class FTIndexEntityOp(hook.DataOperationMixIn, hook.LateOperation):
             return
         pendingeids = cnx.transaction_data.get('pendingeids', ())
         done = cnx.transaction_data.setdefault('indexedeids', set())
-        to_reindex = set()
+        eids = []
         for eid in self.get_data():
             if eid in pendingeids or eid in done:
                 # entity added and deleted in the same transaction or already
                 # processed
                 continue
             done.add(eid)
+            eids.append(eid)
+        if source.fti_queue:
+            if eids:
+                source.fti_enqueue(cnx, eids)
+            return
+        to_reindex = set()
+        for eid in eids:
             iftindexable = cnx.entity_from_eid(eid).cw_adapt_to('IFTIndexable')
             to_reindex |= set(iftindexable.fti_containers())
         source.fti_unindex_entities(cnx, to_reindex)
@@ -1362,9 +1549,23 @@ CREATE INDEX tx_relation_actions_txa_action_idx ON tx_relation_actions(txa_actio
 CREATE INDEX tx_relation_actions_txa_public_idx ON tx_relation_actions(txa_public);;
 CREATE INDEX tx_relation_actions_eid_from_idx ON tx_relation_actions(eid_from);;
 CREATE INDEX tx_relation_actions_eid_to_idx ON tx_relation_actions(eid_to);;
-CREATE INDEX tx_relation_actions_tx_uuid_idx ON tx_relation_actions(tx_uuid)
+CREATE INDEX tx_relation_actions_tx_uuid_idx ON tx_relation_actions(tx_uuid);;
+
+CREATE TABLE fti_pending (
+  eid INTEGER NOT NULL,
+  queued_at %s NOT NULL
+);;
+CREATE INDEX fti_pending_eid_idx ON fti_pending(eid);;
+
+CREATE TABLE web_sessions (
+  sid CHAR(64) PRIMARY KEY NOT NULL,
+  data %s,
+  last_access %s NOT NULL
+);;
+CREATE INDEX web_sessions_last_access_idx ON web_sessions(last_access)
 """ % (typemap['Datetime'],
-       typemap['Boolean'], typemap['Bytes'], typemap['Boolean'])).split(';'):
+       typemap['Boolean'], typemap['Bytes'], typemap['Boolean'],
+       typemap['Float'], typemap['Bytes'], typemap['Float'])).split(';'):
         yield sql
     if helper.backend_name == 'sqlite':
         # sqlite support the ON DELETE CASCADE syntax but do nothing
@@ -1383,7 +1584,8 @@ def grant_schema(user, set_owner=True):
     database system tables to `user`.
     """
     for table in ('entities', 'entities_id_seq',
-                  'transactions', 'tx_entity_actions', 'tx_relation_actions'):
+                  'transactions', 'tx_entity_actions', 'tx_relation_actions',
+                  'fti_pending', 'web_sessions'):
         if set_owner:
             yield 'ALTER TABLE %s OWNER TO %s;' % (table, user)
         yield 'GRANT ALL ON %s TO %s;' % (table, user)
@@ -1478,12 +1680,14 @@ class DatabaseIndependentBackupRestore(object):
     system database in a database independent format. The file is a
     Zip archive containing the following files:
 
-    * format.txt: the format of the archive. Currently '1.1'
+    * format.txt: the format of the archive. Currently '2.0'
     * tables.txt: list of filenames in the archive tables/ directory
     * sequences.txt: list of filenames in the archive sequences/ directory
     * numranges.txt: list of filenames in the archive numrange/ directory
     * versions.txt: the list of cube versions from CWProperty
-    * tables/<tablename>.<chunkno>: pickled data
+    * manifest.txt: one line for each file in the tables/ directory, with its
+      name, the sha256 checksum of its content and its number of rows
+    * tables/<tablename>.<chunkno>: zlib compressed pickled data
     * sequences/<sequencename>: pickled data
 
     The pickled data format for tables, numranges and sequences is a tuple of 3 elements:
@@ -1491,10 +1695,15 @@ class DatabaseIndependentBackupRestore(object):
     * a tuple of column names
     * a list of rows (as tuples with one element per column)
 
-    Tables are saved in chunks in different files in order to prevent
-    a too high memory consumption.
+    Tables are saved in chunks of `blocksize` rows in different files in order
+    to prevent a too high memory consumption. They are dumped and restored by
+    `workers` threads, each one using its own database connection.
+
+    Archives in the former '1.1' format, where table files aren't compressed
+    and there is no manifest, may still be restored.
     """
-    blocksize = 100
+    blocksize = 1000
+    workers = 4
 
     def __init__(self, source):
         """
@@ -1527,9 +1736,9 @@ class DatabaseIndependentBackupRestore(object):
             for numrange in self.get_numranges():
                 self.logger.info('processing numrange %s', numrange)
                 self.write_numrange(archive, numrange)
-            for table in self.get_tables():
-                self.logger.info('processing table %s', table)
-                self.write_table(archive, table)
+            manifest = self.write_tables(archive, self.get_tables())
+            archive.writestr('manifest.txt', '\n'.join(
+                '%s %s %d' % entry for entry in manifest))
         finally:
             archive.close()
             self.cnx.close()
@@ -1551,7 +1760,8 @@ class DatabaseIndependentBackupRestore(object):
             etype_tables.append('%s%s' % (prefix, etype))
         for rtype in self.schema.relations():
             rschema = self.schema.rschema(rtype)
-            if rschema.final or rschema.inlined or rschema in VIRTUAL_RTYPES:
+            if (rschema.final or rschema.inlined or rschema.rule
+                    or rschema in VIRTUAL_RTYPES):
                 continue
             relation_tables.append('%s_relation' % rtype)
         return non_entity_tables + etype_tables + relation_tables
@@ -1563,7 +1773,7 @@ class DatabaseIndependentBackupRestore(object):
         return ['entities_id_seq']
 
     def write_metadata(self, archive):
-        archive.writestr('format.txt', '1.1')
+        archive.writestr('format.txt', '2.0')
         archive.writestr('tables.txt', '\n'.join(self.get_tables()))
         archive.writestr('sequences.txt', '\n'.join(self.get_sequences()))
         archive.writestr('numranges.txt', '\n'.join(self.get_numranges()))
@@ -1586,27 +1796,87 @@ class DatabaseIndependentBackupRestore(object):
         serialized = self._serialize(numrange, columns, rows)
         archive.writestr('numrange/%s' % numrange, serialized)
 
-    def write_table(self, archive, table):
-        nb_lines_sql = 'SELECT COUNT(*) FROM %s' % table
-        self.cursor.execute(nb_lines_sql)
-        rowcount = self.cursor.fetchone()[0]
-        sql = 'SELECT * FROM %s' % table
-        columns, rows_iterator = self._get_cols_and_rows(sql)
-        self.logger.info('number of rows: %d', rowcount)
-        blocksize = self.blocksize
-        if rowcount > 0:
-            for i, start in enumerate(range(0, rowcount, blocksize)):
-                rows = list(itertools.islice(rows_iterator, blocksize))
-                serialized = self._serialize(table, columns, rows)
-                archive.writestr('tables/%s.%04d' % (table, i), serialized)
-                self.logger.debug('wrote rows %d to %d (out of %d) to %s.%04d',
-                                  start, start + len(rows) - 1,
-                                  rowcount,
-                                  table, i)
-        else:
-            rows = []
-            serialized = self._serialize(table, columns, rows)
-            archive.writestr('tables/%s.%04d' % (table, 0), serialized)
+    def write_tables(self, archive, tables):
+        """dump `tables` into `archive`, and return a list of (filename,
+        checksum, number of rows) for each written file.
+
+        Tables are read and their chunks compressed by worker threads, while
+        chunks are written into the archive by the current thread as soon as
+        they are ready.
+        """
+        todo = queue.Queue()
+        for table in tables:
+            todo.put(table)
+        chunks = queue.Queue(maxsize=2 * self.workers)
+        abort = threading.Event()
+
+        def dump_tables():
+            try:
+                cnx = self._source.wrapped_connection()
+                try:
+                    while not abort.is_set():
+                        try:
+                            table = todo.get_nowait()
+                        except queue.Empty:
+                            break
+                        self.logger.info('processing table %s', table)
+                        for chunk in self.iter_table_chunks(cnx, table):
+                            chunks.put(chunk)
+                            if abort.is_set():
+                                break
+                finally:
+                    cnx.close(True)
+            except Exception as exc:
+                chunks.put(exc)
+            finally:
+                chunks.put(None)
+
+        threads = [threading.Thread(target=dump_tables)
+                   for i in range(max(1, min(self.workers, len(tables))))]
+        for thread in threads:
+            thread.start()
+        manifest = []
+        error = None
+        running = len(threads)
+        while running:
+            chunk = chunks.get()
+            if chunk is None:
+                running -= 1
+            elif isinstance(chunk, Exception):
+                error = error or chunk
+                abort.set()
+            elif error is None:
+                filename, data, nbrows = chunk
+                archive.writestr(filename, data)
+                manifest.append((filename, hashlib.sha256(data).hexdigest(), nbrows))
+                self.logger.debug('wrote %d rows to %s', nbrows, filename)
+        for thread in threads:
+            thread.join()
+        if error is not None:
+            raise error
+        return manifest
+
+    def iter_table_chunks(self, cnx, table):
+        """yield (filename, compressed data, number of rows) for each chunk of
+        `table`, read from the wrapped connection `cnx`. There is at least one
+        chunk, even for empty tables.
+        """
+        cursor = cnx.stream_cursor()
+        try:
+            cursor.execute('SELECT * FROM %s' % table)
+            rows = self._source.iter_process_result(cursor)
+            for i in itertools.count():
+                block = list(itertools.islice(rows, self.blocksize))
+                if i and not block:
+                    break
+                # description of server-side cursors is only known once some
+                # results have been fetched
+                columns = tuple(d[0] for d in cursor.description)
+                serialized = self._serialize(table, columns, block)
+                yield ('tables/%s.%06d' % (table, i), zlib.compress(serialized),
+                       len(block))
+        finally:
+            cursor.close()
 
     def _get_cols_and_rows(self, sql):
         process_result = self._source.iter_process_result
@@ -1629,23 +1899,27 @@ class DatabaseIndependentBackupRestore(object):
         for numrange in numranges:
             self.logger.info('restoring numrange %s', numrange)
             self.read_numrange(archive, numrange)
-        for table in tables:
-            self.logger.info('restoring table %s', table)
-            self.read_table(archive, table, sorted(table_chunks[table]))
+        if self.format == '1.1':
+            for table in tables:
+                self.logger.info('restoring table %s', table)
+                self.read_table(archive, table, sorted(table_chunks[table]))
+        else:
+            self.read_tables(archive, tables, table_chunks)
         self.cnx.close()
         archive.close()
         self.logger.info('done')
 
     def read_metadata(self, archive, backupfile):
-        formatinfo = archive.read('format.txt')
+        formatinfo = archive.read('format.txt').decode('ascii').strip()
         self.logger.info('checking metadata')
-        if formatinfo.strip() != "1.1":
+        if formatinfo not in ('1.1', '2.0'):
             self.logger.critical('Unsupported format in archive: %s', formatinfo)
             raise ValueError('Unknown format in %s: %s' % (backupfile, formatinfo))
-        tables = archive.read('tables.txt').splitlines()
-        sequences = archive.read('sequences.txt').splitlines()
-        numranges = archive.read('numranges.txt').splitlines()
-        archive_versions = self._parse_versions(archive.read('versions.txt'))
+        self.format = formatinfo
+        tables = archive.read('tables.txt').decode('utf-8').splitlines()
+        sequences = archive.read('sequences.txt').decode('utf-8').splitlines()
+        numranges = archive.read('numranges.txt').decode('utf-8').splitlines()
+        archive_versions = self._parse_versions(archive.read('versions.txt').decode('utf-8'))
         db_versions = set(self._get_versions())
         if archive_versions != db_versions:
             self.logger.critical('Restore warning: versions do not match')
@@ -1660,12 +1934,24 @@ class DatabaseIndependentBackupRestore(object):
             if not ASK.confirm('Versions mismatch: continue anyway ?', False):
                 raise ValueError('Unable to restore: versions do not match')
         table_chunks = {}
-        for name in archive.namelist():
-            if not name.startswith('tables/'):
-                continue
-            filename = basename(name)
-            tablename, _ext = filename.rsplit('.', 1)
-            table_chunks.setdefault(tablename, []).append(name)
+        if formatinfo == '1.1':
+            for name in archive.namelist():
+                if not name.startswith('tables/'):
+                    continue
+                filename = basename(name)
+                tablename, _ext = filename.rsplit('.', 1)
+                table_chunks.setdefault(tablename, []).append(name)
+        else:
+            # table name -> list of (filename, checksum, number of rows)
+            for line in archive.read('manifest.txt').decode('utf-8').splitlines():
+                name, checksum, nbrows = line.split()
+                tablename, _ext = basename(name).rsplit('.', 1)
+                table_chunks.setdefault(tablename, []).append(
+                    (name, checksum, int(nbrows)))
+            missing = set(tables) - set(table_chunks)
+            if missing:
+                raise ValueError('Corrupted archive %s: no data for tables %s'
+                                 % (backupfile, ', '.join(sorted(missing))))
         return sequences, numranges, tables, table_chunks
 
     def read_sequence(self, archive, seq):
@@ -1706,6 +1992,95 @@ class DatabaseIndependentBackupRestore(object):
             self.cnx.commit()
         self.logger.info('inserted %d rows', row_count)
 
+    def read_tables(self, archive, tables, table_chunks):
+        """restore `tables` from a '2.0' `archive`, using worker threads.
+
+        On postgres, foreign keys and indexes other than those of primary keys
+        and unique constraints are dropped before loading data using COPY, and
+        created again once all tables are loaded. Other
+        backends are loaded by a single thread using `executemany`, with
+        foreign keys checked at the end on sqlite.
+        """
+        postgres = self.dbhelper.backend_name == 'postgres'
+        sqlite = self.dbhelper.backend_name == 'sqlite'
+        if postgres:
+            pghelper = PGRestoreHelper(
+                self.cnx, self._source.config.get('db-namespace') or 'public')
+            for table in tables:
+                # postgres folds unquoted table names to lower case
+                pghelper.drop_indexes_and_constraints(table.lower())
+            self.cnx.commit()
+            nbworkers = max(1, min(self.workers, len(tables)))
+        else:
+            nbworkers = 1
+        todo = queue.Queue()
+        for table in tables:
+            todo.put(table)
+        errors = []
+
+        def restore_tables():
+            cnx = self.get_connection()
+            if sqlite:
+                cnx.cursor().execute('PRAGMA foreign_keys = OFF')
+            try:
+                while not errors:
+                    try:
+                        table = todo.get_nowait()
+                    except queue.Empty:
+                        break
+                    self.logger.info('restoring table %s', table)
+                    self.restore_table(cnx, archive, table, table_chunks[table],
+                                       postgres)
+            except Exception as exc:
+                errors.append(exc)
+                cnx.rollback()
+            finally:
+                cnx.close()
+
+        threads = [threading.Thread(target=restore_tables) for i in range(nbworkers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        if errors:
+            raise errors[0]
+        if postgres:
+            self.logger.info('restoring indexes and constraints')
+            pghelper.restore_indexes_and_constraints()
+            self.cnx.commit()
+        elif sqlite:
+            self.cursor.execute('PRAGMA foreign_key_check')
+            failures = self.cursor.fetchall()
+            if failures:
+                self.logger.critical('%d rows violate foreign keys', len(failures))
+
+    def restore_table(self, cnx, archive, table, chunks, copy_from=False):
+        """restore `table` from the given `chunks` of `archive`, as listed in
+        its manifest, using the db-api connection `cnx`
+        """
+        merge_args = self._source.merge_args
+        cursor = cnx.cursor()
+        cursor.execute('DELETE FROM %s' % table)
+        row_count = 0
+        for filename, checksum, nbrows in chunks:
+            data = archive.read(filename)
+            if hashlib.sha256(data).hexdigest() != checksum:
+                raise ValueError('Corrupted archive: bad checksum for %s' % filename)
+            tablename, columns, rows = pickle.loads(zlib.decompress(data))
+            assert tablename == table
+            if len(rows) != nbrows:
+                raise ValueError('Corrupted archive: %s has %d rows instead of %d'
+                                 % (filename, len(rows), nbrows))
+            if not rows:
+                continue
+            insert = self.sql_generator.insert(table,
+                                               dict(zip(columns, rows[0])))
+            rows = [merge_args(dict(zip(columns, row)), {}) for row in rows]
+            insert_many(cursor, insert, rows, table, list(columns), copy_from)
+            row_count += len(rows)
+        cnx.commit()
+        self.logger.info('inserted %d rows in %s', row_count, table)
+
     def _parse_versions(self, version_str):
         versions = set()
         for line in version_str.splitlines():
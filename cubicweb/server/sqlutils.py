@@ -20,10 +20,14 @@
 import os
 import sys
 import re
+import warnings
 import subprocess
+from io import StringIO
+from itertools import count
+from functools import partial
 from os.path import abspath
 from logging import getLogger
-from datetime import time, datetime, timedelta
+from datetime import date, time, datetime, timedelta
 
 from pytz import utc
 
@@ -170,6 +174,239 @@ def sql_drop_all_user_tables(driver_or_helper, sqlcursor):
     return stmts
 
 
+# postgres bulk loading helpers ###############################################
+
+def _execmany_thread_not_copy_from(cu, statement, data, table=None,
+                                   columns=None, encoding='utf-8'):
+    """ Execute thread without copy from
+    """
+    cu.executemany(statement, data)
+
+
+def _execmany_thread_copy_from(cu, statement, data, table,
+                               columns, encoding='utf-8'):
+    """ Execute thread with copy from
+    """
+    try:
+        buf = _create_copyfrom_buffer(data, columns, encoding=encoding)
+    except ValueError:
+        _execmany_thread_not_copy_from(cu, statement, data)
+    else:
+        if columns is None:
+            cu.copy_from(buf, table, null=u'NULL')
+        else:
+            cu.copy_from(buf, table, null=u'NULL', columns=columns)
+
+
+def insert_many(cu, statement, data, table, columns, copy_from=True,
+                encoding='utf-8'):
+    """Insert `data`, a list of dictionaries whose keys are `columns`, into
+    `table`. If `copy_from` is true, try to use 'COPY FROM' command, or
+    fallback to execute_many of the insert `statement`.
+    """
+    if copy_from:
+        _execmany_thread_copy_from(cu, statement, data, table, columns, encoding)
+    else:
+        _execmany_thread_not_copy_from(cu, statement, data)
+
+
+def _copyfrom_buffer_convert_None(value, **opts):
+    '''Convert None value to "NULL"'''
+    return u'NULL'
+
+
+def _copyfrom_buffer_convert_number(value, **opts):
+    '''Convert a number into its string representation'''
+    return str(value)
+
+
+def _copyfrom_buffer_convert_string(value, **opts):
+    '''Convert string value.
+    '''
+    escape_chars = ((u'\\', u'\\\\'), (u'\t', u'\\t'), (u'\r', u'\\r'),
+                    (u'\n', u'\\n'))
+    for char, replace in escape_chars:
+        value = value.replace(char, replace)
+    return value
+
+
+def _copyfrom_buffer_convert_date(value, **opts):
+    '''Convert date into "YYYY-MM-DD"'''
+    # Do not use strftime, as it yields issue with date < 1900
+    # (http://bugs.python.org/issue1777412)
+    return u'%04d-%02d-%02d' % (value.year, value.month, value.day)
+
+
+def _copyfrom_buffer_convert_datetime(value, **opts):
+    '''Convert date into "YYYY-MM-DD HH:MM:SS.UUUUUU"'''
+    # Do not use strftime, as it yields issue with date < 1900
+    # (http://bugs.python.org/issue1777412)
+    return u'%s %s' % (_copyfrom_buffer_convert_date(value, **opts),
+                       _copyfrom_buffer_convert_time(value, **opts))
+
+
+def _copyfrom_buffer_convert_time(value, **opts):
+    '''Convert time into "HH:MM:SS.UUUUUU"'''
+    return u'%02d:%02d:%02d.%06d' % (value.hour, value.minute,
+                                     value.second, value.microsecond)
+
+
+# (types, converter) list.
+_COPYFROM_BUFFER_CONVERTERS = [
+    (type(None), _copyfrom_buffer_convert_None),
+    ((int, float), _copyfrom_buffer_convert_number),
+    (str, _copyfrom_buffer_convert_string),
+    (datetime, _copyfrom_buffer_convert_datetime),
+    (date, _copyfrom_buffer_convert_date),
+    (time, _copyfrom_buffer_convert_time),
+]
+
+
+def _create_copyfrom_buffer(data, columns=None, **convert_opts):
+    """
+    Create a StringIO buffer for 'COPY FROM' command.
+    Deals with Unicode, Int, Float, Date... (see ``converters``)
+
+    :data: a sequence/dict of tuples
+    :columns: list of columns to consider (default to all columns)
+    :converter_opts: keyword arguements given to converters
+    """
+    # Create a list rather than directly create a StringIO
+    # to correctly write lines separated by '\n' in a single step
+    rows = []
+    if columns is None:
+        if isinstance(data[0], (tuple, list)):
+            columns = list(range(len(data[0])))
+        elif isinstance(data[0], dict):
+            columns = data[0].keys()
+        else:
+            raise ValueError('Could not get columns: you must provide columns.')
+    for row in data:
+        # Iterate over the different columns and the different values
+        # and try to convert them to a correct datatype.
+        # If an error is raised, do not continue.
+        formatted_row = []
+        for col in columns:
+            try:
+                value = row[col]
+            except KeyError:
+                warnings.warn(u"Column %s is not accessible in row %s"
+                              % (col, row), RuntimeWarning)
+                # XXX 'value' set to None so that the import does not end in
+                # error.
+                # Instead, the extra keys are set to NULL from the
+                # database point of view.
+                value = None
+            for types, converter in _COPYFROM_BUFFER_CONVERTERS:
+                if isinstance(value, types):
+                    value = converter(value, **convert_opts)
+                    assert isinstance(value, str)
+                    break
+            else:
+                raise ValueError("Unsupported value type %s" % type(value))
+            # We push the value to the new formatted row
+            # if the value is not None and could be converted to a string.
+            formatted_row.append(value)
+        rows.append('\t'.join(formatted_row))
+    return StringIO('\n'.join(rows))
+
+
+class PGRestoreHelper(object):
+    """Helper to drop foreign keys and indexes of postgres tables before
+    loading data into them, and to restore them afterwards, working on a
+    db-api connection.
+
+    Indexes of primary keys and unique constraints are kept, since the latter
+    may be referenced by foreign keys of other tables (e.g. `entities` or
+    `transactions` primary keys). Dropped objects are saved in a table so that
+    they may be restored even after a crash. Indexes are restored before
+    foreign keys.
+    """
+
+    def __init__(self, cnx, pg_schema='public'):
+        self.cursor = cnx.cursor()
+        self.pg_schema = pg_schema
+
+    def sql(self, query, args=None):
+        self.cursor.execute(query, args)
+        return self.cursor
+
+    def drop_indexes_and_constraints(self, tablename):
+        """Drop foreign keys and indexes of the given table, storing them in a
+        table for later restore.
+        """
+        self.sql('CREATE TABLE IF NOT EXISTS cw_restore_constraints'
+                 '(sql TEXT, fkey BOOLEAN, insert_order SERIAL)')
+        for name in self._constraint_names(tablename):
+            query = 'ALTER TABLE %s ADD CONSTRAINT %s %s' % (
+                tablename, name, self._constraint_sql(name))
+            self.sql('INSERT INTO cw_restore_constraints(sql, fkey) '
+                     'VALUES (%(sql)s, TRUE)', {'sql': query})
+            self.sql('ALTER TABLE %s DROP CONSTRAINT %s' % (tablename, name))
+        for name in self._index_names(tablename):
+            self.sql('INSERT INTO cw_restore_constraints(sql, fkey) '
+                     'VALUES (%(sql)s, FALSE)', {'sql': self._index_sql(name)})
+            self.sql('DROP INDEX %s' % name)
+
+    def restore_indexes_and_constraints(self):
+        """Restore indexes, then foreign keys."""
+        if not self.table_exists('cw_restore_constraints'):
+            return
+        cu = self.sql('SELECT sql, insert_order FROM cw_restore_constraints '
+                      'ORDER BY fkey, insert_order')
+        for query, order in cu.fetchall():
+            self.sql(query)
+            self.sql('DELETE FROM cw_restore_constraints WHERE insert_order=%(order)s',
+                     {'order': order})
+        self.sql('DROP TABLE cw_restore_constraints')
+
+    def table_exists(self, tablename):
+        """Return True if the given table already exists in the database."""
+        cu = self.sql('SELECT 1 from information_schema.tables '
+                      'WHERE table_name=%(t)s AND table_schema=%(s)s',
+                      {'t': tablename, 's': self.pg_schema})
+        return bool(cu.fetchone())
+
+    def _constraint_names(self, tablename):
+        """Return the names of foreign keys of the given table."""
+        cu = self.sql("SELECT con.conname FROM pg_catalog.pg_constraint con "
+                      "JOIN pg_catalog.pg_class c ON con.conrelid = c.oid "
+                      "JOIN pg_catalog.pg_namespace n ON n.oid = c.relnamespace "
+                      "WHERE c.relname = %(t)s AND n.nspname = %(s)s "
+                      "AND con.contype = 'f'", {'t': tablename, 's': self.pg_schema})
+        return [name for name, in cu.fetchall()]
+
+    def _index_names(self, tablename):
+        """Return the names of indexes of the given table, except those of its
+        primary key and unique constraints.
+        """
+        cu = self.sql("SELECT c.relname FROM pg_catalog.pg_index i "
+                      "JOIN pg_catalog.pg_class c ON i.indexrelid = c.oid "
+                      "JOIN pg_catalog.pg_class t ON i.indrelid = t.oid "
+                      "JOIN pg_catalog.pg_namespace n ON n.oid = t.relnamespace "
+                      "WHERE t.relname = %(t)s AND n.nspname = %(s)s "
+                      "AND NOT EXISTS (SELECT 1 FROM pg_catalog.pg_constraint con "
+                      "                WHERE con.conindid = c.oid "
+                      "                AND con.conrelid = t.oid "
+                      "                AND con.contype <> 'f')",
+                      {'t': tablename, 's': self.pg_schema})
+        return [name for name, in cu.fetchall()]
+
+    def _index_sql(self, name):
+        """Return the SQL to be used to recreate the index of the given name."""
+        return self.sql('SELECT pg_get_indexdef(c.oid) FROM pg_catalog.pg_class c '
+                        'LEFT JOIN pg_catalog.pg_namespace n ON n.oid = c.relnamespace '
+                        'WHERE c.relname = %(r)s AND n.nspname=%(n)s',
+                        {'r': name, 'n': self.pg_schema}).fetchone()[0]
+
+    def _constraint_sql(self, name):
+        """Return the SQL to be used to recreate the constraint."""
+        return self.sql('SELECT pg_get_constraintdef(c.oid) FROM pg_catalog.pg_constraint c '
+                        'LEFT JOIN pg_catalog.pg_namespace n ON n.oid = c.connamespace '
+                        'WHERE c.conname = %(r)s AND n.nspname=%(n)s',
+                        {'r': name, 'n': self.pg_schema}).fetchone()[0]
+
+
 class ConnectionWrapper(object):
     """Wrap a connection to the system source's database, attempting to handle
     automatic reconnection.
@@ -219,6 +456,26 @@ class ConnectionWrapper(object):
         """connections set is being freed from a session"""
         pass  # no nothing by default
 
+    _stream_cursor_ids = count()
+
+    def stream_cursor(self):
+        """return a new cursor on the connection, fetching results from the
+        database as they are consumed (using a server-side cursor on
+        postgres). It should be closed by the caller.
+        """
+        if self._source.dbhelper.backend_name == 'postgres':
+            return self.cnx.cursor('cw_stream_%s' % next(self._stream_cursor_ids))
+        return self.cnx.cursor()
+
+    def ping(self):
+        """return True if the connection to the database is usable"""
+        try:
+            self.cu.execute('SELECT 1')
+            self.cnx.rollback()
+        except Exception:
+            return False
+        return True
+
     def reconnect(self):
         """reopen a connection for this source or all sources if none specified
         """
@@ -242,6 +499,10 @@ class SqliteConnectionWrapper(ConnectionWrapper):
 
     _cnx = None
 
+    def ping(self):
+        # connection is reopened each time the connections set is used
+        return True
+
     def cnxset_freed(self):
         self.cu.close()
         self.cnx.close()
@@ -270,6 +531,15 @@ class SqliteConnectionWrapper(ConnectionWrapper):
         self._cu = value
 
 
+def _bind_callbacks(cbstack, source, cnx):
+    """return a function applying the given column callbacks to a value"""
+    def transform(value):
+        for cb in cbstack:
+            value = cb(source, cnx, value)
+        return value
+    return transform
+
+
 class SQLAdapterMixIn(object):
     """Mixin for SQL data sources, getting a connection from a configuration
     dictionary and handling connection locking
@@ -369,50 +639,91 @@ class SQLAdapterMixIn(object):
             return newargs
         return query_args
 
-    def process_result(self, cursor, cnx=None, column_callbacks=None):
+    def process_result(self, cursor, cnx=None, column_callbacks=None,
+                       converters_cache=None):
         """return a list of CubicWeb compliant values from data in the given cursor
         """
-        return list(self.iter_process_result(cursor, cnx, column_callbacks))
+        return list(self.iter_process_result(cursor, cnx, column_callbacks,
+                                             converters_cache))
 
-    def iter_process_result(self, cursor, cnx, column_callbacks=None):
+    def iter_process_result(self, cursor, cnx=None, column_callbacks=None,
+                            converters_cache=None):
         """return a iterator on tuples of CubicWeb compliant values from data
         in the given cursor
+
+        `converters_cache` is an optional dictionary where converters returned
+        by :meth:`row_converters` may be cached, when the cursor is known to
+        always execute the same query.
         """
-        # use two different implementations to avoid paying the price of
-        # callback lookup for each *cell* in results when there is nothing to
-        # lookup
-        if not column_callbacks:
-            return self.dbhelper.dbapi_module.process_cursor(cursor, self._dbencoding,
-                                                             Binary)
-        assert cnx
-        return self._cb_process_result(cursor, column_callbacks, cnx)
-
-    def _cb_process_result(self, cursor, column_callbacks, cnx):
-        # begin bind to locals for optimization
-        descr = cursor.description
-        encoding = self._dbencoding
-        process_value = self._process_value
-        binary = Binary
-        # /end
+        assert cnx or not column_callbacks
+        return self._process_rows(cursor, cnx, column_callbacks, converters_cache)
+
+    def row_converters(self, description, column_callbacks=None, cache=None):
+        """return a tuple of (column index, transformation, callbacks) for each
+        column of results with the given cursor `description` which has to be
+        converted to CubicWeb compliant values, either by a transformation of
+        the db-api module or by a stack of callbacks generated with the SQL
+        query. Other columns are left untouched.
+
+        If `cache` is given, converters are stored into it for the types of the
+        columns, so they are only computed on first call.
+        """
+        if cache is not None:
+            key = tuple(coldescr[1] for coldescr in description)
+            try:
+                return cache[key]
+            except KeyError:
+                pass
+        converters = dict((col, (transform, None))
+                          for col, transform in self._transformations(description))
+        if column_callbacks:
+            for col, cbstack in column_callbacks.items():
+                converters[col] = (None, tuple(cbstack))
+        converters = tuple((col, transform, cbstack)
+                           for col, (transform, cbstack) in sorted(converters.items()))
+        if cache is not None:
+            cache[key] = converters
+        return converters
+
+    def _transformations(self, description):
+        """return a list of (column index, transformation) for columns of
+        results with the given cursor `description` which have to be converted
+        by the db-api module
+        """
+        dbapi_module = self.dbhelper.dbapi_module
+        try:
+            transformations = dbapi_module._transformations
+        except AttributeError:
+            # not part of the public api of logilab.database, fall back to
+            # process_value for every column
+            return [(col, partial(dbapi_module.process_value, description=coldescr,
+                                  encoding=self._dbencoding, binarywrap=Binary))
+                    for col, coldescr in enumerate(description)]
+        return transformations(description, self._dbencoding, Binary)
+
+    def _process_rows(self, cursor, cnx, column_callbacks, converters_cache):
         cursor.arraysize = 100
-        while True:
-            results = cursor.fetchmany()
-            if not results:
-                break
+        results = cursor.fetchmany()
+        if not results:
+            return
+        # description of server-side cursors is only known once some results
+        # have been fetched
+        converters = self.row_converters(cursor.description, column_callbacks,
+                                         converters_cache)
+        # bind callbacks to the source and connection once for all
+        converters = [(col, transform if cbstack is None
+                       else _bind_callbacks(cbstack, self, cnx))
+                      for col, transform, cbstack in converters]
+        row_is_mutable = self.dbhelper.dbapi_module.row_is_mutable
+        while results:
             for line in results:
-                result = []
-                for col, value in enumerate(line):
-                    if value is None:
-                        result.append(value)
-                        continue
-                    cbstack = column_callbacks.get(col, None)
-                    if cbstack is None:
-                        value = process_value(value, descr[col], encoding, binary)
-                    else:
-                        for cb in cbstack:
-                            value = cb(self, cnx, value)
-                    result.append(value)
+                result = line if row_is_mutable else list(line)
+                for col, transform in converters:
+                    value = result[col]
+                    if value is not None:
+                        result[col] = transform(value)
                 yield result
+            results = cursor.fetchmany()
 
     def preprocess_entity(self, entity):
         """return a dictionary to use as extra argument to cursor.execute
@@ -351,22 +351,33 @@ class OneFetchStep(Step):
         """
         self.execute_children()
         cnx = self.plan.cnx
-        args = self.plan.args
-        union = self.union
+        # get results for query
+        source = cnx.repo.system_source
+        result = source.syntax_tree_search(cnx, self.union, self.plan.args,
+                                           self.cache_key())
+        return result
+
+    def iter_execute(self, chunksize):
+        """same as :meth:`execute` but return an iterator on lists of at most
+        `chunksize` rows, fetched from the database as they are consumed
+        """
+        self.execute_children()
+        cnx = self.plan.cnx
+        source = cnx.repo.system_source
+        return source.iter_syntax_tree_search(cnx, self.union, self.plan.args,
+                                              self.cache_key(), chunksize)
+
+    def cache_key(self):
+        """return the key under which sql for this step may be cached"""
         if self.plan.cache_key is None:
-            cachekey = None
+            return None
         # union may have been splited into subqueries, in which case we can't
         # use plan.cache_key, rebuild a cache key
-        elif isinstance(self.plan.cache_key, tuple):
+        if isinstance(self.plan.cache_key, tuple):
             cachekey = list(self.plan.cache_key)
-            cachekey[0] = union.as_string()
-            cachekey = tuple(cachekey)
-        else:
-            cachekey = union.as_string()
-        # get results for query
-        source = cnx.repo.system_source
-        result = source.syntax_tree_search(cnx, union, args, cachekey)
-        return result
+            cachekey[0] = self.union.as_string()
+            return tuple(cachekey)
+        return self.union.as_string()
 
     def mytest_repr(self):
         """return a representation of this step suitable for test"""
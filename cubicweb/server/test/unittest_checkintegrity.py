@@ -22,7 +22,8 @@ import unittest
 
 from cubicweb import devtools  # noqa: E402
 from cubicweb.devtools.testlib import CubicWebTC  # noqa: E402
-from cubicweb.server.checkintegrity import check, check_indexes, reindex_entities  # noqa: E402
+from cubicweb.server.checkintegrity import (  # noqa: E402
+    check, check_indexes, reindex_entities, queue_fti_rebuild, index_queued_entities)
 
 
 class CheckIntegrityTC(unittest.TestCase):
@@ -61,6 +62,26 @@ class CheckIntegrityTC(unittest.TestCase):
             self.assertTrue(cnx.execute('Any X WHERE X has_text "tutu"'))
             self.assertTrue(cnx.execute('Any X WHERE X has_text "toto"'))
 
+    def test_queued_rebuild(self):
+        with self.repo.internal_cnx() as cnx:
+            toto = cnx.execute('INSERT Personne X: X nom "toto", X prenom "tutu"')[0][0]
+            cnx.commit()
+            # stale row in the text index
+            cnx.system_sql('INSERT INTO appears (uid, word_id, pos) VALUES (123456, NULL, 0)')
+            cnx.commit()
+            self.assertGreaterEqual(queue_fti_rebuild(self.repo.schema, cnx), 1)
+            self.assertFalse(cnx.system_sql(
+                'SELECT uid FROM appears WHERE uid=123456').fetchall())
+            # the text index is still usable while entities are queued
+            self.assertTrue(cnx.execute('Any X WHERE X has_text "tutu"'))
+            index_queued_entities(cnx, withpb=False, batchsize=2, partition=(toto % 2, 2))
+            self.assertEqual(
+                set(eid % 2 for eid, in cnx.system_sql('SELECT eid FROM fti_pending')),
+                set([(toto + 1) % 2]))
+            index_queued_entities(cnx, withpb=False, batchsize=2)
+            self.assertFalse(cnx.system_sql('SELECT eid FROM fti_pending').fetchall())
+            self.assertEqual(cnx.execute('Any X WHERE X has_text "tutu"').rows, [[toto]])
+
 
 class SqliteCheckIndexesTC(CubicWebTC):
 
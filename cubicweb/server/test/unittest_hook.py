@@ -123,6 +123,51 @@ class HooksRegistryTC(unittest.TestCase):
         self.o.call_hooks('before_add_entity', cw) # nothing to call
 
 
+class AddGroupHook(hook.Hook):
+    __regid__ = 'test.addgroup'
+    __select__ = hook.Hook.__select__ & hook.is_instance('CWGroup')
+    events = ('before_add_entity',)
+
+    def __call__(self):
+        raise HookCalled()
+
+
+class HooksDispatchTableTC(CubicWebTC):
+
+    def candidates(self, cnx, etype):
+        registry = self.vreg['before_add_entity_hooks']
+        return set(h.__regid__ for hooks in registry._dispatch_table.get(
+            ('before_add_entity', None, etype,
+             cnx._hooks_mode, frozenset(cnx._hooks_categories)), ())
+                   for h in hooks)
+
+    def test_dispatch_table(self):
+        with self.admin_access.repo_cnx() as cnx:
+            group = cnx.create_entity('CWGroup', name=u'group1')
+            candidates = self.candidates(cnx, 'CWGroup')
+            self.assertIn('metaattrsinit', candidates)
+            self.assertNotIn('stripuserlogin', candidates)
+            with cnx.deny_all_hooks_but('integrity'):
+                self.vreg['before_add_entity_hooks'].get_candidate_hooks(
+                    cnx, 'before_add_entity', [group], None, {})
+                integrity_candidates = self.candidates(cnx, 'CWGroup')
+                self.assertTrue(integrity_candidates)
+                self.assertNotIn('metaattrsinit', integrity_candidates)
+            # table is shared by all connections
+            with self.admin_access.repo_cnx() as cnx2:
+                self.assertEqual(candidates, self.candidates(cnx2, 'CWGroup'))
+            # and reset when the registry changes
+            with self.temporary_appobjects(AddGroupHook):
+                self.assertEqual(self.candidates(cnx, 'CWGroup'), set())
+                with self.assertRaises(HookCalled):
+                    cnx.create_entity('CWGroup', name=u'group3')
+                self.assertIn('test.addgroup', self.candidates(cnx, 'CWGroup'))
+                cnx.create_entity('CWUser', login=u'user1', upassword=u'user1',
+                                  in_group=cnx.find('CWGroup', name=u'users').one())
+                self.assertNotIn('test.addgroup', self.candidates(cnx, 'CWUser'))
+            self.assertEqual(self.candidates(cnx, 'CWGroup'), set())
+
+
 class SystemHooksTC(CubicWebTC):
 
     def test_startup_shutdown(self):
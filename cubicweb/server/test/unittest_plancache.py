@@ -0,0 +1,79 @@
+# copyright 2026 LOGILAB S.A. (Paris, FRANCE), all rights reserved.
+# contact http://www.logilab.fr/ -- mailto:contact@logilab.fr
+#
+# This file is part of CubicWeb.
+#
+# CubicWeb is free software: you can redistribute it and/or modify it under the
+# terms of the GNU Lesser General Public License as published by the Free
+# Software Foundation, either version 2.1 of the License, or (at your option)
+# any later version.
+#
+# CubicWeb is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public License along
+# with CubicWeb.  If not, see <http://www.gnu.org/licenses/>.
+"""unit tests for module cubicweb.server.plancache"""
+
+import shutil
+import tempfile
+from os.path import join
+
+from cubicweb.devtools.testlib import CubicWebTC
+from cubicweb.server.plancache import PlanCache, schema_fingerprint
+
+
+class PlanCacheTC(CubicWebTC):
+
+    def setUp(self):
+        super(PlanCacheTC, self).setUp()
+        self.tempdir = tempfile.mkdtemp()
+        self.plan_cache = PlanCache(self.repo, join(self.tempdir, 'plancache'))
+
+    def tearDown(self):
+        shutil.rmtree(self.tempdir)
+        super(PlanCacheTC, self).tearDown()
+
+    def test_dump_load(self):
+        rql = 'Any L WHERE U login L, U in_group G, G name "managers"'
+        eidrql = 'Any L WHERE U login L, U eid %(u)s'
+        with self.admin_access.repo_cnx() as cnx:
+            cnx.execute(rql)
+            cnx.execute(eidrql, {'u': cnx.user.eid})
+        self.plan_cache.dump()
+        querier = self.repo.querier
+        source = self.repo.system_source
+        querier.clear_caches()
+        source.clear_caches(None, None)
+        nbrql, nbsql = self.plan_cache.load()
+        self.assertGreaterEqual(nbrql, 2)
+        self.assertGreaterEqual(nbsql, 1)
+        self.assertIn((rql,), list(querier.rql_cache._cache))
+        self.assertEqual(querier.rql_cache._ck_cache[eidrql], set(['u']))
+        self.assertIn((rql,), [key[:1] for key in source._cache])
+        with self.admin_access.repo_cnx() as cnx:
+            # user's groups and properties are fetched using eid arguments
+            cnx.user.groups, cnx.user.properties
+            misses = querier.rql_cache.cache_miss, source.cache_miss
+            self.assertEqual(cnx.execute(rql).rows, [[u'admin']])
+            self.assertEqual((querier.rql_cache.cache_miss, source.cache_miss),
+                             misses)
+
+    def test_dump_nothing_new(self):
+        self.plan_cache.dump()
+        self.plan_cache.write = None  # should not be called
+        self.plan_cache.dump()
+
+    def test_outdated(self):
+        with self.admin_access.repo_cnx() as cnx:
+            cnx.execute('Any X WHERE X is CWGroup')
+        self.plan_cache.dump()
+        self.assertIsNotNone(self.plan_cache.read(schema_fingerprint(self.repo)))
+        self.assertIsNone(self.plan_cache.read('another schema'))
+
+
+if __name__ == '__main__':
+    import unittest
+    unittest.main()
@@ -16,6 +16,9 @@
 # You should have received a copy of the GNU Lesser General Public License along
 # with CubicWeb.  If not, see <http://www.gnu.org/licenses/>.
 
+import os.path as osp
+import shutil
+import tempfile
 from datetime import datetime
 from threading import Thread
 
@@ -25,6 +28,7 @@ from cubicweb.devtools import PostgresApptestConfiguration, startpgcluster, stop
 from cubicweb.devtools.testlib import CubicWebTC
 from cubicweb.predicates import is_instance
 from cubicweb.entities.adapters import IFTIndexableAdapter
+from cubicweb.server.sources.native import DatabaseIndependentBackupRestore
 
 from unittest_querier import FixedOffset
 
@@ -183,6 +187,53 @@ class PostgresLimitSizeTC(CubicWebTC):
                     self.assertEqual(actual, expected)
 
 
+class PostgresPortableBackupTC(CubicWebTC):
+    configcls = PostgresApptestConfiguration
+
+    def schema_state(self, cnx):
+        """return constraints and indexes of the database"""
+        constraints = cnx.system_sql(
+            "SELECT c.conname, c.contype FROM pg_catalog.pg_constraint c "
+            "JOIN pg_catalog.pg_namespace n ON n.oid = c.connamespace "
+            "WHERE n.nspname = 'public'").fetchall()
+        indexes = cnx.system_sql(
+            "SELECT indexname FROM pg_indexes WHERE schemaname = 'public'").fetchall()
+        return set(constraints), set(indexes)
+
+    def test_portable_backup_restore(self):
+        source = self.repo.system_source
+        with self.admin_access.repo_cnx() as cnx:
+            for i in range(5):
+                cnx.create_entity('Card', title=u'card %s' % i)
+            cnx.commit()
+            nbentities = cnx.system_sql('SELECT COUNT(*) FROM entities').fetchone()[0]
+            nbcards = cnx.system_sql('SELECT COUNT(*) FROM cw_Card').fetchone()[0]
+            constraints, indexes = self.schema_state(cnx)
+        # primary keys are referenced by foreign keys
+        self.assertIn(('entities_pkey', 'p'), constraints)
+        self.assertTrue(any(contype == 'f' for name, contype in constraints))
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        backupfile = osp.join(tmpdir, 'system')
+        helper = DatabaseIndependentBackupRestore(source)
+        helper.blocksize = 2
+        helper.backup(backupfile)
+        with self.admin_access.repo_cnx() as cnx:
+            cnx.system_sql('DELETE FROM cw_Card')
+            cnx.commit()
+        DatabaseIndependentBackupRestore(source).restore(backupfile)
+        with self.admin_access.repo_cnx() as cnx:
+            self.assertEqual(cnx.system_sql('SELECT COUNT(*) FROM entities').fetchone()[0],
+                             nbentities)
+            self.assertEqual(cnx.system_sql('SELECT COUNT(*) FROM cw_Card').fetchone()[0],
+                             nbcards)
+            # dropped indexes and foreign keys have been restored
+            self.assertEqual(self.schema_state(cnx), (constraints, indexes))
+            self.assertFalse(cnx.system_sql(
+                "SELECT 1 FROM information_schema.tables "
+                "WHERE table_name = 'cw_restore_constraints'").fetchall())
+
+
 if __name__ == '__main__':
     import unittest
     unittest.main()
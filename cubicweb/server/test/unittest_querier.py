@@ -332,6 +332,31 @@ class QuerierTC(BaseQuerierTC):
         self.assertIsInstance(fdata, Binary)
         self.assertEqual(fdata.getvalue(), b'xxx')
 
+    def test_execute_iter(self):
+        with self.admin_access.cnx() as cnx:
+            rsets = list(cnx.execute_iter('Any X,N ORDERBY N WHERE X is CWGroup, '
+                                          'X name N', chunksize=3))
+            self.assertEqual([len(rset) for rset in rsets], [3, 1])
+            self.assertEqual([r[1] for rset in rsets for r in rset.rows],
+                             [r[1] for r in cnx.execute('Any X,N ORDERBY N WHERE '
+                                                        'X is CWGroup, X name N')])
+            self.assertEqual(rsets[0].description, [('CWGroup', 'String')] * 3)
+            self.assertIs(rsets[0].req, cnx)
+            self.assertEqual(rsets[1].get_entity(0, 0).cw_etype, 'CWGroup')
+            # several types, description computed for each chunk
+            rsets = list(cnx.execute_iter('Any X WHERE X is IN (CWGroup, CWUser)',
+                                          chunksize=2))
+            self.assertEqual(sum(len(rset) for rset in rsets), 6)
+            self.assertEqual(set(d[0] for rset in rsets for d in rset.description),
+                             set(['CWGroup', 'CWUser']))
+            # queries may be executed while iterating
+            for rset in cnx.execute_iter('Any X WHERE X is CWGroup', chunksize=1):
+                self.assertEqual(cnx.execute('Any N WHERE X name N, X eid %(x)s',
+                                             {'x': rset[0][0]}).rowcount, 1)
+            self.assertEqual(list(cnx.execute_iter('Any X WHERE X eid 99999999')), [])
+            with self.assertRaises(QueryError):
+                cnx.execute_iter('DELETE CWGroup X WHERE X name "nothing"')
+
     # selection queries tests #################################################
 
     def test_select_1(self):
@@ -20,7 +20,9 @@
 
 import time
 import logging
+import threading
 import unittest
+from unittest import mock
 
 from yams.constraints import UniqueConstraint
 from yams import register_base_type, unregister_base_type
@@ -36,6 +38,7 @@ from cubicweb.devtools.repotest import tuplify
 from cubicweb.server import hook
 from cubicweb.server.sqlutils import SQL_PREFIX
 from cubicweb.server.hook import Hook
+from cubicweb.server.repository import _CnxSetPool, EidTypeCache
 from cubicweb.server.sources import native
 
 
@@ -415,6 +418,48 @@ class DataHelpersTC(CubicWebTC):
         with self.admin_access.repo_cnx() as cnx:
             self.assertRaises(UnknownEid, self.repo.type_from_eid, -2, cnx)
 
+    def test_types_from_eids(self):
+        with self.admin_access.repo_cnx() as cnx:
+            (geid1,), (geid2,) = cnx.execute('Any G LIMIT 2 WHERE G is CWGroup')
+            self.repo.clear_caches()
+            self.assertEqual(self.repo.type_from_eid(geid1, cnx), 'CWGroup')
+            source = self.repo.system_source
+            with mock.patch.object(source, 'eids_type', wraps=source.eids_type) as eids_type:
+                types = self.repo.types_from_eids(
+                    cnx, [geid1, str(geid2), cnx.user.eid, -2])
+            self.assertEqual(types, {geid1: 'CWGroup', geid2: 'CWGroup',
+                                     cnx.user.eid: 'CWUser'})
+            # a single query for uncached eids
+            eids_type.assert_called_once_with(cnx, {geid2, cnx.user.eid, -2})
+            self.assertEqual(self.repo._type_cache[cnx.user.eid], 'CWUser')
+            self.assertRaises(UnknownEid, self.repo.types_from_eids, cnx, ['toto'])
+
+    def test_type_cache_bounded(self):
+        cache = EidTypeCache(20)
+        for eid in range(20):
+            cache[eid] = 'CWUser'
+        self.assertEqual(cache.get(0), 'CWUser')
+        self.assertIsNone(cache.get(20))
+        self.assertEqual((cache.cache_hit, cache.cache_miss), (1, 1))
+        # oldest tenth is evicted on insertion when full
+        cache[20] = 'CWGroup'
+        self.assertEqual(len(cache), 19)
+        self.assertNotIn(0, cache)
+        self.assertNotIn(1, cache)
+        self.assertEqual(cache[20], 'CWGroup')
+        self.assertGreater(cache.memory_usage(), 0)
+
+    def test_repo_stats_type_cache(self):
+        type_cache = EidTypeCache(20)
+        with self.admin_access.repo_cnx() as cnx:
+            service = self.vreg['services'].select('repo_stats', cnx)
+            with mock.patch.object(self.repo, '_type_cache', type_cache):
+                stats = service.call()
+        # no access to the type cache yet
+        self.assertEqual(stats['type_cache_size'], 0)
+        self.assertEqual(stats['type_cache_maxsize'], 20)
+        self.assertEqual(stats['type_cache_hit_percent'], 0)
+
     def test_add_delete_info(self):
         with self.admin_access.repo_cnx() as cnx:
             entity = self.repo.vreg['etypes'].etype_class('Personne')(cnx)
@@ -723,5 +768,126 @@ class PerformanceTest(CubicWebTC):
             self.assertEqual(w.todo_by[0].eid, p2.eid)
 
 
+class FakeCnxSet(object):
+
+    def __init__(self):
+        self.alive = True
+        self.closed = False
+        self.reconnected = 0
+
+    def ping(self):
+        return self.alive
+
+    def reconnect(self):
+        self.alive = True
+        self.reconnected += 1
+
+    def close(self, i_know_what_i_do=False):
+        self.closed = True
+
+
+class FakeSource(object):
+
+    def __init__(self):
+        self.opened = []
+
+    def wrapped_connection(self):
+        cnxset = FakeCnxSet()
+        self.opened.append(cnxset)
+        return cnxset
+
+
+class CnxSetPoolTC(unittest.TestCase):
+
+    def test_lazy_growth(self):
+        source = FakeSource()
+        pool = _CnxSetPool(source, 3, min_size=1)
+        self.assertEqual(len(source.opened), 1)
+        self.assertEqual(pool.qsize(), 3)
+        cnxsets = [pool.get() for i in range(3)]
+        self.assertEqual(len(source.opened), 3)
+        self.assertEqual(pool.qsize(), 0)
+        pool.release(cnxsets[0])
+        self.assertIs(pool.get(), cnxsets[0])
+        self.assertEqual(len(source.opened), 3)
+
+    def test_timeout(self):
+        pool = _CnxSetPool(FakeSource(), 1, timeout=0.1)
+        cnxset = pool.get()
+        with self.assertRaises(Exception) as cm:
+            pool.get()
+        self.assertIn('after 0.1 secs', str(cm.exception))
+        threading.Timer(0.05, pool.release, (cnxset,)).start()
+        pool.timeout = 5
+        self.assertIs(pool.get(), cnxset)
+
+    def test_idle_shrink(self):
+        pool = _CnxSetPool(FakeSource(), 3, min_size=1, idle_timeout=0.1)
+        cnxsets = [pool.get() for i in range(3)]
+        pool.release(cnxsets[0])
+        pool.release(cnxsets[1])
+        time.sleep(0.15)
+        pool.release(cnxsets[2])
+        # the pool is shrinked down to its minimal size
+        self.assertEqual(list(pool), [cnxsets[2]])
+        self.assertTrue(cnxsets[0].closed)
+        self.assertTrue(cnxsets[1].closed)
+        self.assertFalse(cnxsets[2].closed)
+
+    def test_idle_shrink_without_release(self):
+        pool = _CnxSetPool(FakeSource(), 3, min_size=1, idle_timeout=0.1)
+        cnxsets = [pool.get() for i in range(3)]
+        for cnxset in cnxsets:
+            pool.release(cnxset)
+        threads = []
+
+        class FakeRepo(object):
+            def threaded_task(self, func):
+                thread = threading.Thread(target=func)
+                thread.start()
+                threads.append(thread)
+
+        pool.start(FakeRepo())
+        try:
+            time.sleep(0.35)
+            # idle connections sets are closed although none has been released
+            self.assertEqual(list(pool), [cnxsets[2]])
+            self.assertTrue(cnxsets[0].closed)
+            self.assertTrue(cnxsets[1].closed)
+        finally:
+            pool.close()
+        threads[0].join(1)
+        self.assertFalse(threads[0].is_alive())
+
+    def test_pre_ping(self):
+        pool = _CnxSetPool(FakeSource(), 1, pre_ping=True)
+        cnxset = pool.get()
+        pool.release(cnxset)
+        cnxset.alive = False
+        self.assertIs(pool.get(), cnxset)
+        self.assertEqual(cnxset.reconnected, 1)
+        self.assertTrue(cnxset.alive)
+
+    def test_recycle(self):
+        pool = _CnxSetPool(FakeSource(), 1, max_age=0.1)
+        cnxset = pool.get()
+        pool.release(cnxset)
+        self.assertIs(pool.get(), cnxset)
+        self.assertEqual(cnxset.reconnected, 0)
+        pool.release(cnxset)
+        time.sleep(0.15)
+        self.assertIs(pool.get(), cnxset)
+        self.assertEqual(cnxset.reconnected, 1)
+
+    def test_not_pooled(self):
+        source = FakeSource()
+        pool = _CnxSetPool(source, None)
+        self.assertIsNone(pool.qsize())
+        cnxset = pool.get()
+        self.assertEqual(source.opened, [cnxset])
+        pool.release(cnxset)
+        self.assertTrue(cnxset.closed)
+
+
 if __name__ == '__main__':
     unittest.main()
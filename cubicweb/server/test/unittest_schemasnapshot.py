@@ -0,0 +1,82 @@
+# copyright 2026 LOGILAB S.A. (Paris, FRANCE), all rights reserved.
+# contact http://www.logilab.fr/ -- mailto:contact@logilab.fr
+#
+# This file is part of CubicWeb.
+#
+# CubicWeb is free software: you can redistribute it and/or modify it under the
+# terms of the GNU Lesser General Public License as published by the Free
+# Software Foundation, either version 2.1 of the License, or (at your option)
+# any later version.
+#
+# CubicWeb is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public License along
+# with CubicWeb.  If not, see <http://www.gnu.org/licenses/>.
+"""unit tests for module cubicweb.server.schemasnapshot"""
+
+import shutil
+import tempfile
+from os.path import join
+from unittest import mock
+
+from cubicweb.devtools.testlib import CubicWebTC
+from cubicweb.server import schemasnapshot
+from cubicweb.server.schemasnapshot import SchemaSnapshot, schema_key
+
+
+class SchemaSnapshotTC(CubicWebTC):
+
+    def setUp(self):
+        super(SchemaSnapshotTC, self).setUp()
+        self.tempdir = tempfile.mkdtemp()
+        self.path = join(self.tempdir, 'schema-snapshot.pickle')
+
+    def tearDown(self):
+        shutil.rmtree(self.tempdir)
+        super(SchemaSnapshotTC, self).tearDown()
+
+    def load_schema(self):
+        with mock.patch('cubicweb.server.schemasnapshot.schema_snapshot_path',
+                        return_value=self.path), \
+                mock.patch.object(self.repo, 'deserialize_schema',
+                                  wraps=self.repo.deserialize_schema) as deserialize:
+            schema = schemasnapshot.load_schema(self.repo)
+        return schema, deserialize.call_count
+
+    def test_load_schema(self):
+        schema, deserialized = self.load_schema()
+        self.assertEqual(deserialized, 1)
+        snapshot, deserialized = self.load_schema()
+        self.assertEqual(deserialized, 0)
+        self.assertEqual(sorted(snapshot.entities()), sorted(schema.entities()))
+        self.assertEqual(sorted(snapshot.relations()), sorted(schema.relations()))
+        self.assertEqual(snapshot['CWUser'].eid, schema['CWUser'].eid)
+        self.assertEqual(snapshot['CWUser'].permissions, schema['CWUser'].permissions)
+        rqlexpr = snapshot['CWUser'].get_rqlexprs('read')[0]
+        self.assertEqual(rqlexpr.eid, schema['CWUser'].get_rqlexprs('read')[0].eid)
+        self.assertTrue(rqlexpr.snippet_rqlst)
+        rdef = snapshot['in_group'].rdef('CWUser', 'CWGroup')
+        self.assertEqual(rdef.eid, schema['in_group'].rdef('CWUser', 'CWGroup').eid)
+
+    def test_key(self):
+        with self.admin_access.repo_cnx() as cnx:
+            key = schema_key(cnx)
+            self.assertEqual(schema_key(cnx), key)
+            cnx.execute('SET X description "users" WHERE X is CWEType, X name "CWUser"')
+            cnx.commit()
+            self.assertNotEqual(schema_key(cnx), key)
+
+    def test_outdated(self):
+        snapshot = SchemaSnapshot(self.path)
+        self.assertIsNone(snapshot.read('key'))
+        snapshot.write('key', self.repo.schema)
+        self.assertIsNotNone(snapshot.read('key'))
+        self.assertIsNone(snapshot.read('another key'))
+
+
+if __name__ == '__main__':
+    import unittest
+    unittest.main()
@@ -17,6 +17,8 @@
 # with CubicWeb.  If not, see <http://www.gnu.org/licenses/>.
 """functional tests for server'security"""
 
+from unittest import mock
+
 from logilab.common.testlib import unittest_main
 
 from cubicweb.devtools.testlib import CubicWebTC
@@ -67,6 +69,22 @@ class LowLevelSecurityFunctionTC(BaseSecurityTC):
                                   cnx, rqlst, solution)
                 self.assertRaises(Unauthorized, cnx.execute, rql)
 
+    def test_has_perm_many(self):
+        with self.admin_access.repo_cnx() as cnx:
+            eids = [cnx.create_entity('Societe', nom=nom).eid
+                    for nom in (u'iaminusersgrouponly', u'iaminusersgrouponly', u'other')]
+            cnx.commit()
+        eschema = self.schema['Societe']
+        with self.new_access(u'iaminusersgrouponly').repo_cnx() as cnx:
+            owned = cnx.create_entity('Societe', nom=u'mine').eid
+            eids.append(owned)
+            self.assertEqual(eschema.has_perm_many(cnx, 'update', eids),
+                             set([eids[0], eids[1], owned]))
+            self.assertRaises(Unauthorized, eschema.check_perm_many, cnx, 'update', eids)
+            eschema.check_perm_many(cnx, 'update', eids[:2])
+            self.assertFalse(eschema.has_perm(cnx, 'update', eid=eids[2]))
+            self.assertEqual(eschema.has_perm_many(cnx, 'read', eids), set(eids))
+
     def test_upassword_not_selectable(self):
         with self.admin_access.repo_cnx() as cnx:
             self.assertRaises(Unauthorized,
@@ -399,6 +417,31 @@ class SecurityTC(BaseSecurityTC):
                 rset = cnx.execute('Any N,U WHERE N has_text "bidule", N owned_by U?')
                 self.assertEqual(len(rset.rows), 1, rset.rows)
 
+    def test_read_erqlexpr_shared_cache(self):
+        with self.admin_access.repo_cnx() as cnx:
+            self.create_user(cnx, u'anotheruser')
+            mine, theirs = [
+                cnx.execute("INSERT Affaire X: X sujet 'cool', X owned_by U "
+                            "WHERE U login %(l)s", {'l': login})[0][0]
+                for login in (u'iaminusersgrouponly', u'anotheruser')]
+            cnx.commit()
+        rql = 'Any X WHERE X is Affaire, X sujet %(s)s'
+        querier = self.repo.querier
+        with self.new_access(u'iaminusersgrouponly').repo_cnx() as cnx:
+            self.assertEqual(cnx.execute(rql, {'s': u'cool'}).rows, [[mine]])
+        with self.new_access(u'anotheruser').repo_cnx() as cnx:
+            # same groups, the security-rewritten tree is reused, though it
+            # still depends on the user
+            with mock.patch.object(cnx.rql_rewriter, 'insert_local_checks') as insert:
+                self.assertEqual(cnx.execute(rql, {'s': u'cool'}).rows, [[theirs]])
+                self.assertFalse(insert.called)
+        # cache is invalidated when permissions change
+        nbcached = len(querier.secured_rqlst_cache)
+        with self.temporary_permissions(Affaire={'read': ('managers', 'users')}):
+            with self.new_access(u'anotheruser').repo_cnx() as cnx:
+                self.assertEqual(len(cnx.execute(rql, {'s': u'cool'})), 3)
+        self.assertEqual(len(querier.secured_rqlst_cache), nbcached)
+
     def test_read_erqlexpr_aggregat(self):
         with self.admin_access.repo_cnx() as cnx:
             cnx.execute("INSERT Affaire X: X sujet 'cool'")[0][0]
@@ -22,6 +22,7 @@ import datetime
 import decimal
 import doctest
 import re
+import threading
 from unittest import TestCase
 
 from cubicweb import Binary, Unauthorized
@@ -122,6 +123,54 @@ class TestQueryCache(TestCase):
                           'itemcount': 6,
                           'permanentcount': 5})
 
+    def test_evict_least_read(self):
+        """Tests that only the least read tenth of items is wiped-out on ceiling
+        overflow when all items have been read, and that usage counts are aged
+        """
+        c = QueryCache(ceiling=20)
+        for x in range(20):
+            c[x] = x
+            for r in range(x % 10 + 1):
+                c[x]
+        c[20] = 20
+        self.assertEqual(sorted(c), list(range(1, 10)) + list(range(11, 21)))
+        self.assertEqual(c._transient[19], 5)
+        self.assertEqual(c._transient[20], 0)
+
+    def test_promoted_concurrently(self):
+        """Tests that a permanent item whose counter has been set again by a
+        reader racing with its promotion is not evicted
+        """
+        c = QueryCache(ceiling=10)
+        for x in range(10):
+            c[x] = x
+            c[x]
+        c._permanent.add(0)
+        c[10] = 10
+        self.assertIn(0, c)
+        self.assertNotIn(0, c._transient)
+        self.assertEqual(c._usage_report()['permanentcount'], 1)
+
+    def test_concurrent_reads(self):
+        c = QueryCache(ceiling=10)
+        for x in range(5):
+            c[x] = x
+
+        def read():
+            for r in range(1000):
+                for x in range(5):
+                    self.assertEqual(c[x], x)
+
+        threads = [threading.Thread(target=read) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(c._usage_report(),
+                         {'transientcount': 0,
+                          'itemcount': 5,
+                          'permanentcount': 5})
+
     def test_get_with_default(self):
         """
         Tests the capability of QueryCache for retrieving items with a default value
@@ -397,6 +446,29 @@ class HTMLHeadTC(CubicWebTC):
         finally:
             self.config.global_set_option('concat-resources', True)
 
+    def test_flush(self):
+        self.config.global_set_option('concat-resources', False)
+        try:
+            base_url = u'http://test.fr/data/'
+            head = self.htmlhead(base_url)
+            head.add_js(base_url + u'bob0.js')
+            self.assertEqual(head.flush(), u"""<head>
+<script type="text/javascript" src="http://test.fr/data/bob0.js"></script>
+</head>
+""")
+            self.assertEqual(head.flush(), u'')
+            # only headers added since the previous flush are returned
+            head.add_js(base_url + u'bob0.js')
+            head.add_js(base_url + u'bob1.js')
+            head.add_css(base_url + u'bob2.css')
+            head.add_raw(u'<meta name="bob" />\n')
+            self.assertEqual(head.flush(), u"""<meta name="bob" />
+<link rel="stylesheet" type="text/css" media="all" href="http://test.fr/data/bob2.css"/>
+<script type="text/javascript" src="http://test.fr/data/bob1.js"></script>
+""")
+        finally:
+            self.config.global_set_option('concat-resources', True)
+
 
 def UnauthorizedTC(TestCase):
 
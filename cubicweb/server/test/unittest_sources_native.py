@@ -16,10 +16,15 @@
 # You should have received a copy of the GNU Lesser General Public License along
 # with CubicWeb.  If not, see <http://www.gnu.org/licenses/>.
 
+import os.path as osp
+import tempfile
+import zipfile
+
 from logilab.common import tempattr
 
 from cubicweb.devtools.testlib import CubicWebTC
-from cubicweb.server.sources.native import FTIndexEntityOp
+from cubicweb.server.sources.native import (FTIndexEntityOp, DefaultEidGenerator,
+                                            DatabaseIndependentBackupRestore)
 
 class NativeSourceTC(CubicWebTC):
 
@@ -32,6 +37,88 @@ class NativeSourceTC(CubicWebTC):
                 source.index_entity(cnx, cnx.user)
                 self.assertNotIn(cnx.user.eid, FTIndexEntityOp.get_instance(cnx).get_data())
 
+    def test_fti_queue(self):
+        source = self.repo.system_source
+        with tempattr(source, 'fti_queue', True):
+            with self.admin_access.repo_cnx() as cnx:
+                card = cnx.create_entity('Card', title=u'queued', content=u'zorglub')
+                cnx.commit()
+                self.assertFalse(cnx.execute('Any X WHERE X has_text "zorglub"'))
+                size, lag = source.fti_queue_stats(cnx)
+                self.assertEqual(size, 1)
+                self.assertGreaterEqual(lag, 0)
+                card.cw_set(content=u'zorglub bimbo')
+                cnx.commit()
+                self.assertEqual(source.fti_queue_stats(cnx)[0], 1)
+                # deleted entities are skipped
+                deleted = cnx.create_entity('Card', title=u'deleted')
+                cnx.commit()
+                deleted.cw_delete()
+                cnx.commit()
+                self.assertEqual(source.fti_index_pending(cnx), 2)
+                cnx.commit()
+                self.assertEqual(source.fti_queue_stats(cnx), (0, 0))
+                self.assertEqual(source.fti_index_pending(cnx), 0)
+                rset = cnx.execute('Any X WHERE X has_text "bimbo"')
+                self.assertEqual(rset.rows, [[card.eid]])
+
+    def test_portable_backup_restore(self):
+        source = self.repo.system_source
+        with self.admin_access.repo_cnx() as cnx:
+            for i in range(5):
+                cnx.create_entity('Card', title=u'card %s' % i)
+            cnx.commit()
+            nbcards = cnx.execute('Any COUNT(X) WHERE X is Card')[0][0]
+        helper = DatabaseIndependentBackupRestore(source)
+        helper.blocksize = 2
+        tmpdir = tempfile.mkdtemp()
+        backupfile = osp.join(tmpdir, 'system')
+        helper.backup(backupfile)
+        with zipfile.ZipFile(backupfile) as archive:
+            self.assertEqual(archive.read('format.txt'), b'2.0')
+            manifest = [line.split() for line in
+                        archive.read('manifest.txt').decode('ascii').splitlines()]
+        cards = [(name, int(nbrows)) for name, checksum, nbrows in manifest
+                 if name.startswith('tables/cw_Card.')]
+        # tables are saved by chunks of blocksize rows
+        self.assertEqual(len(cards), (nbcards + 1) // 2)
+        self.assertEqual(sum(nbrows for name, nbrows in cards), nbcards)
+        with self.admin_access.repo_cnx() as cnx:
+            cnx.system_sql('DELETE FROM cw_Card')
+            cnx.commit()
+        DatabaseIndependentBackupRestore(source).restore(backupfile)
+        with self.admin_access.repo_cnx() as cnx:
+            self.assertEqual(cnx.system_sql('SELECT COUNT(*) FROM cw_Card').fetchone()[0],
+                             nbcards)
+        # corrupted chunks are detected
+        with zipfile.ZipFile(backupfile) as archive:
+            entries = [(info, archive.read(info)) for info in archive.infolist()]
+        with zipfile.ZipFile(backupfile, 'w') as archive:
+            for info, data in entries:
+                if info.filename == cards[0][0]:
+                    data = data[:-1]
+                archive.writestr(info, data)
+        with self.assertRaises(ValueError):
+            DatabaseIndependentBackupRestore(source).restore(backupfile)
+
+    def test_eid_generator_range(self):
+        source = self.repo.system_source
+        generator = DefaultEidGenerator(source, range_size=10)
+        try:
+            with self.admin_access.repo_cnx() as cnx:
+                eids = [generator.create_eid(cnx) for i in range(15)]
+                self.assertEqual(eids, list(range(eids[0], eids[0] + 15)))
+                self.assertEqual(generator.reserved_ranges, 2)
+                # reserving a range for a massive import doesn't touch the
+                # current range
+                last = generator.create_eid(cnx, 100)
+                self.assertEqual(last, eids[0] + 119)
+                self.assertEqual(generator.create_eid(cnx), eids[-1] + 1)
+                self.assertEqual(source.create_eid(cnx), last + 1)
+        finally:
+            generator.close()
+        self.assertEqual(generator.wasted_eids, 4)
+
 
 if __name__ == '__main__':
     from logilab.common.testlib import unittest_main
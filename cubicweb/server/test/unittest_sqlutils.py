@@ -20,6 +20,7 @@
 """
 
 import sys
+from unittest import mock
 
 from logilab.common.testlib import TestCase, unittest_main
 
@@ -47,6 +48,82 @@ class SQLAdapterMixInTC(TestCase):
         o = SQLAdapterMixIn(config)
         self.assertEqual(o.dbhelper.dbencoding, 'ISO-8859-1')
 
+    def test_process_result(self):
+        o = SQLAdapterMixIn(BASE_CONFIG)
+        # postgres type codes of text, boolean, integer and text columns
+        description = [('a', 25), ('b', 16), ('c', 23), ('d', 25)]
+        rows = [('x', 1, 2, 'y'), ('z', 0, 3, None)]
+
+        class FakeCursor(object):
+            def __init__(self):
+                self.description = description
+                self.rows = list(rows)
+
+            def fetchmany(self):
+                rows, self.rows = self.rows, []
+                return rows
+
+        callbacks = {3: [lambda source, cnx, value: (cnx, value)]}
+        cache = {}
+        self.assertEqual(o.process_result(FakeCursor(), 'cnx', callbacks, cache),
+                         [['x', True, 2, ('cnx', 'y')], ['z', False, 3, None]])
+        # only columns to convert are considered, converters are cached
+        self.assertEqual([(col, transform) for col, transform, cbstack
+                          in list(cache.values())[0]],
+                         [(1, bool), (3, None)])
+        cache[list(cache)[0]] = ()
+        self.assertEqual(o.process_result(FakeCursor(), 'cnx', callbacks, cache),
+                         [list(row) for row in rows])
+
+    def test_process_result_no_transformations(self):
+        o = SQLAdapterMixIn(BASE_CONFIG)
+        dbapi_module = o.dbhelper.dbapi_module
+
+        class DBAPIModule(object):
+            """db-api module without the private `_transformations` method"""
+            row_is_mutable = dbapi_module.row_is_mutable
+            process_value = dbapi_module.process_value
+
+        class FakeCursor(object):
+            description = [('a', 25), ('b', 16), ('c', 23)]
+
+            def __init__(self):
+                self.rows = [('x', 1, 2), ('z', 0, None)]
+
+            def fetchmany(self):
+                rows, self.rows = self.rows, []
+                return rows
+
+        with mock.patch.object(o.dbhelper, 'dbapi_module', DBAPIModule()):
+            self.assertEqual(o.process_result(FakeCursor()),
+                             [['x', True, 2], ['z', False, None]])
+
+    def test_iter_process_result_server_side_cursor(self):
+        o = SQLAdapterMixIn(BASE_CONFIG)
+
+        class ServerSideCursor(object):
+            """like postgres named cursors, description is unknown until
+            results are fetched
+            """
+            description = None
+
+            def __init__(self, rows):
+                self.rows = rows
+
+            def fetchmany(self):
+                self.description = [('a', 25), ('b', 16)]
+                rows, self.rows = self.rows, []
+                return rows
+
+        rows = [('x', 1), ('y', 0)]
+        callbacks = {0: [lambda source, cnx, value: value.upper()]}
+        self.assertEqual(list(o.iter_process_result(ServerSideCursor(rows), 'cnx')),
+                         [['x', True], ['y', False]])
+        self.assertEqual(list(o.iter_process_result(ServerSideCursor(rows), 'cnx',
+                                                    callbacks)),
+                         [['X', True], ['Y', False]])
+        self.assertEqual(list(o.iter_process_result(ServerSideCursor([]), 'cnx')), [])
+
 
 class SQLUtilsTC(CubicWebTC):
 
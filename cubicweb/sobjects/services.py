@@ -36,6 +36,7 @@ class StatsService(Service):
         results = {}
         querier = repo.querier
         source = repo.system_source
+        type_cache = repo._type_cache
         for size, maxsize, hits, misses, title in (
             (len(querier.rql_cache), repo.config['rql-cache-size'],
              querier.rql_cache.cache_hit, querier.rql_cache.cache_miss, 'rqlt_st'),
@@ -46,7 +47,18 @@ class StatsService(Service):
             results['%s_cache_hit' % title] = hits
             results['%s_cache_miss' % title] = misses
             results['%s_cache_hit_percent' % title] = (hits * 100) / (hits + misses)
-        results['type_cache_size'] = len(repo._type_cache)
+        # the type cache may not have been accessed yet, since eids types may
+        # be resolved in bulk
+        hits, misses = type_cache.cache_hit, type_cache.cache_miss
+        results['type_cache_size'] = len(type_cache)
+        results['type_cache_maxsize'] = type_cache.maxsize
+        results['type_cache_hit'] = hits
+        results['type_cache_miss'] = misses
+        if hits + misses:
+            results['type_cache_hit_percent'] = (hits * 100) / (hits + misses)
+        else:
+            results['type_cache_hit_percent'] = 0
+        results['type_cache_memory'] = type_cache.memory_usage()
         results['sql_no_cache'] = repo.system_source.no_cache
         results['nb_active_threads'] = threading.activeCount()
         results['available_cnxsets'] = repo.cnxsets.qsize()
@@ -0,0 +1,196 @@
+# copyright 2026 LOGILAB S.A. (Paris, FRANCE), all rights reserved.
+# contact http://www.logilab.fr/ -- mailto:contact@logilab.fr
+#
+# This file is part of CubicWeb.
+#
+# CubicWeb is free software: you can redistribute it and/or modify it under the
+# terms of the GNU Lesser General Public License as published by the Free
+# Software Foundation, either version 2.1 of the License, or (at your option)
+# any later version.
+#
+# CubicWeb is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public License along
+# with CubicWeb.  If not, see <http://www.gnu.org/licenses/>.
+"""Measure time and memory spent while starting an instance.
+
+Startup code marks its phases (config, schema, vreg, sources, hooks) and the
+loading of each appobjects module using the :func:`measure` context manager,
+which does nothing unless a :class:`StartupProfiler` is active, as done by the
+``cubicweb-ctl startup-profile`` command.
+
+Measures may be nested (e.g. the vreg phase happens while the schema is set,
+modules are loaded during the vreg phase): the exclusive time and memory of a
+measure are those which are not spent in nested measures.
+"""
+
+import time
+import tracemalloc
+from collections import OrderedDict
+
+__all__ = ('StartupProfiler', 'measure')
+
+# the active profiler, if any
+_profiler = None
+
+
+class _NullContext(object):
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_CONTEXT = _NullContext()
+
+
+def measure(kind, name):
+    """return a context manager measuring the code it wraps as `name` of the
+    given `kind` ('phase' or 'module') if a profiler is active
+    """
+    if _profiler is None:
+        return _NULL_CONTEXT
+    return _profiler.measure(kind, name)
+
+
+def module_cube(modname):
+    """return the cube providing module `modname`, 'cubicweb' for cubicweb's
+    own modules and 'instance' for modules of the instance directory
+    """
+    pkgname = modname.split('.', 1)[0]
+    if pkgname.startswith('cubicweb_'):
+        return pkgname[len('cubicweb_'):]
+    if pkgname == 'cubicweb':
+        return 'cubicweb'
+    return 'instance'
+
+
+class _Record(object):
+    __slots__ = ('kind', 'name', 'calls', 'time', 'memory', 'exclusive_time',
+                 'exclusive_memory')
+
+    def __init__(self, kind, name):
+        self.kind = kind
+        self.name = name
+        self.calls = 0
+        self.time = self.memory = 0
+        self.exclusive_time = self.exclusive_memory = 0
+
+
+class _Measure(object):
+
+    def __init__(self, profiler, record):
+        self.profiler = profiler
+        self.record = record
+        self.nested_time = self.nested_memory = 0
+
+    def __enter__(self):
+        self.profiler._stack.append(self)
+        self.memory = tracemalloc.get_traced_memory()[0]
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        duration = time.perf_counter() - self.start
+        memory = tracemalloc.get_traced_memory()[0] - self.memory
+        stack = self.profiler._stack
+        stack.pop()
+        record = self.record
+        record.calls += 1
+        if not any(m.record is record for m in stack):
+            # don't count twice recursive measures of the same thing
+            record.time += duration
+            record.memory += memory
+        record.exclusive_time += duration - self.nested_time
+        record.exclusive_memory += memory - self.nested_memory
+        if stack:
+            stack[-1].nested_time += duration
+            stack[-1].nested_memory += memory
+        return False
+
+
+class StartupProfiler(object):
+    """collect measures of code wrapped by :func:`measure` while it is active,
+    i.e. within a ``with profiler:`` block. Memory is traced using
+    :mod:`tracemalloc`, which slows down execution noticeably.
+    """
+
+    def __init__(self):
+        self.records = OrderedDict()
+        self._stack = []
+
+    def __enter__(self):
+        global _profiler
+        assert _profiler is None, 'a startup profiler is already active'
+        _profiler = self
+        tracemalloc.start()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        global _profiler
+        self.total_time = time.perf_counter() - self._start
+        self.total_memory = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        _profiler = None
+        return False
+
+    def measure(self, kind, name):
+        try:
+            record = self.records[(kind, name)]
+        except KeyError:
+            record = self.records[(kind, name)] = _Record(kind, name)
+        return _Measure(self, record)
+
+    def phases(self):
+        """return records of startup phases, in order of first occurrence"""
+        return [record for record in self.records.values()
+                if record.kind == 'phase']
+
+    def modules(self):
+        """return records of appobjects modules, by decreasing exclusive time"""
+        return sorted((record for record in self.records.values()
+                       if record.kind == 'module'),
+                      key=lambda record: record.exclusive_time, reverse=True)
+
+    def cubes(self):
+        """return a list of (cube, time, memory, number of modules) summing
+        exclusive measures of modules by cube, by decreasing time
+        """
+        cubes = OrderedDict()
+        for record in self.modules():
+            stats = cubes.setdefault(module_cube(record.name), [0, 0, 0])
+            stats[0] += record.exclusive_time
+            stats[1] += record.exclusive_memory
+            stats[2] += 1
+        return sorted(((cube,) + tuple(stats) for cube, stats in cubes.items()),
+                      key=lambda stats: stats[1], reverse=True)
+
+    def report(self, stream, limit=20):
+        """write a report of measures to `stream`, listing at most `limit`
+        modules
+        """
+        def write(name, seconds, memory, extra=''):
+            stream.write('%-50s %9.3f %10.1f %s\n' % (
+                name, seconds, memory / 1024., extra))
+
+        def header(title):
+            stream.write('\n%-50s %9s %10s\n' % (title, 'time (s)', 'mem (KiB)'))
+
+        header('phase')
+        for record in self.phases():
+            write(record.name, record.time, record.memory,
+                  '(exclusive: %.3fs, %.1fKiB)' % (
+                      record.exclusive_time, record.exclusive_memory / 1024.))
+        write('total', self.total_time, self.total_memory)
+        header('cube')
+        for cube, seconds, memory, nbmodules in self.cubes():
+            write(cube, seconds, memory, '(%s modules)' % nbmodules)
+        header('module')
+        for record in self.modules()[:limit]:
+            write(record.name, record.exclusive_time, record.exclusive_memory)
@@ -778,6 +778,56 @@ du :eid:`1:*ReST*`'''
             self.assertTrue(trinfo.cw_relation_cached('wf_info_for', 'subject'))
             self.assertEqual(trinfo.by_transition, ())
 
+    def test_complete_many(self):
+        with self.admin_access.repo_cnx() as cnx:
+            cnx.create_entity('CWUser', login=u'toto', upassword=u'toto',
+                              firstname=u'to')
+            rset = cnx.execute('Any X ORDERBY L WHERE X is CWUser, X login L')
+            users = rset.entities_bulk()
+            self.assertFalse(any(user._cw_completed for user in users))
+            users[0].cw_attr_cache['firstname'] = u'cached'
+            executed = []
+            execute = cnx.execute
+
+            def counting_execute(rql, *args, **kwargs):
+                executed.append(rql)
+                return execute(rql, *args, **kwargs)
+
+            cnx.execute = counting_execute
+            try:
+                self.assertEqual(rset.complete_entities(), users)
+            finally:
+                del cnx.execute
+            self.assertEqual(len(executed), 1)
+            self.assertTrue(all(user._cw_completed for user in users))
+            self.assertEqual([user.cw_attr_cache['firstname'] for user in users],
+                             [u'cached', None, u'to'])
+            self.assertEqual([user.cw_attr_cache['upassword'] for user in users],
+                             [None, None, None])
+            for user in users:
+                self.assertIsInstance(user.cw_attr_cache['creation_date'], datetime)
+            # completed entities are skipped
+            cnx.execute = counting_execute
+            try:
+                rset.complete_entities()
+            finally:
+                del cnx.execute
+            self.assertEqual(len(executed), 1)
+            # inlined relations
+            for comment in (u'zou', u'zou2'):
+                cnx.execute(
+                    'INSERT TrInfo X: X comment %(c)s, X wf_info_for U, X from_state S1, '
+                    'X to_state S2 WHERE U login "admin", S1 name "activated", '
+                    'S2 name "deactivated"', {'c': comment})
+            trinfos = cnx.execute('TrInfo X').complete_entities()
+            self.assertEqual(len(trinfos), 2)
+            for trinfo in trinfos:
+                self.assertTrue(trinfo._cw_completed)
+                self.assertTrue(trinfo.cw_relation_cached('from_state', 'subject'))
+                self.assertTrue(trinfo.cw_relation_cached('wf_info_for', 'subject'))
+                self.assertEqual(trinfo.to_state[0].name, 'deactivated')
+                self.assertEqual(trinfo.by_transition, ())
+
     def test_request_cache(self):
         with self.admin_access.web_request() as req:
             user = req.execute('CWUser X WHERE X login "admin"').get_entity(0, 0)
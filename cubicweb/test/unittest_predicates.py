@@ -28,7 +28,8 @@ from cubicweb.devtools.testlib import CubicWebTC
 from cubicweb.predicates import (is_instance, adaptable, match_kwargs, match_user_groups,
                                  multi_lines_rset, score_entity, is_in_state,
                                  rql_condition, relation_possible, match_form_params,
-                                 paginated_rset)
+                                 paginated_rset, one_line_rset, match_form_id,
+                                 predicate_form_params)
 from cubicweb.view import EntityAdapter
 from cubicweb.web import action
 
@@ -285,6 +286,22 @@ class MatchKwargsTC(TestCase):
         self.assertEqual(selector(None, None, a=1, c=1), 1)
 
 
+class PredicateFormParamsTC(TestCase):
+
+    def test_cacheable(self):
+        self.assertEqual(predicate_form_params(is_instance('CWUser') & one_line_rset()),
+                         set())
+        self.assertEqual(predicate_form_params(match_form_params('vid') | ~match_form_id('edit')),
+                         set(('vid', '__form_id')))
+        self.assertEqual(predicate_form_params(match_user_groups('managers')), set())
+
+    def test_not_cacheable(self):
+        self.assertIsNone(predicate_form_params(is_instance('CWUser', accept_none=False)))
+        self.assertIsNone(predicate_form_params(match_user_groups('owners')))
+        self.assertIsNone(predicate_form_params(multi_lines_rset(3)))
+        self.assertIsNone(predicate_form_params(one_line_rset() & score_entity(lambda x: 1)))
+
+
 class ScoreEntityTC(CubicWebTC):
 
     def test_intscore_entity_selector(self):
@@ -602,6 +602,60 @@ class ResultSetTC(CubicWebTC):
             self.assertEqual(set(e.e_schema.type for e in rset.entities(1)),
                              set(['CWGroup']))
 
+    def test_entities_bulk(self):
+        with self.admin_access.web_request() as req:
+            req.create_entity('CWUser', login=u'adim', upassword='adim')
+            rset = req.execute('Any U,L,E ORDERBY L WHERE U login L, U primary_email E?')
+            entities = rset.entities_bulk(0)
+            self.assertEqual([e.eid for e in entities],
+                             [e.eid for e in rset.entities(0)])
+            self.assertEqual([e.cw_attr_cache['login'] for e in entities],
+                             ['adim', 'admin', 'anon'])
+            for row, entity in enumerate(entities):
+                self.assertIs(entity, rset.get_entity(row, 0))
+            # each entity has its own empty related result set
+            for entity in entities:
+                emails = entity.cw_relation_cached('primary_email', 'subject')[0]
+                self.assertEqual(emails.printable_rql(),
+                                 'Any Y WHERE X primary_email Y, X eid %s' % entity.eid)
+            self.assertFalse(entities[0].primary_email)
+            self.assertRaises(NotAnEntity, rset.entities_bulk, 1)
+
+    def test_prefetch_related(self):
+        with self.admin_access.web_request() as req:
+            self.create_user(req, u'adim')
+            req.cnx.commit()
+            expected = {}
+            for rql, rtype, role in (('CWUser X', 'in_group', 'subject'),
+                                     ('CWGroup X', 'in_group', 'object'),
+                                     ('CWUser X', 'primary_email', 'subject')):
+                expected[(rtype, role)] = dict(
+                    (entity.eid, entity.related(rtype, role).rows)
+                    for entity in req.execute(rql).entities())
+        with self.admin_access.web_request() as req:
+            for rql, rtype, role in (('CWUser X', 'in_group', 'subject'),
+                                     ('CWGroup X', 'in_group', 'object'),
+                                     ('CWUser X', 'primary_email', 'subject')):
+                rset = req.execute(rql)
+                executed = []
+                execute = req.execute
+
+                def counting_execute(rql, *args, **kwargs):
+                    executed.append(rql)
+                    return execute(rql, *args, **kwargs)
+
+                req.execute = counting_execute
+                try:
+                    entities = rset.prefetch_related(rtype, role)
+                    related = dict((entity.eid, entity.related(rtype, role).rows)
+                                   for entity in entities)
+                finally:
+                    del req.execute
+                self.assertEqual(len(executed), 1)
+                self.assertEqual(related, expected[(rtype, role)])
+            users = rset.entities()
+            self.assertFalse(next(users).primary_email)
+
     def test_iter_rows_with_entities(self):
         with self.admin_access.web_request() as req:
             rset = req.execute('Any U,UN,G,GN WHERE U in_group G, U login UN, G name GN')
@@ -17,6 +17,7 @@
 # with CubicWeb.  If not, see <http://www.gnu.org/licenses/>.
 """unit tests for module cubicweb.schema"""
 
+import pickle
 from os.path import join, dirname, splitext
 
 from logilab.common.testlib import TestCase, unittest_main
@@ -471,6 +472,18 @@ class RQLExpressionTC(TestCase):
         self.assertEqual(found, None)
         self.assertEqual(keyarg, None)
 
+    def test_pickle(self):
+        expr = ERQLExpression('X owned_by U', eid=1)
+        expr2 = pickle.loads(pickle.dumps(expr))
+        self.assertEqual(expr2, expr)
+        self.assertEqual(expr2.eid, 1)
+        self.assertEqual(expr2.snippet_rqlst.as_string(), expr.snippet_rqlst.as_string())
+        cstr = RQLConstraint('S owned_by O', msg='not owner')
+        cstr2 = pickle.loads(pickle.dumps(cstr))
+        self.assertEqual(cstr2.expression, cstr.expression)
+        self.assertEqual(cstr2.msg, 'not owner')
+        self.assertEqual(cstr2.mainvars, cstr.mainvars)
+
 
 class GuessRrqlExprMainVarsTC(TestCase):
     def test_exists(self):
@@ -0,0 +1,70 @@
+# copyright 2026 LOGILAB S.A. (Paris, FRANCE), all rights reserved.
+# contact http://www.logilab.fr/ -- mailto:contact@logilab.fr
+#
+# This file is part of CubicWeb.
+#
+# CubicWeb is free software: you can redistribute it and/or modify it under the
+# terms of the GNU Lesser General Public License as published by the Free
+# Software Foundation, either version 2.1 of the License, or (at your option)
+# any later version.
+#
+# CubicWeb is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public License along
+# with CubicWeb.  If not, see <http://www.gnu.org/licenses/>.
+"""unit tests for module cubicweb.startupprofile"""
+
+import time
+import unittest
+from io import StringIO
+
+from cubicweb import startupprofile
+from cubicweb.startupprofile import StartupProfiler, measure, module_cube
+
+
+class StartupProfilerTC(unittest.TestCase):
+
+    def test_inactive(self):
+        with measure('phase', 'schema'):
+            pass
+        self.assertIsNone(startupprofile._profiler)
+
+    def test_nested_measures(self):
+        with StartupProfiler() as profiler:
+            with measure('phase', 'schema'):
+                time.sleep(0.01)
+                with measure('phase', 'vreg'):
+                    with measure('module', 'cubicweb_blog.views'):
+                        data = [0] * 100000
+                        time.sleep(0.01)
+                    with measure('module', 'cubicweb.web.views.primary'):
+                        # loading a module may load another one
+                        with measure('module', 'cubicweb_blog.entities'):
+                            pass
+        self.assertIsNone(startupprofile._profiler)
+        schema, vreg = profiler.phases()
+        self.assertEqual(schema.name, 'schema')
+        self.assertGreaterEqual(schema.time, 0.02)
+        self.assertLess(schema.exclusive_time, schema.time - 0.01)
+        self.assertGreater(vreg.memory, len(data))
+        self.assertLess(vreg.exclusive_memory, vreg.memory)
+        self.assertEqual(profiler.modules()[0].name, 'cubicweb_blog.views')
+        self.assertEqual([(cube, nbmodules) for cube, _, _, nbmodules in profiler.cubes()],
+                         [('blog', 2), ('cubicweb', 1)])
+        stream = StringIO()
+        profiler.report(stream, limit=1)
+        report = stream.getvalue()
+        self.assertIn('cubicweb_blog.views', report)
+        self.assertNotIn('cubicweb_blog.entities', report)
+
+    def test_module_cube(self):
+        self.assertEqual(module_cube('cubicweb_blog.views.primary'), 'blog')
+        self.assertEqual(module_cube('cubicweb.web.views.primary'), 'cubicweb')
+        self.assertEqual(module_cube('views'), 'instance')
+
+
+if __name__ == '__main__':
+    unittest.main()
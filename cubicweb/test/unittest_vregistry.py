@@ -18,12 +18,14 @@
 
 from logilab.common.testlib import unittest_main, TestCase
 
+import os
 from os.path import join
 
 from cubicweb import CW_SOFTWARE_ROOT as BASE, devtools
 from cubicweb.cwvreg import CWRegistryStore, UnknownProperty
 from cubicweb.devtools.testlib import CubicWebTC
-from cubicweb.view import EntityAdapter
+from cubicweb.predicates import one_etype_rset, is_instance
+from cubicweb.view import EntityAdapter, EntityView
 
 
 class YesSchema:
@@ -84,5 +86,120 @@ class CWVregTC(CubicWebTC):
         from cubicweb.web.views.xmlrss import RSSIconBox
         self.assertEqual(self.vreg.property_info(RSSIconBox._cwpropkey('visible'))['default'], True)
 
+
+class LazyAppObjectsTC(CubicWebTC):
+
+    def setUp(self):
+        super(LazyAppObjectsTC, self).setUp()
+        self.config.global_set_option('lazy-appobjects', True)
+        self.addCleanup(self.config.global_set_option, 'lazy-appobjects', False)
+
+    def new_vreg(self):
+        vreg = CWRegistryStore(self.config, initlog=False)
+        vreg.schema = self.schema
+        vreg.register_modnames(self.config.appobjects_modnames())
+        self.addCleanup(lambda: os.path.exists(vreg._manifest_path())
+                        and os.remove(vreg._manifest_path()))
+        return vreg
+
+    @staticmethod
+    def content(vreg):
+        return dict((regname, sorted(registry.objid(obj)
+                                     for objects in registry.values() for obj in objects))
+                    for regname, registry in vreg.items())
+
+    def test_lazy_loading(self):
+        # first registration generates the manifest
+        vreg = self.new_vreg()
+        self.assertFalse(vreg._lazy_groups)
+        self.assertTrue(os.path.exists(vreg._manifest_path()))
+        # next ones use it to defer loading of some modules
+        vreg = self.new_vreg()
+        self.assertTrue(vreg._lazy_groups)
+        self.assertIn('rss', dict.keys(vreg['views']) | set(vreg['views']._pending))
+        ngroups = len(vreg._lazy_groups)
+        with self.admin_access.web_request() as req:
+            rset = req.execute('Any X WHERE X is CWGroup')
+            self.assertTrue(vreg['views'].select('rss', req, rset=rset))
+        self.assertLess(len(vreg._lazy_groups), ngroups)
+        # property definitions of modules which aren't loaded are known
+        self.assertTrue(vreg.property_info('ctxcomponents.rss.visible'))
+        # eventually, registries hold the same objects as when loaded eagerly
+        self.assertEqual(self.content(vreg), self.content(self.vreg))
+        self.assertFalse(vreg._lazy_groups)
+        self.assertEqual(sorted(vreg.user_property_keys(True)),
+                         sorted(self.vreg.user_property_keys(True)))
+
+
+class SelectionCacheTC(CubicWebTC):
+
+    def setUp(self):
+        super(SelectionCacheTC, self).setUp()
+        views = self.vreg['views']
+        views.selection_cache_size = 100
+        self.addCleanup(setattr, views, 'selection_cache_size', 0)
+        self.addCleanup(views.clear_selection_cache)
+
+    def test_cached_selection(self):
+        views = self.vreg['views']
+        with self.admin_access.web_request() as req:
+            req.selection_stats = {}
+            rset = req.execute('Any X WHERE X is CWUser')
+            view = views.select('list', req, rset=rset)
+            self.assertEqual(len(views._selection_cache), 1)
+            self.assertEqual(views.select('list', req, rset=rset).__class__,
+                             view.__class__)
+            self.assertEqual(req.selection_stats['views'][:2], [2, 1])
+            # a different entity type or number of rows is another key
+            rset = req.execute('Any X WHERE X is CWGroup, X name "managers"')
+            views.select('list', req, rset=rset)
+            self.assertEqual(len(views._selection_cache), 2)
+            self.assertEqual(req.selection_stats['views'][:2], [3, 1])
+
+    def test_row_and_column_types(self):
+        class OneETypeView(EntityView):
+            __regid__ = 'cw.test.selection'
+            __select__ = one_etype_rset() & is_instance('CWUser')
+
+        class AnyETypeView(EntityView):
+            __regid__ = 'cw.test.selection'
+            __select__ = is_instance('CWUser')
+
+        views = self.vreg['views']
+        with self.temporary_appobjects(OneETypeView, AnyETypeView):
+            with self.admin_access.web_request() as req:
+                rset = req.execute('Any X WHERE X is CWUser')
+                self.assertIsInstance(
+                    views.select('cw.test.selection', req, rset=rset, row=0),
+                    OneETypeView)
+                # same type for the given row, but the column has several types
+                rset = req.execute('Any X WHERE X is IN (CWUser, CWGroup)')
+                row = [etype for etype, in rset.description].index('CWUser')
+                self.assertIsInstance(
+                    views.select('cw.test.selection', req, rset=rset, row=row),
+                    AnyETypeView)
+
+    def test_not_cacheable(self):
+        views = self.vreg['views']
+        with self.admin_access.web_request() as req:
+            rset = req.execute('Any X WHERE X is CWUser')
+            # 'primary' views use the `adaptable` predicate
+            views.select('primary', req, rset=rset, row=0)
+            # non simple arguments
+            views.select('list', req, rset=rset, entity=rset.get_entity(0, 0))
+            self.assertFalse(views._selection_cache)
+
+    def test_cache_cleared_on_registration(self):
+        views = self.vreg['views']
+        with self.admin_access.web_request() as req:
+            rset = req.execute('Any X WHERE X is CWUser')
+            views.select('list', req, rset=rset)
+        self.assertTrue(views._selection_cache)
+        listview = views['list'][0]
+        views.unregister(listview)
+        self.assertFalse(views._selection_cache)
+        views.register(listview)
+
+
 if __name__ == '__main__':
     unittest_main()
@@ -22,10 +22,10 @@ from __future__ import division
 import base64
 import decimal
 import datetime
+import heapq
 import random
 import re
 import json
-from operator import itemgetter
 from inspect import getfullargspec as getargspec
 from itertools import repeat
 from uuid import uuid4
@@ -235,6 +235,9 @@ class HTMLHead(UStringIO):
         self.pagedata_unload = False
         self._cw = req
         self.datadir_url = req.datadir_url
+        # number of raw headers, js variables, css files, ie css files, js
+        # files and post inlined scripts already sent, see flush()
+        self._sent = None
 
     def add_raw(self, rawheader):
         self.write(rawheader)
@@ -331,6 +334,41 @@ class HTMLHead(UStringIO):
         optimzed cf. http://stevesouders.com/cuzillion) order in external
         resources declaration
         """
+        self._write_resources(skiphead)
+        # at the start of this function, the parent UStringIO may already have
+        # data in it, so we can't w(u'<head>\n') at the top. Instead, we create
+        # a temporary UStringIO to get the same debugging output formatting
+        # if debugging is enabled.
+        headtag = UStringIO(tracewrites=self.tracewrites)
+        if not skiphead:
+            headtag.write(u'<head>\n')
+            self.write(u'</head>\n')
+        return headtag.getvalue() + super(HTMLHead, self).getvalue()
+
+    def flush(self):
+        """return the <head> element on first call. Then return raw headers
+        and resources declarations added since the previous call, to be
+        written in the body of a page whose head has already been sent.
+        """
+        if self._sent is None:
+            value = self.getvalue()
+        else:
+            nbraw, nbjsvars, nbcss, nbiecss, nbjs, nbscripts = self._sent
+            late = HTMLHead(self._cw)
+            late.jsvars = self.jsvars[nbjsvars:]
+            late.cssfiles = self.cssfiles[nbcss:]
+            late.ie_cssfiles = self.ie_cssfiles[nbiecss:]
+            late.jsfiles = self.jsfiles[nbjs:]
+            late.post_inlined_scripts = self.post_inlined_scripts[nbscripts:]
+            late.extend(self[nbraw:])
+            late._write_resources(skiphead=False)
+            value = u''.join(late)
+        self._sent = (len(self), len(self.jsvars), len(self.cssfiles),
+                      len(self.ie_cssfiles), len(self.jsfiles),
+                      len(self.post_inlined_scripts))
+        return value
+
+    def _write_resources(self, skiphead):
         w = self.write
         # 1/ variable declaration if any
         if self.jsvars:
@@ -396,15 +434,6 @@ class HTMLHead(UStringIO):
                 w(self.script_opening)
                 w(u'\n\n'.join(self.post_inlined_scripts))
                 w(self.script_closing)
-        # at the start of this function, the parent UStringIO may already have
-        # data in it, so we can't w(u'<head>\n') at the top. Instead, we create
-        # a temporary UStringIO to get the same debugging output formatting
-        # if debugging is enabled.
-        headtag = UStringIO(tracewrites=self.tracewrites)
-        if not skiphead:
-            headtag.write(u'<head>\n')
-            w(u'</head>\n')
-        return headtag.getvalue() + super(HTMLHead, self).getvalue()
 
 
 class HTMLStream(object):
@@ -429,6 +458,10 @@ class HTMLStream(object):
         self._htmlattrs = [('lang', req.lang)]
         # keep main_stream's reference on req for easier text/html demoting
         req.main_stream = self
+        # whether the beginning of the page has been flushed, and size of the
+        # body written since the last flush, see flush()
+        self._flushed = False
+        self._size = self._measured = 0
 
     def add_htmlattr(self, attrname, attrvalue):
         self._htmlattrs.append( (attrname, attrvalue) )
@@ -447,6 +480,32 @@ class HTMLStream(object):
             return '<html xmlns:cubicweb="http://www.cubicweb.org" %s>' % attrs
         return '<html xmlns:cubicweb="http://www.cubicweb.org">'
 
+    def flush(self, minsize=0, last=False):
+        """return what has been written since the last call, so that the page
+        may be sent while it's being rendered, or None if less than `minsize`
+        characters have been written. The first call returns the page up to
+        its <head> element included. Headers added afterwards are returned
+        along with the body. The closing </html> tag is returned when `last`
+        is true.
+        """
+        if self._flushed:
+            body = self.body
+            self._size += sum(len(value) for value in body[self._measured:])
+            self._measured = len(body)
+            if self._size < minsize and not last:
+                return None
+            chunks = [self.head.flush()]
+            chunks += body
+        else:
+            self._flushed = True
+            chunks = [u'%s\n%s\n%s\n' % (self.doctype, self.htmltag, self.head.flush())]
+            chunks += self.body
+        del self.body[:]
+        self._size = self._measured = 0
+        if last:
+            chunks.append(u'\n</html>')
+        return u''.join(chunks)
+
     def getvalue(self):
         """writes HTML headers, closes </head> tag and writes HTML body"""
         if self.tracehtml:
@@ -591,6 +650,19 @@ class QueryCache(object):
     end-user (web-ui provided) requests. These have to be cleaned up
     when they fill the cache, without evicting the useful, frequently
     used entries.
+
+    Since the cache is looked up on each query by every thread, reading it
+    doesn't take any lock: hits on permanent elements are plain dictionary
+    lookups, and hits on other elements increment a counter without
+    synchronization, so that concurrent reads may lose some increments (usage
+    counts are only approximate). The lock is only taken to insert, remove or
+    promote elements.
+
+    When the cache is full, elements which have never been read since their
+    insertion are evicted first, else the least frequently read tenth of
+    other transient elements is evicted at once, so that the eviction cost
+    is amortized over several insertions. Remaining counts are then halved
+    so that frequencies reflect recent usage (as done by TinyLFU).
     """
     # quite arbitrary, but we want to never
     # immortalize some use-a-little query
@@ -600,20 +672,17 @@ class QueryCache(object):
         self._max = ceiling
         # keys belonging forever to this cache
         self._permanent = set()
-        # mapping of key (that can get wiped) to getitem count
+        # mapping of key (that can get wiped) to approximate getitem count
         self._transient = {}
         self._data = {}
         self._lock = Lock()
 
     def __len__(self):
-        with self._lock:
-            return len(self._data)
+        return len(self._data)
 
     def items(self):
         """Get an iterator over the dictionary's items: (key, value) pairs"""
-        with self._lock:
-            for k, v in self._data.items():
-                yield k, v
+        return iter(list(self._data.items()))
 
     def get(self, k, default=None):
         """Get the value associated to the specified key
@@ -628,30 +697,32 @@ class QueryCache(object):
             return default
 
     def __iter__(self):
-        with self._lock:
-            for k in iter(self._data):
-                yield k
+        return iter(list(self._data))
 
     def __getitem__(self, k):
-        with self._lock:
+        v = self._data[k]
+        if k in self._permanent:
+            return v
+        count = self._transient.get(k, 0) + 1
+        if count > self._maxlevel:
+            with self._lock:
+                if k in self._data:
+                    self._permanent.add(k)
+                self._transient.pop(k, None)
+        else:
+            self._transient[k] = count
             if k in self._permanent:
-                return self._data[k]
-            v = self._transient.get(k, _MARKER)
-            if v is _MARKER:
-                self._transient[k] = 1
-                return self._data[k]
-            if v > self._maxlevel:
-                self._permanent.add(k)
+                # promoted by another thread meanwhile
                 self._transient.pop(k, None)
-            else:
-                self._transient[k] += 1
-            return self._data[k]
+        return v
 
     def __setitem__(self, k, v):
         with self._lock:
-            if len(self._data) >= self._max:
+            if k not in self._data and len(self._data) >= self._max:
                 self._try_to_make_room()
             self._data[k] = v
+            if k not in self._permanent:
+                self._transient.setdefault(k, 0)
 
     def pop(self, key, default=_MARKER):
         with self._lock:
@@ -660,10 +731,8 @@ class QueryCache(object):
                     return self._data.pop(key)
                 return self._data.pop(key, default)
             finally:
-                if key in self._permanent:
-                    self._permanent.remove(key)
-                else:
-                    self._transient.pop(key, None)
+                self._permanent.discard(key)
+                self._transient.pop(key, None)
 
     def clear(self):
         with self._lock:
@@ -675,39 +744,46 @@ class QueryCache(object):
         self._data = {}
 
     def _try_to_make_room(self):
-        current_size = len(self._data)
-        items = sorted(self._transient.items(), key=itemgetter(1))
-        level = 0
+        data = self._data
+        transient = self._transient
+        # copy items since lock-free readers may modify the dictionary
+        items = list(transient.items())
+        unread = []
+        read = []
         for k, v in items:
-            self._data.pop(k, None)
-            self._transient.pop(k, None)
-            if v > level:
-                datalen = len(self._data)
-                if datalen == 0:
-                    return
-                if (current_size - datalen) / datalen > .1:
-                    break
-                level = v
-        else:
-            # we removed cruft
-            if len(self._data) >= self._max:
-                if len(self._permanent) >= self._max:
-                    # we really are full with permanents => clear
-                    logger.warning('Cache %s is full.' % id(self))
-                    self._clear()
-                else:
-                    # pathological case where _transient was probably empty ...
-                    # drop all non-permanents
-                    to_drop = set(self._data.keys()).difference(self._permanent)
-                    for k in to_drop:
-                        # should not be in _transient
-                        assert k not in self._transient
-                        self._data.pop(k, None)
+            if k not in data or k in self._permanent:
+                # counter set by some reader racing with a removal or a
+                # promotion
+                transient.pop(k, None)
+            elif v:
+                read.append((v, k))
+            else:
+                unread.append(k)
+        if not unread and read:
+            unread = [k for v, k in heapq.nsmallest(max(1, len(data) // 10), read)]
+        for k in unread:
+            data.pop(k, None)
+            transient.pop(k, None)
+        # age remaining counts
+        for k, v in list(transient.items()):
+            transient[k] = v // 2
+        if len(data) >= self._max:
+            # we really are full with permanents => clear
+            logger.warning('Cache %s is full.' % id(self))
+            self._clear()
 
     def _usage_report(self):
+        """return the number of elements in the cache (`itemcount`), of
+        permanent elements (`permanentcount`) and of transient elements with a
+        non-zero read count (`transientcount`).
+
+        Since read counts are halved when making room, the latter doesn't count
+        every transient element read since its insertion anymore, only those
+        read recently enough.
+        """
         with self._lock:
             return {'itemcount': len(self._data),
-                    'transientcount': len(self._transient),
+                    'transientcount': len([v for v in self._transient.values() if v]),
                     'permanentcount': len(self._permanent)}
 
     def popitem(self):
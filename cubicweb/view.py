@@ -48,6 +48,20 @@ STRICT_DOCTYPE = STRICT_DOCTYPE_NOEXT # bw compat
 
 # base view object ############################################################
 
+
+def _has_read_rqlexprs(eschema):
+    """return True if read permissions of the entity type `eschema` or of one
+    of its relation definitions involve rql expressions
+    """
+    if eschema.get_rqlexprs('read'):
+        return True
+    for rschema, targets, role in eschema.relation_definitions(True):
+        for target in targets:
+            if rschema.role_rdef(eschema, target, role).get_rqlexprs('read'):
+                return True
+    return False
+
+
 class View(AppObject):
     """This class is an abstraction of a view class, used as a base class for
     every renderable object such as views, templates and other user interface
@@ -70,6 +84,25 @@ class View(AppObject):
 
     :py:attr:`binary`
 
+    :py:attr:`fragment_cache` indicates if the output of the view for an entity
+      may be cached on the server side, when the fragment cache is enabled by
+      the configuration (see :meth:`fragment_cache_key`). It should only be set
+      on views whose output only depends on the entity's attributes and
+      relations and which have no side effect such as adding javascript to the
+      page. Generic views such as `incontext` don't set it, since their output
+      usually depends on related entities (e.g. through `dc_title`), whose
+      modification doesn't invalidate the fragment.
+    :py:attr:`fragment_cache_form_params` names of form parameters the output
+      of the view depends on, if any, which are hence part of fragment cache
+      keys
+    :py:attr:`stream_call` generator version of the `call` method, implemented
+      by views which may be rendered in streaming mode (see
+      :meth:`streamable`). It should yield where what has been written so far
+      may be sent to the client, and the view must not set HTTP headers nor
+      raise exceptions changing the response status, such as `Redirect` or
+      `Unauthorized`, once it has yielded: nothing of the page is sent before
+      the main view first yields.
+
 
     A view writes to its output stream thanks to its attribute `w` (the
     append method of an `UStreamIO`, except for binary views).
@@ -86,6 +119,9 @@ class View(AppObject):
     add_to_breadcrumbs = True
     category = 'view'
     paginable = True
+    fragment_cache = False
+    fragment_cache_form_params = ()
+    stream_call = None
 
     def __init__(self, req=None, rset=None, **kwargs):
         super(View, self).__init__(req, rset=rset, **kwargs)
@@ -127,7 +163,7 @@ class View(AppObject):
         row = context.get('row')
         if row is not None:
             context.setdefault('col', 0)
-            view_func = self.cell_call
+            view_func = self._cell_call
         else:
             view_func = self.call
         stream = self.set_stream(w)
@@ -140,6 +176,34 @@ class View(AppObject):
         if stream is not None:
             return self._stream.getvalue()
 
+    @classmethod
+    def streamable(cls):
+        """return True if the view implements `stream_call` and doesn't
+        override `call` in a subclass of the class implementing it
+        """
+        if cls.stream_call is None:
+            return False
+        for klass in cls.__mro__:
+            if 'stream_call' in vars(klass):
+                return True
+            if 'call' in vars(klass):
+                return False
+
+    def render_stream(self, w=None, **context):
+        """generator version of :meth:`render`, yielding where what has been
+        written so far may be sent to the client when the view is
+        :meth:`streamable`. Other views are rendered at once.
+        """
+        if context.get('row') is not None or not self.streamable():
+            self.render(w=w, **context)
+            return
+        self.set_stream(w)
+        try:
+            yield from self.stream_call(**context)
+        except Exception:
+            self.debug('view stream_call failed (context=%s)', context)
+            raise
+
     def tal_render(self, template, variables):
         """render a precompiled page template with variables in the given
         dictionary as context
@@ -182,7 +246,7 @@ class View(AppObject):
             if wrap:
                 self.w(u'<div class="section">')
             kwargs.setdefault('col', 0)
-            self.cell_call(row=0, **kwargs)
+            self._cell_call(row=0, **kwargs)
             if wrap:
                 self.w(u"</div>")
 
@@ -190,6 +254,101 @@ class View(AppObject):
         """the view is called for a particular result set cell"""
         raise NotImplementedError(repr(self))
 
+    def _cell_call(self, row, col, **kwargs):
+        """call `cell_call`, using the fragment cache if the view opted into
+        it
+        """
+        if not self.fragment_cache or self.binary:
+            self.cell_call(row=row, col=col, **kwargs)
+            return
+        cache = getattr(self._cw.vreg.config, 'fragment_cache', None)
+        key = None if cache is None else self.fragment_cache_key(row=row, col=col, **kwargs)
+        if key is None:
+            self.cell_call(row=row, col=col, **kwargs)
+            return
+        fragment = cache.get(key)
+        if fragment is None:
+            w, stream = self.w, UStringIO()
+            self.w = stream.write
+            try:
+                self.cell_call(row=row, col=col, **kwargs)
+            finally:
+                self.w = w
+            fragment = stream.getvalue()
+            cache.set(key, fragment)
+        self.w(fragment)
+
+    def fragment_cache_key(self, row, col, **kwargs):
+        """return the key of the fragment cache under which the output of
+        `cell_call` for the given cell is stored, or None if it shouldn't be
+        cached.
+
+        The key is built from the eid and modification date of the entity, the
+        view class, the user's groups, the language, the base url, values of
+        form parameters listed in `fragment_cache_form_params` and `kwargs`
+        (which should hence only contain strings, numbers or None). It also
+        holds the user's eid when read permissions of the entity type or of
+        one of its relations involve rql expressions, unless the user is a
+        manager.
+        """
+        rset = self.cw_rset
+        if rset is None or rset.rows[row][col] is None:
+            return None
+        etype = rset.description[row][col]
+        if etype is None or self._cw.vreg.schema.eschema(etype).final:
+            return None
+        for value in kwargs.values():
+            if not (value is None or isinstance(value, (str, int, float))):
+                return None
+        entity = rset.get_entity(row, col)
+        if 'modification_date' not in entity.cw_attr_cache:
+            mdate = self._modification_dates(col).get(entity.eid)
+            if mdate is not None:
+                entity.cw_attr_cache['modification_date'] = mdate
+        mdate = entity.cw_attr_cache.get('modification_date')
+        if mdate is None:
+            return None
+        req = self._cw
+        user = req.user
+        cls = self.__class__
+        form = tuple((param, repr(req.form.get(param)))
+                     for param in self.fragment_cache_form_params)
+        if (not user.is_in_group('managers')
+                and _has_read_rqlexprs(entity.e_schema)):
+            owner = user.eid
+        else:
+            owner = None
+        return (entity.eid, '%s.%s' % (cls.__module__, cls.__name__), mdate,
+                tuple(sorted(user.groups)), owner, req.lang, req.base_url(),
+                form, tuple(sorted(kwargs.items())))
+
+    def _modification_dates(self, col):
+        """return a dictionary of modification dates of entities of the `col`
+        column of the result set, fetched using a single query on first call,
+        so that fragment cache keys of each row don't cost a query
+        """
+        rset = self.cw_rset
+        try:
+            cache = rset._fragment_cache_mdates
+        except AttributeError:
+            cache = rset._fragment_cache_mdates = {}
+        try:
+            return cache[col]
+        except KeyError:
+            pass
+        eschema = self._cw.vreg.schema.eschema
+        eids = set(row[col] for row, descr in zip(rset.rows, rset.description)
+                   if row[col] is not None and descr[col] is not None
+                   and not eschema(descr[col]).final)
+        if eids:
+            mdates = dict(self._cw.execute(
+                'Any X,D WHERE X modification_date D, X eid IN (%s)'
+                % ','.join(str(eid) for eid in eids)).rows)
+        else:
+            mdates = {}
+        cache[col] = mdates
+        return mdates
+
     def linkable(self):
         """return True if the view may be linked in a menu
 
@@ -464,6 +623,9 @@ class MainTemplate(View):
     """
 
     doctype = '<!DOCTYPE html>'
+    # minimal size of chunks of the page sent to the client in streaming mode,
+    # the first one excepted, see render_chunks()
+    stream_chunk_size = 16384
 
     def set_stream(self, w=None):
         if self.w is not None:
@@ -479,6 +641,32 @@ class MainTemplate(View):
         self.w = w
         return stream
 
+    def render_chunks(self, **context):
+        """render the page in streaming mode, yielding chunks of it encoded
+        using the request's encoding as soon as they are available. The first
+        chunk holds the page up to the point where the template first yields
+        (i.e. where the main view first yields), including its <head>. Errors
+        occurring after it has been yielded, including `Redirect` and
+        `Unauthorized` ones, are logged and reported at the end of what has
+        been sent, since the response status has already been sent.
+        """
+        stream = self.set_stream()
+        encoding = self._cw.encoding
+        flushed = False
+        try:
+            for __ in self.render_stream(**context):
+                chunk = stream.flush(self.stream_chunk_size if flushed else 0)
+                if chunk:
+                    flushed = True
+                    yield chunk.encode(encoding)
+        except Exception:
+            if not flushed:
+                raise
+            self.exception('error while rendering %s', self._cw.relative_path())
+            stream.write(u'<div class="error">%s</div></body>' % xml_escape(
+                self._cw._('an error occurred while processing your request')))
+        yield stream.flush(last=True).encode(encoding)
+
     def write_doctype(self, xmldecl=True):
         assert isinstance(self._stream, HTMLStream)
         self._stream.doctype = self.doctype
@@ -21,7 +21,9 @@
 import contextlib
 import http.client as http_client
 import json
+import logging
 import sys
+from collections.abc import Iterator
 from time import process_time, time
 from contextlib import contextmanager
 
@@ -41,6 +43,10 @@ from cubicweb.web import (
 # print information about web session
 SESSION_MANAGER = None
 
+# enable this logger at DEBUG level to get time spent in appobjects selection,
+# per registry, for each request
+SELECTION_LOGGER = logging.getLogger('cubicweb.web.selection')
+
 
 @contextmanager
 def anonymized_request(req):
@@ -337,6 +343,9 @@ class CubicWebPublisher(object):
         # remove user callbacks on a new request (except for json controllers
         # to avoid callbacks being unregistered before they could be called)
         tstart = process_time()
+        if SELECTION_LOGGER.isEnabledFor(logging.DEBUG):
+            # filled by CWRegistry._select_best()
+            req.selection_stats = {}
         commited = False
         try:
             # standard processing of the request
@@ -351,6 +360,13 @@ class CubicWebPublisher(object):
                     raise Unauthorized(req._('not authorized'))
                 req.update_search_state()
                 result = controller.publish(rset=rset)
+                if hasattr(result, 'read'):
+                    # static files controllers return opened files
+                    with result:
+                        result = result.read()
+                elif isinstance(result, Iterator):
+                    # pages rendered in streaming mode
+                    result = b''.join(result)
             except cors.CORSPreflight:
                 # Return directly an empty 200
                 req.status_out = 200
@@ -406,6 +422,12 @@ class CubicWebPublisher(object):
                     pass  # ignore rollback error at this point
         self.add_undo_link_to_msg(req)
         self.debug('query %s executed in %s sec', path, process_time() - tstart)
+        selection_stats = getattr(req, 'selection_stats', None)
+        if selection_stats:
+            for regid, (selections, hits, seconds) in sorted(selection_stats.items()):
+                SELECTION_LOGGER.debug('query %s: %s selections (%s cached) in %s '
+                                       'registry in %.6f sec', path, selections,
+                                       hits, regid, seconds)
         return result
 
     # Error handlers
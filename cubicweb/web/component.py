@@ -61,7 +61,11 @@ class NavigationComponent(Component):
     def __init__(self, req, rset, **kwargs):
         super(NavigationComponent, self).__init__(req, rset=rset, **kwargs)
         self.starting_from = 0
-        self.total = rset.rowcount
+        if rset.total_rowcount is not None:
+            # only the displayed page has been fetched
+            self.total = rset.total_rowcount
+        else:
+            self.total = rset.rowcount
 
     def get_page_size(self):
         try:
@@ -90,7 +94,7 @@ class NavigationComponent(Component):
             start = int(self._cw.form[self.start_param])
         except KeyError:
             start, stop = 0, self.page_size
-        if start >= len(self.cw_rset):
+        if start >= self.total:
             start, stop = 0, self.page_size
         self.starting_from = start
         return start, stop
@@ -205,7 +209,7 @@ class NavigationComponent(Component):
         params['__fromnavigation'] = 1
         url = self.page_url(basepath, params)
         w(u'<div class="displayAllLink"><a href="%s">%s</a></div>\n'
-          % (xml_escape(url), req._('show %s results') % len(self.cw_rset)))
+          % (xml_escape(url), req._('show %s results') % self.total))
 
 # new contextual components system #############################################
 
@@ -71,6 +71,7 @@ from cubicweb.utils import make_uid
 from cubicweb.predicates import match_context_prop, partial_relation_possible
 from cubicweb.appobject import AppObject
 from cubicweb.web import RequestError, htmlwidgets
+from cubicweb.web.querycache import cached_execute
 
 
 def rtype_facet_title(facet):
@@ -351,6 +352,51 @@ def _get_var(select, varname, varmap):
         return var
 
 
+def prefetch_ranges(facets):
+    """compute minimum and maximum values of `facets` which are
+    :class:`RangeFacet` on attributes of the same filtered variable using a
+    single query, instead of a query per facet. Other facets are left
+    untouched.
+    """
+    facets = [facet for facet in facets
+              if isinstance(facet, RangeFacet) and facet.role == 'subject'
+              # skip facets computing their range their own way
+              and type(facet).vocabulary is RangeFacet.vocabulary
+              and type(facet)._range_rset is RangeFacet._range_rset
+              and facet._range_values is None]
+    if len(facets) < 2:
+        return
+    select = facets[0].select
+    facets = [facet for facet in facets if facet.select is select]
+    filtered_variable = facets[0].filtered_variable
+    select.save_state()
+    try:
+        cleanup_select(select, filtered_variable)
+        for facet in facets:
+            newvar = _add_rtype_relation(select, filtered_variable,
+                                         facet.rtype, facet.role)[0]
+            for funcname in ('MIN', 'MAX'):
+                func = nodes.Function(funcname)
+                func.append(nodes.VariableRef(newvar))
+                select.add_selected(func)
+        if filtered_variable.stinfo['typerel'] is None:
+            etypes = frozenset(sol[filtered_variable.name] for sol in select.solutions)
+            select.add_type_restriction(filtered_variable, etypes)
+        try:
+            rset = facets[0].rqlexec(select.as_string(), facets[0].cw_rset.args)
+        except Exception:
+            # let each facet compute its own range
+            facets[0].exception('error while getting ranges for %s, rql: %s',
+                                facets, select.as_string())
+            return
+    finally:
+        select.recover()
+    if rset:
+        row = rset[0]
+        for i, facet in enumerate(facets):
+            facet._range_values = (row[2 * i], row[2 * i + 1])
+
+
 ## base facet classes ##########################################################
 
 class AbstractFacet(AppObject):
@@ -445,9 +491,11 @@ class AbstractFacet(AppObject):
     def rqlexec(self, rql, args=None):
         """Utility method to execute some rql queries, and simply returning an
         empty list if :exc:`Unauthorized` is raised.
+
+        Results are cached when the `query-results-cache-ttl` option is set.
         """
         try:
-            return self._cw.execute(rql, args)
+            return cached_execute(self._cw, rql, args)
         except Unauthorized:
             return []
 
@@ -1178,6 +1226,8 @@ class RangeFacet(AttributeFacet):
     """
     target_attr_type = 'Float' # only numerical types are supported
     needs_update = False # not supported actually
+    # (min, max) values when computed by :func:`prefetch_ranges`
+    _range_values = None
 
     @property
     def wdgclass(self):
@@ -1212,6 +1262,9 @@ class RangeFacet(AttributeFacet):
     def vocabulary(self):
         """return vocabulary for this facet, eg a list of 2-uple (label, value)
         """
+        if self._range_values is not None:
+            minv, maxv = self._range_values
+            return [(str(minv), minv), (str(maxv), maxv)]
         rset = self._range_rset()
         if rset:
             minv, maxv = rset[0]
@@ -0,0 +1,179 @@
+# copyright 2026 LOGILAB S.A. (Paris, FRANCE), all rights reserved.
+# contact http://www.logilab.fr/ -- mailto:contact@logilab.fr
+#
+# This file is part of CubicWeb.
+#
+# CubicWeb is free software: you can redistribute it and/or modify it under the
+# terms of the GNU Lesser General Public License as published by the Free
+# Software Foundation, either version 2.1 of the License, or (at your option)
+# any later version.
+#
+# CubicWeb is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public License along
+# with CubicWeb.  If not, see <http://www.gnu.org/licenses/>.
+"""server side cache of HTML fragments rendered by views for an entity.
+
+Views opt into it by setting their `fragment_cache` class attribute to True
+(see :meth:`cubicweb.view.View.fragment_cache_key` for what the cache key is
+built from). The cache is enabled by the `fragment-cache-size` and
+`fragment-cache-directory` options of the web configuration and fragments of
+entities are invalidated when they are modified or deleted, or when one of
+their relations is added or removed (see :mod:`cubicweb.hooks.fragmentcache`).
+
+Invalidation happens on commit, in the committing process: memory caches of
+other processes only miss fragments of an entity once its modification date
+has changed, so they may serve fragments which are stale because of a
+relation change. Use the directory cache if that matters.
+"""
+
+import os
+import os.path as osp
+import shutil
+import sys
+import tempfile
+from collections import OrderedDict
+from hashlib import sha1
+from threading import Lock
+
+__all__ = ('MemoryFragmentCache', 'DiskFragmentCache', 'fragment_cache_from_config')
+
+
+class MemoryFragmentCache(object):
+    """LRU cache of fragments, bounded by the memory size of stored fragments.
+
+    Keys are tuples whose first item is the eid of the rendered entity.
+    """
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.size = 0
+        self.hits = self.misses = 0
+        self._data = OrderedDict()
+        # eid -> set of keys, to invalidate every fragment of an entity
+        self._keys = {}
+        self._lock = Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key):
+        """return the fragment cached for `key`, or None"""
+        with self._lock:
+            try:
+                self._data.move_to_end(key)
+            except KeyError:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return self._data[key]
+
+    def set(self, key, fragment):
+        """cache `fragment` for `key`, evicting least recently used fragments if
+        necessary
+        """
+        if sys.getsizeof(fragment) > self.maxsize:
+            return
+        with self._lock:
+            self._remove(key)
+            self._data[key] = fragment
+            self._keys.setdefault(key[0], set()).add(key)
+            self.size += sys.getsizeof(fragment)
+            while self.size > self.maxsize:
+                self._remove(next(iter(self._data)))
+
+    def invalidate(self, eids):
+        """remove every fragment of entities with the given eids"""
+        with self._lock:
+            for eid in eids:
+                for key in list(self._keys.get(eid, ())):
+                    self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._keys.clear()
+            self.size = 0
+
+    def _remove(self, key):
+        fragment = self._data.pop(key, None)
+        if fragment is None:
+            return
+        self.size -= sys.getsizeof(fragment)
+        keys = self._keys[key[0]]
+        keys.discard(key)
+        if not keys:
+            del self._keys[key[0]]
+
+
+class DiskFragmentCache(object):
+    """cache of fragments stored as files of a directory, in a sub-directory per
+    entity, so that it may be shared by processes of an instance.
+
+    Fragments of an entity are removed when it is invalidated. Since the
+    modification date of the entity is part of the key, stale fragments are
+    never returned by other processes either.
+
+    The size of the directory isn't bounded: fragments of an entity are only
+    removed once it's modified or deleted, so the directory may grow up to the
+    number of entities times the number of variants of their fragments (views,
+    groups, languages, form parameters). It may be cleaned up at any time by
+    an external job, e.g. removing files which haven't been accessed for some
+    time.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.hits = self.misses = 0
+
+    def _path(self, key):
+        return osp.join(self.directory, str(key[0]),
+                        sha1(repr(key).encode('utf-8')).hexdigest())
+
+    def get(self, key):
+        """return the fragment cached for `key`, or None"""
+        try:
+            with open(self._path(key), 'rb') as stream:
+                fragment = stream.read().decode('utf-8')
+        except (IOError, OSError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return fragment
+
+    def set(self, key, fragment):
+        """cache `fragment` for `key`"""
+        path = self._path(key)
+        directory = osp.dirname(path)
+        try:
+            os.makedirs(directory, exist_ok=True)
+            # write to a temporary file then rename it so that concurrent
+            # readers never get a partially written fragment
+            fd, tmppath = tempfile.mkstemp(dir=directory)
+            with os.fdopen(fd, 'wb') as stream:
+                stream.write(fragment.encode('utf-8'))
+            os.replace(tmppath, path)
+        except (IOError, OSError):
+            pass
+
+    def invalidate(self, eids):
+        """remove every fragment of entities with the given eids"""
+        for eid in eids:
+            shutil.rmtree(osp.join(self.directory, str(eid)), ignore_errors=True)
+
+    def clear(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+def fragment_cache_from_config(config):
+    """return the fragment cache configured by `fragment-cache-directory` and
+    `fragment-cache-size` options of `config`, or None if it's disabled
+    """
+    if config['fragment-cache-directory']:
+        return DiskFragmentCache(config['fragment-cache-directory'])
+    if config['fragment-cache-size']:
+        return MemoryFragmentCache(config['fragment-cache-size'])
+    return None
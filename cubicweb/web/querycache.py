@@ -0,0 +1,177 @@
+# copyright 2026 LOGILAB S.A. (Paris, FRANCE), all rights reserved.
+# contact http://www.logilab.fr/ -- mailto:contact@logilab.fr
+#
+# This file is part of CubicWeb.
+#
+# CubicWeb is free software: you can redistribute it and/or modify it under the
+# terms of the GNU Lesser General Public License as published by the Free
+# Software Foundation, either version 2.1 of the License, or (at your option)
+# any later version.
+#
+# CubicWeb is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public License along
+# with CubicWeb.  If not, see <http://www.gnu.org/licenses/>.
+"""cache of results of read queries executed by the web ui, such as the ones
+computing facets vocabularies or the number of rows of a paginated query.
+
+It is enabled by the `query-results-cache-ttl` option of the web configuration.
+"""
+
+from collections import OrderedDict
+from threading import Lock
+from time import time
+
+from rql import nodes
+
+from cubicweb.rset import ResultSet
+
+__all__ = ('QueryResultsCache', 'cached_execute')
+
+
+class QueryResultsCache(object):
+    """LRU cache of results of read queries, shared by users having the same
+    groups.
+
+    Entries expire after `ttl` seconds, or as soon as one of the entity or
+    relation types involved in their query is invalidated (see
+    :mod:`cubicweb.hooks.querycache`), which only happens for changes
+    committed by the current process.
+    """
+
+    def __init__(self, ttl, maxsize):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.hits = self.misses = 0
+        self._data = OrderedDict()
+        # entity or relation type -> generation, incremented on invalidation
+        self._generations = {}
+        self._lock = Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def generations(self, types):
+        """return current generations of the given entity or relation types,
+        to be given to :meth:`set`
+        """
+        with self._lock:
+            return tuple((type, self._generations.get(type, 0)) for type in types)
+
+    def get(self, key, usereid):
+        """return the value cached for `key` and user `usereid`, or None"""
+        with self._lock:
+            try:
+                timestamp, generations, owner, value = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return None
+            if (time() - timestamp > self.ttl
+                    or (owner is not None and owner != usereid)
+                    or any(self._generations.get(type, 0) != generation
+                           for type, generation in generations)):
+                del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, generations, owner, value):
+        """cache `value` for `key`. `generations` should have been computed
+        before the value, so that it's not cached if it may be stale. If not
+        None, `owner` is the eid of the only user the value may be returned to.
+        """
+        with self._lock:
+            if any(self._generations.get(type, 0) != generation
+                   for type, generation in generations):
+                return
+            self._data.pop(key, None)
+            self._data[key] = (time(), generations, owner, value)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def invalidate(self, types):
+        """invalidate values computed by queries involving any of the given
+        entity or relation types
+        """
+        with self._lock:
+            for type in types:
+                self._generations[type] = self._generations.get(type, 0) + 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+def _args_key(args):
+    if not args:
+        return ()
+    try:
+        key = tuple(sorted(args.items()))
+        hash(key)
+    except TypeError:
+        return None
+    return key
+
+
+def _has_read_rqlexprs(schema, etypes, rtypes):
+    """return True if read permissions of one of the given entity types or of
+    one of the definitions of the given relation types involve rql expressions
+    """
+    for etype in etypes:
+        eschema = schema.eschema(etype)
+        if not eschema.final and eschema.get_rqlexprs('read'):
+            return True
+    for rtype in rtypes:
+        if rtype not in schema:
+            continue
+        for rdef in schema.rschema(rtype).rdefs.values():
+            if rdef.get_rqlexprs('read'):
+                return True
+    return False
+
+
+def cached_execute(req, rql, args=None):
+    """execute `rql` on behalf of `req`, using the query results cache if it's
+    enabled. Results are only cached when `req` has no uncommitted changes.
+    """
+    try:
+        cache = req.vreg.config.query_results_cache
+    except AttributeError:
+        cache = None
+    if cache is None:
+        return req.execute(rql, args)
+    argskey = _args_key(args)
+    cnx = getattr(req, 'cnx', req)
+    # don't share results depending on uncommitted changes
+    if argskey is None or getattr(cnx, 'pending_operations', None):
+        return req.execute(rql, args)
+    user = req.user
+    key = (rql, argskey, frozenset(user.groups))
+    cached = cache.get(key, user.eid)
+    if cached is not None:
+        rows, description = cached
+        rset = ResultSet([list(row) for row in rows], rql, args, description)
+        rset.req = req
+        return rset
+    rqlst = req.vreg.parse(req, rql, args)
+    etypes = set()
+    for select in rqlst.children:
+        for solution in select.solutions:
+            etypes.update(solution.values())
+    rtypes = set(rel.r_type for rel in rqlst.iget_nodes(nodes.Relation))
+    generations = cache.generations(etypes | rtypes)
+    rset = req.execute(rql, args)
+    # results depend on the user when read permissions on an entity or
+    # relation type involve rql expressions
+    owner = None
+    if (not user.is_in_group('managers')
+            and _has_read_rqlexprs(req.vreg.schema, etypes, rtypes)):
+        owner = user.eid
+    cache.set(key, generations, owner,
+              ([list(row) for row in rset.rows], rset.description))
+    return rset
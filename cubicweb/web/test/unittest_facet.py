@@ -1,8 +1,12 @@
+from unittest import mock
+
 from logilab.common.date import datetime2ticks
 from cubicweb.devtools.testlib import CubicWebTC
 from cubicweb.web import facet
+from cubicweb.web.querycache import QueryResultsCache, cached_execute
+
 
-class BaseFacetTC(CubicWebTC):
+class FacetMixinTC(object):
 
     def prepare_rqlst(self, req, rql='CWUser X', mainvar='X',
                       expected_baserql='Any X WHERE X is CWUser',
@@ -31,6 +35,9 @@ class BaseFacetTC(CubicWebTC):
                                                   'WHERE G name GN, G name IN ("guests", "managers")')]
         return f, groups
 
+
+class BaseFacetTC(FacetMixinTC, CubicWebTC):
+
     def test_relation_simple(self):
         with self.admin_access.web_request() as req:
             f, (guests, managers) = self._in_group_facet(req)
@@ -416,6 +423,75 @@ class BaseFacetTC(CubicWebTC):
                              'X modification_date XM, Y creation_date YD, Y is CWGroup, X login "admin" '
                              'HAVING DAY(XD) >= DAY(YD), DAY(XM) <= DAY(YD)')
 
+
+class FacetCacheTC(FacetMixinTC, CubicWebTC):
+
+    def setUp(self):
+        super(FacetCacheTC, self).setUp()
+        self.cache = self.vreg.config.query_results_cache = QueryResultsCache(60, 100)
+
+    def tearDown(self):
+        del self.vreg.config.query_results_cache
+        super(FacetCacheTC, self).tearDown()
+
+    def test_cached_vocabulary(self):
+        with self.admin_access.web_request() as req:
+            f, (guests, managers) = self._in_group_facet(req)
+            vocab = f.vocabulary()
+            self.assertEqual(self.cache.hits, 0)
+            ncached = len(self.cache)
+        with self.admin_access.web_request() as req:
+            f, groups = self._in_group_facet(req)
+            with mock.patch.object(req, 'execute', wraps=req.execute) as execute:
+                self.assertEqual(f.vocabulary(), vocab)
+            self.assertEqual(execute.call_count, 0)
+            self.assertEqual(self.cache.hits, ncached)
+            # the cache is bypassed while there are uncommitted changes
+            self.create_user(req, u'toto', groups=('users',), commit=False)
+            users = req.find('CWGroup', name=u'users').one().eid
+            self.assertEqual(f.vocabulary(), vocab + [(u'users', users)])
+            self.assertEqual(self.cache.hits + self.cache.misses, 2 * ncached)
+            # and results involving modified types are invalidated on commit
+            req.cnx.commit()
+            self.assertEqual(f.vocabulary(), vocab + [(u'users', users)])
+            self.assertEqual(self.cache.hits, ncached)
+
+    def test_user_dependent_results(self):
+        with self.admin_access.repo_cnx() as cnx:
+            self.create_user(cnx, u'toto')
+            cnx.commit()
+        rql = 'Any N WHERE G is CWGroup, G name N'
+        rdef = self.schema['name'].rdefs[('CWGroup', 'String')]
+        with self.new_access(u'toto').web_request() as req:
+            cached_execute(req, rql)
+            self.assertEqual([owner for _, _, owner, _ in self.cache._data.values()],
+                             [None])
+            self.cache.clear()
+            # read permissions of a relation involve rql expressions
+            with mock.patch.object(rdef, 'get_rqlexprs', return_value=('X',)):
+                cached_execute(req, rql)
+            self.assertEqual([owner for _, _, owner, _ in self.cache._data.values()],
+                             [req.user.eid])
+
+    def test_prefetch_ranges(self):
+        with self.admin_access.web_request() as req:
+            rset, rqlst, filtered_variable = self.prepare_rqlst(req)
+            facets = []
+            for rtype in ('creation_date', 'modification_date'):
+                f = facet.DateRangeFacet(req, rset=rset,
+                                         select=rqlst.children[0],
+                                         filtered_variable=filtered_variable)
+                f.rtype = rtype
+                facets.append(f)
+            expected = [f.vocabulary() for f in facets]
+            with mock.patch.object(req, 'execute', wraps=req.execute) as execute:
+                facet.prefetch_ranges(facets)
+                self.assertEqual([f.vocabulary() for f in facets], expected)
+            self.assertEqual(execute.call_count, 1)
+            # ensure rqlst is left unmodified
+            self.assertEqual(rqlst.as_string(), 'DISTINCT Any  WHERE X is CWUser')
+
+
 if __name__ == '__main__':
     from logilab.common.testlib import unittest_main
     unittest_main()
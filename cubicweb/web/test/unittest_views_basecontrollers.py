@@ -18,6 +18,7 @@
 """cubicweb.web.views.basecontrollers unit tests"""
 
 import time
+from unittest import mock
 from urllib.parse import urlsplit, urlunsplit, urljoin, parse_qs
 
 import lxml
@@ -31,6 +32,7 @@ from cubicweb.devtools.testlib import CubicWebTC
 from cubicweb.devtools.webtest import CubicWebTestTC
 from cubicweb.devtools.httptest import CubicWebServerTC
 from cubicweb.utils import json_dumps
+from cubicweb.view import View
 from cubicweb.uilib import rql_for_eid
 from cubicweb.web import Redirect, RemoteCallFailed, http_headers, formfields as ff
 from cubicweb.web.views.autoform import get_pending_inserts, get_pending_deletes
@@ -53,6 +55,85 @@ class ViewControllerTC(CubicWebTestTC):
         self.assertEqual(len(resp.body), 0)
 
 
+class StreamedFailureView(View):
+    __regid__ = 'streamedfailure'
+
+    def call(self):
+        for __ in self.stream_call():
+            pass
+
+    def stream_call(self):
+        self.w(u'<p>before failure</p>')
+        yield
+        raise ValueError('failure')
+
+
+class StreamedRedirectView(View):
+    __regid__ = 'streamedredirect'
+
+    def call(self):
+        for __ in self.stream_call():
+            pass
+
+    def stream_call(self):
+        self.w(u'<p>before redirect</p>')
+        raise Redirect(self._cw.build_url('elsewhere'))
+        yield
+
+
+class StreamingRenderingTC(CubicWebTC):
+
+    def setUp(self):
+        super(StreamingRenderingTC, self).setUp()
+        self.config.global_set_option('streaming-rendering', True)
+        self.addCleanup(self.config.global_set_option, 'streaming-rendering', False)
+
+    def test_streamed_page(self):
+        with self.admin_access.web_request(rql='Any X WHERE X is CWGroup',
+                                           vid='list') as req:
+            nbgroups = req.execute('Any COUNT(X) WHERE X is CWGroup')[0][0]
+            ctrl = self.vreg['controllers'].select('view', req, appli=self.app)
+            chunks = ctrl.publish()
+            # the page header is sent along with the first item of the list
+            first = next(chunks)
+            self.assertIn(b'</head>', first)
+            self.assertEqual(first.split(b'<ul class="section">')[1].count(b'<li>'), 1)
+            page = first + b''.join(chunks)
+        listing = page.split(b'<ul class="section">')[1].split(b'</ul>')[0]
+        self.assertEqual(listing.count(b'<li>'), nbgroups)
+        self.assertTrue(page.endswith(b'</html>'))
+
+    def test_not_streamable(self):
+        with self.admin_access.web_request(rql='Any X WHERE X is CWGroup',
+                                           vid='table') as req:
+            ctrl = self.vreg['controllers'].select('view', req, appli=self.app)
+            self.assertIsInstance(ctrl.publish(), bytes)
+
+    def test_redirect_before_first_chunk(self):
+        with self.temporary_appobjects(StreamedRedirectView):
+            with self.admin_access.web_request(vid='streamedredirect') as req:
+                ctrl = self.vreg['controllers'].select('view', req, appli=self.app)
+                with self.assertRaises(Redirect):
+                    ctrl.publish()
+
+    def test_head_not_streamed(self):
+        with self.admin_access.web_request(rql='Any X WHERE X is CWGroup',
+                                           vid='list') as req:
+            with mock.patch.object(req, 'http_method', return_value='HEAD'):
+                ctrl = self.vreg['controllers'].select('view', req, appli=self.app)
+                self.assertIsInstance(ctrl.publish(), bytes)
+
+    def test_error_after_first_chunk(self):
+        with self.temporary_appobjects(StreamedFailureView):
+            with self.admin_access.web_request(vid='streamedfailure') as req:
+                ctrl = self.vreg['controllers'].select('view', req, appli=self.app)
+                with self.assertLogs('cubicweb.appobject', level='ERROR'):
+                    page = b''.join(ctrl.publish()).decode('utf-8')
+        self.assertIn('<p>before failure</p>', page)
+        self.assertIn('an error occurred while processing your request', page)
+        self.assertTrue(page.endswith('</html>'))
+
+
 def req_form(user):
     return {'eid': [str(user.eid)],
             '_cw_entity_fields:%s' % user.eid: '_cw_generic_field',
@@ -16,13 +16,20 @@
 # You should have received a copy of the GNU Lesser General Public License along
 # with CubicWeb.  If not, see <http://www.gnu.org/licenses/>.
 
+import os
+import tempfile
+from unittest import mock
+
 from logilab.common.testlib import unittest_main
 from logilab.mtconverter import html_unescape
 
 from cubicweb.devtools.testlib import CubicWebTC
 from cubicweb.utils import json
 from cubicweb.view import StartupView, TRANSITIONAL_DOCTYPE
+from cubicweb.web.fragmentcache import MemoryFragmentCache, DiskFragmentCache
 from cubicweb.web.views import vid_from_rset
+from cubicweb.web.views.baseviews import InContextView, OutOfContextView
+from cubicweb.web.views.cwuser import CWGroupInContextView
 
 def loadjson(value):
     return json.loads(html_unescape(value))
@@ -289,5 +296,114 @@ class BaseViewsTC(CubicWebTC):
             self.assertEqual(result, expected)
 
 
+class FragmentCacheTC(CubicWebTC):
+
+    def setUp(self):
+        super(FragmentCacheTC, self).setUp()
+        self.cache = self.vreg.config.fragment_cache = MemoryFragmentCache(10 ** 6)
+
+    def tearDown(self):
+        del self.vreg.config.fragment_cache
+        super(FragmentCacheTC, self).tearDown()
+
+    def opt_in(self):
+        """opt views used in tests into the fragment cache"""
+        for viewcls in (InContextView, OutOfContextView, CWGroupInContextView):
+            patcher = mock.patch.object(viewcls, 'fragment_cache', True)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_not_cached_by_default(self):
+        with self.admin_access.web_request() as req:
+            rset = req.execute('Any G ORDERBY N WHERE G is CWGroup, G name N')
+            req.view('list', rset, subvid='outofcontext')
+            self.assertEqual(len(self.cache), 0)
+
+    def test_cached_fragments(self):
+        self.opt_in()
+        with self.admin_access.web_request() as req:
+            rset = req.execute('Any G ORDERBY N WHERE G is CWGroup, G name N')
+            html = req.view('list', rset, subvid='incontext')
+            self.assertEqual(len(self.cache), len(rset))
+            self.assertEqual(self.cache.hits, 0)
+        with self.admin_access.web_request() as req:
+            rset = req.execute('Any G ORDERBY N WHERE G is CWGroup, G name N')
+            with mock.patch.object(req, 'execute', wraps=req.execute) as execute:
+                self.assertEqual(req.view('list', rset, subvid='incontext'), html)
+            # a single query fetched modification dates of all groups, which
+            # haven't been completed
+            self.assertEqual(execute.call_count, 1)
+            self.assertEqual(self.cache.hits, len(rset))
+            # the key depends on the language
+            req.set_language('fr')
+            req.view('list', rset, subvid='incontext')
+            self.assertEqual(len(self.cache), 2 * len(rset))
+
+    def test_user_dependent_fragments(self):
+        self.opt_in()
+        with self.admin_access.repo_cnx() as cnx:
+            self.create_user(cnx, u'toto')
+            cnx.commit()
+        with self.new_access(u'toto').web_request() as req:
+            # read permissions of CWUser involve rql expressions in the test
+            # schema, not those of CWGroup
+            req.user.view('incontext')
+            rset = req.execute('Any G WHERE G is CWGroup, G name "users"')
+            rset.get_entity(0, 0).view('incontext')
+            self.assertEqual(sorted((key[0], key[4]) for key in self.cache._data),
+                             sorted([(req.user.eid, req.user.eid),
+                                     (rset[0][0], None)]))
+
+    def test_invalidation(self):
+        self.opt_in()
+        with self.admin_access.web_request() as req:
+            group = req.execute('CWGroup G WHERE G name "guests"').get_entity(0, 0)
+            self.assertIn('guests', group.view('incontext'))
+            self.assertEqual(len(self.cache), 1)
+            group.cw_set(name=u'visitors')
+            # not invalidated until commit
+            self.assertEqual(len(self.cache), 1)
+            req.cnx.commit()
+            self.assertEqual(len(self.cache), 0)
+            group = req.entity_from_eid(group.eid)
+            self.assertIn('visitors', group.view('incontext'))
+            self.assertEqual(len(self.cache), 1)
+            req.execute('SET U in_group G WHERE U login "admin", G eid %(g)s',
+                        {'g': group.eid})
+            req.cnx.commit()
+            self.assertEqual(len(self.cache), 0)
+
+    def test_lru(self):
+        self.opt_in()
+        with self.admin_access.web_request() as req:
+            rset = req.execute('Any G ORDERBY N WHERE G is CWGroup, G name N')
+            req.view('list', rset, subvid='incontext')
+            eids = [row[0] for row in rset]
+            # hit on the first group's fragment
+            rset.get_entity(0, 0).view('incontext')
+            self.cache.maxsize = self.cache.size
+            rset.get_entity(2, 0).view('outofcontext')
+            # least recently used fragment, the second group's one, has been evicted
+            self.assertEqual(len(self.cache), len(rset))
+            self.assertEqual(sorted(key[0] for key in self.cache._data),
+                             sorted([eids[0], eids[2]] + eids[2:]))
+            self.assertLessEqual(self.cache.size, self.cache.maxsize)
+
+    def test_disk_cache(self):
+        self.opt_in()
+        with tempfile.TemporaryDirectory() as tmpdir:
+            self.vreg.config.fragment_cache = DiskFragmentCache(tmpdir)
+            with self.admin_access.web_request() as req:
+                group = req.execute('CWGroup G WHERE G name "guests"').get_entity(0, 0)
+                html = group.view('outofcontext')
+                self.assertEqual(os.listdir(tmpdir), [str(group.eid)])
+                group = req.entity_from_eid(group.eid)
+                self.assertEqual(group.view('outofcontext'), html)
+                self.assertEqual(self.vreg.config.fragment_cache.hits, 1)
+                group.cw_set(name=u'visitors')
+                req.cnx.commit()
+                self.assertEqual(os.listdir(tmpdir), [])
+
+
 if __name__ == '__main__':
     unittest_main()
@@ -17,11 +17,14 @@
 # with CubicWeb.  If not, see <http://www.gnu.org/licenses/>.
 """cubicweb.web.views.navigation unit tests"""
 
+from unittest import mock
+
 from logilab.common.testlib import unittest_main
 
 from cubicweb.devtools.testlib import CubicWebTC
+from cubicweb.web.views import navigation
 from cubicweb.web.views.navigation import (PageNavigation, SortedNavigation,
-                                           PageNavigationSelect)
+                                           PageNavigationSelect, execute_page)
 from cubicweb.web.views.ibreadcrumbs import BreadCrumbEntityVComponent
 
 BreadCrumbEntityVComponent.visible = True
@@ -118,6 +121,85 @@ class NavigationTC(CubicWebTC):
             html = navcomp.render()
 
 
+class SQLPaginationTC(CubicWebTC):
+
+    def setUp(self):
+        super(SQLPaginationTC, self).setUp()
+        self.config.global_set_option('sql-pagination', True)
+
+    def tearDown(self):
+        self.config.global_set_option('sql-pagination', False)
+        super(SQLPaginationTC, self).tearDown()
+
+    def test_execute_page(self):
+        rql = 'Any X,N ORDERBY N,X WHERE X is CWAttribute, X relation_type R, R name N'
+        with self.admin_access.web_request(page_size='10', __start='20',
+                                           __stop='29') as req:
+            allrows = req.execute(rql).rows
+            with mock.patch.object(req, 'execute', wraps=req.execute) as execute:
+                rset = execute_page(req, rql)
+            # a query to count rows, another to fetch the page
+            self.assertEqual(execute.call_count, 2)
+            self.assertEqual(rset.rows, allrows[20:30])
+            self.assertEqual(rset.total_rowcount, len(allrows))
+            self.assertEqual(rset.limited, (10, 20))
+            self.assertEqual(rset.rql, rql)
+            navcomp = self.vreg['components'].select('navigation', req, rset=rset)
+            self.assertIsInstance(navcomp, PageNavigationSelect)
+            self.assertEqual(navcomp.total, len(allrows))
+            self.assertEqual(navcomp.page_boundaries(), (20, 30))
+            # the page isn't limited again by the main template
+            html = self.view('sameetypelist', rset, req=req)
+            self.assertIn('show %s results' % len(allrows), html.source.decode('utf-8'))
+            self.assertEqual(len(rset), 10)
+
+    def test_execute_page_not_paginated(self):
+        rql = 'Any X WHERE X is CWAttribute'
+        with self.admin_access.web_request(page_size='10') as req:
+            # few results
+            rset = execute_page(req, 'Any X WHERE X is CWGroup')
+            self.assertIsNone(rset.total_rowcount)
+            # non templatable view
+            req.form['vid'] = 'csvexport'
+            rset = execute_page(req, rql)
+            self.assertIsNone(rset.total_rowcount)
+            self.assertGreater(len(rset), 10)
+            # every results asked for
+            del req.form['vid']
+            req.form['__force_display'] = '1'
+            rset = execute_page(req, rql)
+            self.assertIsNone(rset.total_rowcount)
+            # no column to count
+            del req.form['__force_display']
+            rset = execute_page(req, 'Any N WHERE X is CWAttribute, X relation_type R, R name N')
+            self.assertIsNone(rset.total_rowcount)
+            rset = execute_page(req, rql)
+            self.assertEqual(len(rset), 10)
+
+    def test_view_controller(self):
+        with self.admin_access.web_request(rql='Any X ORDERBY X WHERE X is CWAttribute',
+                                           page_size='10', __start='10',
+                                           __stop='19') as req:
+            total = req.execute('Any COUNT(X) WHERE X is CWAttribute')[0][0]
+            with mock.patch('cubicweb.web.views.navigation.cached_execute',
+                            wraps=navigation.cached_execute) as count:
+                html = self.app_handle_request(req).decode('utf-8')
+            self.assertEqual(count.call_count, 1)
+            self.assertIn('show %s results' % total, html)
+            self.assertIn('selected="selected" title="11 - 20"', html)
+
+    def test_sorted_navigation(self):
+        with self.admin_access.web_request(page_size='10') as req:
+            rql = 'Any G ORDERBY N WHERE G is CWGroup, G name N'
+            rset = execute_page(req, rql)
+            self.assertIsNone(rset.total_rowcount)
+            rset = execute_page(req, 'Any X ORDERBY N WHERE X is CWEType, X name N')
+            self.assertEqual(len(rset), 10)
+            navcomp = self.vreg['components'].select('navigation', req, rset=rset,
+                                                     page_size=rset.total_rowcount // 3)
+            self.assertIsInstance(navcomp, SortedNavigation)
+            navcomp.render()
+
 
 if __name__ == '__main__':
     unittest_main()
@@ -25,6 +25,8 @@ from cubicweb.devtools.testlib import CubicWebTC
 import os
 import os.path as osp
 import glob
+import gzip
+import hashlib
 
 from cubicweb.utils import HTMLHead
 from cubicweb.web.views.staticcontrollers import ConcatFilesHandler
@@ -51,6 +53,42 @@ class StaticControllerCacheTC(staticfilespublishermixin, CubicWebTC):
         with self._publish_static_files('data/cubicweb.css', next_headers) as req:
             self.assertEqual(304, req.status_out)
 
+    def test_gzip(self):
+        dirpath, rid = self.config.locate_resource('cubicweb.js')
+        with open(osp.join(dirpath, rid), 'rb') as f:
+            content = f.read()
+        with self._publish_static_files('data/cubicweb.js') as req:
+            self.assertEqual(200, req.status_out)
+            self.assertIsNone(req.get_response_header('content-encoding'))
+            self.assertEqual(req.get_response_header('vary'), ['accept-encoding'])
+            etag = req.get_response_header('etag', raw=True)
+        headers = {'accept-encoding': 'gzip, deflate'}
+        with self.admin_access.web_request(headers=headers) as req:
+            req._url = 'data/cubicweb.js'
+            result = self.app_handle_request(req)
+            self.assertEqual(200, req.status_out)
+            self.assertEqual(req.get_response_header('content-encoding'), ['gzip'])
+            self.assertEqual(int(req.get_response_header('content-length')),
+                             len(result))
+            self.assertEqual(gzip.decompress(result), content)
+            gzetag = req.get_response_header('etag', raw=True)
+        # each variant has its own entity tag
+        self.assertNotEqual(etag, gzetag)
+        headers['if-none-match'] = gzetag
+        with self._publish_static_files('data/cubicweb.js', headers) as req:
+            self.assertEqual(304, req.status_out)
+
+    def test_gzip_mimetypes(self):
+        with self._publish_static_files('data/entypo.svg',
+                                        {'accept-encoding': 'gzip'}) as req:
+            self.assertEqual(req.get_response_header('content-encoding'), ['gzip'])
+        # binary images aren't compressed
+        with self._publish_static_files('data/favicon.ico',
+                                        {'accept-encoding': 'gzip'}) as req:
+            self.assertEqual(200, req.status_out)
+            self.assertIsNone(req.get_response_header('content-encoding'))
+
+
 class StaticDirectoryControllerTC(staticfilespublishermixin, CubicWebTC):
 
     def test_check_static_dir_access(self):
@@ -59,9 +97,11 @@ class StaticDirectoryControllerTC(staticfilespublishermixin, CubicWebTC):
         if not os.path.exists(staticdir):
             os.makedirs(staticdir)
         filename = osp.join(staticdir, 'test')
-        with open(filename, 'a') as f:
-            with self._publish_static_files('static/test') as req:
-                self.assertEqual(200, req.status_out)
+        with open(filename, 'a'):
+            pass
+        self.addCleanup(os.remove, filename)
+        with self._publish_static_files('static/test') as req:
+            self.assertEqual(200, req.status_out)
 
 class DataControllerTC(staticfilespublishermixin, CubicWebTC):
     tags = CubicWebTC.tags | Tags('static_controller', 'data', 'http')
@@ -151,6 +191,20 @@ class ConcatFilesTC(CubicWebTC):
             self.assertTrue(osp.isfile(filepath))
 
 
+    def test_immutable(self):
+        js_files = ('cubicweb.ajax.js', 'jquery.js')
+        try:
+            with tempattr(self.vreg.config, 'mode', 'notest'):
+                self.config._init_base_url()  # reset config.datadir_url
+                with self._publish_js_files(js_files) as (result, req):
+                    self.assertEqual(200, req.status_out)
+                    self.assertEqual(req.get_response_header('cache-control'),
+                                     {'max-age': 31536000, 'immutable': None})
+                    self.assertEqual(req.get_response_header('etag', raw=True),
+                                     '"%s"' % hashlib.sha1(result).hexdigest())
+        finally:
+            self.config._init_base_url()
+
     def test_invalid_file_in_debug_mode(self):
         js_files = ('cubicweb.ajax.js', 'dummy.js')
         # in debug mode, an error is raised
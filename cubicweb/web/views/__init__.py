@@ -81,7 +81,11 @@ def vid_from_rset(req, rset, schema, check_table=True):
     for mimetype in req.parse_accept_header('Accept'):
         if mimetype in VID_BY_MIMETYPE:
             return VID_BY_MIMETYPE[mimetype]
-    nb_rows = len(rset)
+    if rset.total_rowcount is not None:
+        # only a page of results has been fetched
+        nb_rows = rset.total_rowcount
+    else:
+        nb_rows = len(rset)
     # empty resultset
     if nb_rows == 0:
         return 'noresult'
@@ -83,12 +83,18 @@ class ViewController(Controller):
     template = 'main-template'
 
     def publish(self, rset=None):
-        """publish a request, returning an encoded string"""
+        """publish a request, returning an encoded string, or an iterator on
+        encoded chunks of it when it's rendered in streaming mode
+        """
         view, rset = self._select_view_and_rset(rset)
         view.set_http_cache_headers()
         if self._cw.is_client_cache_valid():
             return b''
         template = self.appli.main_template_id(self._cw)
+        if (self._cw.vreg.config['streaming-rendering'] and view.streamable()
+                and self._cw.http_method() != 'HEAD'):
+            return self._cw.vreg['views'].main_template_stream(
+                self._cw, template, rset=rset, view=view)
         return self._cw.vreg['views'].main_template(self._cw, template,
                                                     rset=rset, view=view)
 
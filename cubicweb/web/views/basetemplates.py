@@ -146,6 +146,10 @@ class TheMainTemplate(MainTemplate):
     __select__ = templatable_view()
 
     def call(self, view):
+        for __ in self.stream_call(view):
+            pass
+
+    def stream_call(self, view):
         self.set_request_content_type()
         self.template_header(self.content_type, view)
         w = self.w
@@ -163,7 +167,9 @@ class TheMainTemplate(MainTemplate):
         if view and not view.handle_pagination:
             view.paginate(w=nav_html.write)
         w(nav_html.getvalue())
-        view.render(w=w)
+        # nothing is sent to the client until the main view yields, once it
+        # may not raise Redirect or Unauthorized anymore
+        yield from view.render_stream(w=w)
         w(nav_html.getvalue())
         w(u'</div>\n') # close id=contentmain
         w(u'</div>\n') # closes id=pageContent
@@ -296,6 +296,10 @@ class ListView(EntityView):
 
         :param listid: the DOM id to use for the root element
         """
+        for __ in self.stream_call(klass, title, subvid, listid, **kwargs):
+            pass
+
+    def stream_call(self, klass=None, title=None, subvid=None, listid=None, **kwargs):
         # XXX much of the behaviour here should probably be outside this view
         if subvid is None and 'subvid' in self._cw.form:
             subvid = self._cw.form.pop('subvid') # consume it
@@ -310,6 +314,7 @@ class ListView(EntityView):
             self.w(u'<ul%s class="%s">\n' % (listid, klass or 'section'))
         for i in range(self.cw_rset.rowcount):
             self.cell_call(row=i, col=0, vid=subvid, klass=klass, **kwargs)
+            yield
         self.w(u'</ul>\n')
         if title:
             self.w(u'</div>\n')
@@ -77,6 +77,8 @@ def _facets(req, rset, context, mainvar, **kwargs):
     possible_facets = req.vreg['facets'].poss_visible_objects(
         req, rset=rset, rqlst=origqlst, select=select,
         context=context, filtered_variable=filtered_variable, **kwargs)
+    # compute ranges of range facets at once
+    facetbase.prefetch_ranges(possible_facets)
     wdgs = [(facet, facet.get_widget()) for facet in possible_facets]
     return baserql, [wdg for facet, wdg in wdgs if wdg is not None]
 
@@ -32,6 +32,7 @@ from rql.nodes import Relation
 from cubicweb import Unauthorized
 from cubicweb.view import Component
 from cubicweb.web.views.ajaxcontroller import ajaxfunc
+from cubicweb.web.views.navigation import execute_page
 
 LOGGER = getLogger('cubicweb.magicsearch')
 
@@ -158,7 +159,7 @@ class BaseQueryProcessor(Component):
     def process_query(self, uquery):
         args = self.preprocess_query(uquery)
         try:
-            return self._cw.execute(*args)
+            return execute_page(self._cw, *args)
         finally:
             # rollback necessary to avoid leaving the connection in a bad state
             self._cw.cnx.rollback()
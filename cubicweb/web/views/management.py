@@ -190,7 +190,7 @@ class CwStats(View):
         stats = self._cw.call_service('repo_stats')
         stats['threads'] = ', '.join(sorted(stats['threads']))
         for k in stats:
-            if k in ('extid_cache_size', 'type_source_cache_size'):
+            if k in ('extid_cache_size', 'type_source_cache_size', 'type_cache_size'):
                 continue
             if k.endswith('_cache_size'):
                 stats[k] = '%s / %s' % (stats[k]['size'], stats[k]['maxsize'])
@@ -34,6 +34,12 @@ class, so that you can ask pagination explicitly on every result-set based views
 
 .. autofunction:: paginate
 
+When the `sql-pagination` option is set, the view controller only fetches the
+displayed page of results from the database when they are to be paginated (see
+:func:`execute_page`).
+
+.. autofunction:: execute_page
+
 
 Previous / next navigation
 --------------------------
@@ -50,14 +56,18 @@ from cubicweb import _
 
 from datetime import datetime
 
+from rql import nodes, stmts
 from rql.nodes import VariableRef, Constant
 
+from logilab.common.decorators import clear_cache
 from logilab.mtconverter import xml_escape
 
 from cubicweb.predicates import paginated_rset, sorted_rset, adaptable
 from cubicweb.uilib import cut
 from cubicweb.view import EntityAdapter
 from cubicweb.web.component import EmptyComponent, EntityCtxComponent, NavigationComponent
+from cubicweb.web.querycache import cached_execute
+from cubicweb.web.views import VID_BY_MIMETYPE
 
 
 class PageNavigation(NavigationComponent):
@@ -80,11 +90,10 @@ class PageNavigation(NavigationComponent):
         return u'%s - %s' % (start+1, stop+1)
 
     def iter_page_links(self, basepath, params):
-        rset = self.cw_rset
         page_size = self.page_size
         start = 0
-        while start < rset.rowcount:
-            stop = min(start + page_size - 1, rset.rowcount - 1)
+        while start < self.total:
+            stop = min(start + page_size - 1, self.total - 1)
             yield self.page_link(basepath, params, start, stop,
                                  self.index_display(start, stop))
             start = stop + 1
@@ -165,13 +174,19 @@ class SortedNavigation(NavigationComponent):
         # attrname = the name of attribute according to which the sort
         # is done if any
         col, attrname = self.sort_on()
-        index_display = self.display_func(self.cw_rset, col, attrname)
+        rset = self.cw_rset
+        if rset.total_rowcount is not None:
+            # only a page of results has been fetched, get all of them to
+            # display pages boundaries (there are less than 4 pages unless
+            # selectors have been overridden)
+            rset = self._cw.execute(rset.rql, rset.args)
+        index_display = self.display_func(rset, col, attrname)
         basepath = self._cw.relative_path(includeparams=False)
         params = dict(self._cw.form)
         self.clean_params(params)
         blocklist = []
         start = 0
-        total = self.cw_rset.rowcount
+        total = self.total
         while start < total:
             stop = min(start + self.page_size - 1, total - 1)
             cell = self.format_link_content(index_display(start), index_display(stop))
@@ -289,7 +304,12 @@ def do_paginate(view, rset=None, w=None, show_all_option=True, page_size=None):
             nav.render(w=w)
             if show_all_option:
                 nav.render_link_display_all(w=w)
-            rset.limit(offset=start, limit=stop-start, inplace=True)
+            if rset.total_rowcount is None:
+                rset.limit(offset=start, limit=stop-start, inplace=True)
+            elif rset.limited != (stop - start, start):
+                # the page fetched by execute_page isn't the displayed one
+                # (e.g. the view uses a specific page size)
+                _fetch_page(rset, stop - start, start)
 
 
 def paginate(view, show_all_option=True, w=None, page_size=None, rset=None):
@@ -298,6 +318,131 @@ def paginate(view, show_all_option=True, w=None, page_size=None, rset=None):
     if view.paginable:
         do_paginate(view, rset, w, show_all_option, page_size)
 
+def execute_page(req, rql, args=None):
+    """execute `rql` and return its result set, as done by the view controller.
+
+    When the `sql-pagination` option is set and results are to be paginated by
+    the main template, only the displayed page of results is fetched from the
+    database, using LIMIT / OFFSET. The total number of rows, needed by
+    navigation components, is then computed by a separate COUNT query which is
+    cached by the query results cache if it's enabled (see
+    :mod:`cubicweb.web.querycache`). The result set's `total_rowcount` holds
+    this number, while its `limited` attribute is set as done by
+    :meth:`~cubicweb.rset.ResultSet.limit` and its `rql` is left unlimited.
+    """
+    if not _paginated_by_template(req):
+        return req.execute(rql, args)
+    page_size = req.form.get('page_size')
+    try:
+        page_size = int(page_size)
+    except (ValueError, TypeError):
+        page_size = req.property_value(NavigationComponent.page_size_property)
+    rqlst = req.vreg.parse(req, rql, args)
+    if len(rqlst.children) != 1 or page_size < 2:
+        return req.execute(rql, args)
+    select = rqlst.children[0]
+    if select.limit is not None or select.offset:
+        return req.execute(rql, args)
+    col = _count_column(req, select)
+    if col is None:
+        return req.execute(rql, args)
+    countrset = cached_execute(req, _count_rql(rqlst, col), args)
+    total = countrset[0][0]
+    if total <= page_size:
+        return req.execute(rql, args)
+    try:
+        start = int(req.form[NavigationComponent.start_param])
+        stop = int(req.form[NavigationComponent.stop_param]) + 1
+    except (KeyError, ValueError):
+        start, stop = 0, page_size
+    if start >= total:
+        start, stop = 0, page_size
+    select.limit, select.offset = stop - start, start
+    rset = req.execute(rqlst.as_string(), args)
+    rset.rql = rql
+    rset.limited = (stop - start, start)
+    rset.total_rowcount = total
+    return rset
+
+
+def _paginated_by_template(req):
+    """return True if results of the view controller's query are to be
+    paginated by the main template
+    """
+    if not req.vreg.config['sql-pagination']:
+        return False
+    if '__force_display' in req.form or '__notemplate' in req.form:
+        return False
+    vid = req.form.get('vid')
+    if vid is None:
+        for mimetype in req.parse_accept_header('Accept'):
+            if mimetype in VID_BY_MIMETYPE:
+                vid = VID_BY_MIMETYPE[mimetype]
+                break
+        else:
+            # views selected by default for several rows are paginated
+            return True
+    views = req.vreg['views'].get(vid, ())
+    return bool(views) and all(view.templatable and view.paginable and not view.binary
+                               for view in views)
+
+
+def _count_column(req, select):
+    """return the index of a selected column which is never NULL, so that the
+    number of rows may be computed by counting its values, or None
+    """
+    schema = req.vreg.schema
+    for col, term in enumerate(select.selection):
+        if not isinstance(term, VariableRef) or not isinstance(term.variable, nodes.Variable):
+            continue
+        var = term.variable
+        if var.stinfo.get('optrelations') or not select.solutions:
+            continue
+        if all(not schema.eschema(solution[var.name]).final
+               for solution in select.solutions):
+            return col
+    return None
+
+
+def _count_rql(rqlst, col):
+    """return a query counting rows of `rqlst`, by counting values of its
+    `col` column
+    """
+    rqlst = rqlst.copy()
+    rqlst.children[0].remove_sort_terms()
+    countselect = stmts.Select()
+    aliases = [nodes.VariableRef(countselect.get_variable('C%s' % i, i))
+               for i in range(len(rqlst.children[0].selection))]
+    count = nodes.Function('COUNT')
+    count.append(nodes.VariableRef(aliases[col].variable))
+    countselect.append_selected(count)
+    countselect.set_with([nodes.SubQuery(aliases, rqlst)], check=False)
+    countunion = stmts.Union()
+    countunion.append(countselect)
+    return countunion.as_string()
+
+
+def _fetch_page(rset, limit, offset):
+    """replace rows of `rset`, a page of results fetched by
+    :func:`execute_page`, by the page starting at `offset`
+    """
+    req = rset.req
+    rqlst = rset.syntax_tree().copy()
+    rqlst.children[0].limit, rqlst.children[0].offset = limit, offset
+    page = req.execute(rqlst.as_string(), rset.args)
+    rset.rows, rset.description = page.rows, page.description
+    rset.rowcount = page.rowcount
+    rset.limited = (limit, offset)
+    clear_cache(rset, 'description_struct')
+    clear_cache(rset, 'get_entity')
+    # entities built from the former page may not refer to this result set
+    # anymore
+    for entity in req.cached_entities():
+        if entity.cw_rset is rset:
+            entity.cw_rset = entity.as_rset()
+            entity.cw_row = entity.cw_col = 0
+
+
 # monkey patch base View class to add a .paginate([...])
 # method to be called to write pages index in the view and then limit the result
 # set to the current page
@@ -24,10 +24,13 @@
 
 import os
 import os.path as osp
+import gzip
 import hashlib
 import mimetypes
+import shutil
 import threading
 import tempfile
+import weakref
 from time import mktime
 from datetime import datetime, timedelta
 from logging import getLogger
@@ -39,6 +42,42 @@ from cubicweb.web.controller import Controller
 from cubicweb.web.views.urlrewrite import URLRewriter
 
 
+# mime types worth being compressed, other than text/*
+COMPRESSIBLE_MIMETYPES = frozenset(('application/javascript', 'application/json',
+                                    'application/xml', 'image/svg+xml'))
+# files smaller than this aren't worth being compressed
+COMPRESS_MIN_SIZE = 1024
+
+
+def gzip_filepath(path, cachedir):
+    """return the path of a gzip compressed variant of the file at `path`,
+    building it in `cachedir` if there is none or if it's older than `path`.
+
+    A `<path>.gz` file, such as those built for concatenated files or shipped
+    pre-compressed along static files, is used if it's up to date.
+    """
+    mtime = os.stat(path).st_mtime
+    gzpath = osp.join(cachedir, 'gzip_%s.gz' % hashlib.md5(path.encode('utf-8')).hexdigest())
+    for candidate in (path + '.gz', gzpath):
+        try:
+            if os.stat(candidate).st_mtime >= mtime:
+                return candidate
+        except OSError:
+            continue
+    # write to a temporary file then rename it so that concurrent requests
+    # never serve a partially written file
+    fd, tmpfile = tempfile.mkstemp(dir=cachedir)
+    try:
+        with open(path, 'rb') as source, os.fdopen(fd, 'wb') as dest:
+            with gzip.GzipFile(fileobj=dest, mode='wb', mtime=mtime) as gzfile:
+                shutil.copyfileobj(source, gzfile)
+    except Exception:
+        os.remove(tmpfile)
+        raise
+    os.rename(tmpfile, gzpath)
+    return gzpath
+
+
 class StaticFileController(Controller):
     """an abtract class to serve static file
 
@@ -50,10 +89,24 @@ class StaticFileController(Controller):
         """max cache TTL"""
         return 60 * 60 * 24 * 7
 
-    def static_file(self, path):
-        """Return full content of a static file.
+    def etag(self, path, stat):
+        """return the (strong) entity tag of the file at `path`, given its
+        `os.stat` result
+        """
+        return '"%x-%x"' % (stat.st_mtime_ns, stat.st_size)
+
+    def static_file(self, path, immutable=False):
+        """Return a static file, opened in binary mode, or an empty string if
+        the client cache is still valid.
+
+        The front-end is expected to stream the file to the client without
+        copying it if possible (e.g. using `wsgi.file_wrapper`) and to close
+        it. A gzip compressed variant of text files is served to clients
+        accepting it.
 
-        XXX iterable content would be better
+        If `immutable` is true, the file is expected to never change for the
+        requested url (e.g. because a hash of its content is part of it), and
+        clients are told so.
         """
         debugmode = self._cw.vreg.config.debugmode
         if osp.isdir(path):
@@ -66,9 +119,15 @@ class StaticFileController(Controller):
             # XXX: Don't provide additional resource information to error responses
             #
             # the HTTP RFC recommends not going further than 1 year ahead
-            expires = datetime.now() + timedelta(seconds=self.max_age(path))
+            if immutable:
+                max_age = 60 * 60 * 24 * 365
+                cache_control = 'max-age=%s, immutable' % max_age
+            else:
+                max_age = self.max_age(path)
+                cache_control = 'max-age=%s' % max_age
+            expires = datetime.now() + timedelta(seconds=max_age)
             self._cw.set_header('Expires', generateDateTime(mktime(expires.timetuple())))
-            self._cw.set_header('Cache-Control', 'max-age=%s' % self.max_age(path))
+            self._cw.set_header('Cache-Control', cache_control)
 
         # XXX system call to os.stats could be cached once and for all in
         # production mode (where static files are not expected to change)
@@ -77,15 +136,35 @@ class StaticFileController(Controller):
         # os.read after. Improving this specific call will not help
         #
         # Real production environment should use dedicated static file serving.
-        self._cw.set_header('last-modified', generateDateTime(os.stat(path).st_mtime))
-        if self._cw.is_client_cache_valid():
-            return b''
+        stat = os.stat(path)
+        self._cw.set_header('last-modified', generateDateTime(stat.st_mtime))
         mimetype, encoding = mimetypes.guess_type(path)
         if mimetype is None:
             mimetype = 'application/octet-stream'
-        self._cw.set_content_type(mimetype, osp.basename(path), encoding)
-        with open(path, 'rb') as resource:
-            return resource.read()
+        compress = (encoding is None and stat.st_size >= COMPRESS_MIN_SIZE
+                    and (mimetype.startswith('text/')
+                         or mimetype in COMPRESSIBLE_MIMETYPES))
+        filename = osp.basename(path)
+        etag = self.etag(path, stat)
+        if compress:
+            self._cw.set_header('Vary', 'Accept-Encoding')
+            if self.accept_gzip():
+                path = gzip_filepath(path, osp.join(self._cw.vreg.config.appdatahome,
+                                                    'uicache'))
+                stat = os.stat(path)
+                etag = etag[:-1] + '.gz"'
+                self._cw.set_header('Content-Encoding', 'gzip')
+        self._cw.set_header('etag', etag)
+        if self._cw.is_client_cache_valid():
+            return b''
+        self._cw.set_content_type(mimetype, filename, encoding)
+        self._cw.set_header('Content-Length', stat.st_size)
+        return open(path, 'rb')
+
+    def accept_gzip(self):
+        """return True if the client accepts gzip encoded content"""
+        accepted = self._cw.get_header('Accept-Encoding', raw=False) or {}
+        return accepted.get('gzip', accepted.get('*', 0)) > 0
 
     @property
     def relpath(self):
@@ -104,6 +183,8 @@ class ConcatFilesHandler(object):
 
     def __init__(self, config):
         self._resources = {}
+        # concatenated file path -> (modification time, entity tag)
+        self._etags = {}
         self.config = config
         self.logger = getLogger('cubicweb.web')
         self.lock = threading.Lock()
@@ -173,8 +254,42 @@ class ConcatFilesHandler(object):
                     raise
                 else:
                     os.rename(tmpfile, filepath)
+                    # pre-compress it once for all
+                    gzip_filepath(filepath, osp.dirname(filepath))
         return filepath
 
+    def etag(self, filepath, stat):
+        """return the strong entity tag of the concatenated file at `filepath`,
+        computed from its content, given its `os.stat` result
+        """
+        try:
+            mtime, etag = self._etags[filepath]
+            if mtime == stat.st_mtime_ns:
+                return etag
+        except KeyError:
+            pass
+        content_hash = hashlib.sha1()
+        with open(filepath, 'rb') as f:
+            for chunk in iter(lambda: f.read(65536), b''):
+                content_hash.update(chunk)
+        etag = '"%s"' % content_hash.hexdigest()
+        self._etags[filepath] = (stat.st_mtime_ns, etag)
+        return etag
+
+
+# config -> ConcatFilesHandler, shared by controllers of an instance
+_CONCAT_FILES_HANDLERS = weakref.WeakKeyDictionary()
+
+
+def concat_files_handler(config):
+    """return the :class:`ConcatFilesHandler` of the instance, so that
+    resources, entity tags and lock are shared by every request
+    """
+    try:
+        return _CONCAT_FILES_HANDLERS[config]
+    except KeyError:
+        return _CONCAT_FILES_HANDLERS.setdefault(config, ConcatFilesHandler(config))
+
 
 class DataController(StaticFileController):
     """Controller in charge of serving static files in /data/
@@ -183,21 +298,33 @@ class DataController(StaticFileController):
     """
 
     __regid__ = 'data'
+    # path of the concatenated file being served, if any
+    _concat_filepath = None
 
     def __init__(self, *args, **kwargs):
         super(DataController, self).__init__(*args, **kwargs)
         config = self._cw.vreg.config
         self.base_datapath = config.data_relpath()
         self.data_modconcat_basepath = '%s??' % self.base_datapath
-        self.concat_files_registry = ConcatFilesHandler(config)
+        self.concat_files_registry = concat_files_handler(config)
+
+    def etag(self, path, stat):
+        if path == self._concat_filepath:
+            return self.concat_files_registry.etag(path, stat)
+        return super(DataController, self).etag(path, stat)
 
     def publish(self, rset=None):
         config = self._cw.vreg.config
         # includeparams=True for modconcat-like urls
         relpath = self.relpath
+        immutable = False
         if relpath.startswith(self.data_modconcat_basepath):
             paths = relpath[len(self.data_modconcat_basepath):].split(',')
             filepath = self.concat_files_registry.concat_cached_filepath(paths)
+            self._concat_filepath = filepath
+            # the url of concatenated files holds the instance's version hash
+            # (except in test mode) and they're only rebuilt in debug mode
+            immutable = config.mode != 'test'
         else:
             if not relpath.startswith(self.base_datapath):
                 # /data/foo, redirect to /data/{hash}/foo
@@ -212,7 +339,7 @@ class DataController(StaticFileController):
             if dirpath is None:
                 raise NotFound()
             filepath = osp.join(dirpath, rid)
-        return self.static_file(filepath)
+        return self.static_file(filepath, immutable)
 
 
 class FCKEditorController(StaticFileController):
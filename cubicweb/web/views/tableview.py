@@ -889,7 +889,14 @@ class EntityTableView(TableMixIn, EntityView):
         return self.cw_rset.rowcount
 
     def build_column_renderers(self):
-        return [self.column_renderer(colid) for colid in self.columns]
+        renderers = [self.column_renderer(colid) for colid in self.columns]
+        # fetch relations displayed in the table using a query per relation
+        # instead of a query per row
+        for renderer in renderers:
+            if isinstance(renderer, RelationColRenderer) and not renderer.is_rtype_view:
+                self.cw_rset.prefetch_related(renderer.colid, renderer.role,
+                                              self.cw_col or 0)
+        return renderers
 
     def entity(self, rownum):
         """Return the table's main entity"""
@@ -121,8 +121,79 @@ class BaseWebConfiguration(CubicWebConfiguration):
           'transparent to the user. Default to 5min.',
           'group': 'web', 'level': 3,
           }),
+        ('fragment-cache-size',
+         {'type': 'bytes',
+          'default': 0,
+          'help': 'maximum memory size of the cache of fragments rendered by '
+          'views having their `fragment_cache` attribute set. 0 disables the '
+          'cache.',
+          'group': 'web', 'level': 2,
+          }),
+        ('fragment-cache-directory',
+         {'type': 'string',
+          'default': None,
+          'help': 'if set, fragments rendered by views having their '
+          '`fragment_cache` attribute set are cached in files of this '
+          'directory instead of in memory, so they are shared by processes of '
+          'the instance. Its size is not bounded: fragments are only removed '
+          'when their entity is modified or deleted.',
+          'group': 'web', 'level': 3,
+          }),
+        ('query-results-cache-ttl',
+         {'type': 'time',
+          'default': 0,
+          'help': 'time during which results of some queries of the web ui '
+          '(computing facets vocabularies or the number of rows of paginated '
+          'queries) are cached, shared by users having the same groups. They '
+          'are invalidated sooner when an entity or relation of a type involved '
+          'in the query is modified by this process. 0 disables the cache.',
+          'group': 'web', 'level': 2,
+          }),
+        ('query-results-cache-size',
+         {'type': 'int',
+          'default': 1000,
+          'help': 'maximum number of queries results in the query results '
+          'cache (see `query-results-cache-ttl`).',
+          'group': 'web', 'level': 3,
+          }),
+        ('sql-pagination',
+         {'type': 'yn',
+          'default': False,
+          'help': 'if set, only the displayed page of results of paginated '
+          'queries is fetched from the database by the view controller, along '
+          'with their number of rows, instead of fetching every row to '
+          'display a page of them.',
+          'group': 'web', 'level': 2,
+          }),
+        ('streaming-rendering',
+         {'type': 'yn',
+          'default': False,
+          'help': 'if set, pages rendered by the view controller using a '
+          'streamable main template and view are sent to the client while '
+          'they are being rendered, instead of once they are complete.',
+          'group': 'web', 'level': 2,
+          }),
     ))
 
+    @cachedproperty
+    def fragment_cache(self):
+        """cache of view fragments (see :mod:`cubicweb.web.fragmentcache`), or
+        None if disabled
+        """
+        from cubicweb.web.fragmentcache import fragment_cache_from_config
+        return fragment_cache_from_config(self)
+
+    @cachedproperty
+    def query_results_cache(self):
+        """cache of queries results (see :mod:`cubicweb.web.querycache`), or None
+        if disabled
+        """
+        if not self['query-results-cache-ttl']:
+            return None
+        from cubicweb.web.querycache import QueryResultsCache
+        return QueryResultsCache(self['query-results-cache-ttl'],
+                                 self['query-results-cache-size'])
+
     def anonymous_user(self):
         """return a login and password to use for anonymous users.
 
@@ -275,6 +346,8 @@ have the python imaging library installed to use captcha)',
         super(WebConfiguration, self).__init__(*args, **kwargs)
         self.uiprops = None
         self.datadir_url = None
+        # (directory, css file) -> directory of the processed css file
+        self._processed_css = {}
 
     def fckeditor_installed(self):
         if self.uiprops is None:
@@ -335,11 +408,22 @@ have the python imaging library installed to use captcha)',
         if directory is None:
             return None, None
         if self['use-uicache'] and rdirectory == 'data' and rid.endswith('.css'):
-            return self.ensure_uid_directory(
-                self.uiprops.process_resource(
-                    join(directory, rdirectory), rid)), rid
+            if self.debugmode:
+                return self._process_css(directory, rid), rid
+            # css files are only processed once out of debug mode, so that
+            # their modification time, hence their entity tag, doesn't change
+            try:
+                return self._processed_css[(directory, rid)], rid
+            except KeyError:
+                cachedir = self._processed_css[(directory, rid)] = \
+                    self._process_css(directory, rid)
+                return cachedir, rid
         return join(directory, rdirectory), rid
 
+    def _process_css(self, directory, rid):
+        return self.ensure_uid_directory(
+            self.uiprops.process_resource(join(directory, 'data'), rid))
+
     def locate_all_files(self, rid, rdirectory='wdoc'):
         """return all files corresponding to the given resource"""
         path = [self.apphome] + self.cubes_path() + [dirname(__file__)]
@@ -387,6 +471,7 @@ have the python imaging library installed to use captcha)',
             data=lambda x: self.datadir_url + x,
             datadir_url=self.datadir_url[:-1])
         self._init_uiprops(self.uiprops)
+        self._processed_css.clear()
 
     def _init_uiprops(self, uiprops):
         libuiprops = join(_DATA_DIR, 'uiprops.py')